@@ -0,0 +1,120 @@
+"""Lane lookup latency on rates/tariffs before and after the lane indexes.
+
+    python -m benchmarks.lane_lookup --rows 1000000
+
+Builds a throwaway SQLite database with ``--rows`` synthetic rates, times
+each lookup with the revision 5c1f3d2b9a47 indexes dropped and then again
+with them in place, and prints the results as JSON.
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, text
+
+from lib.db.models import Base, Customer, Rate, Tariff
+
+LOAD_PORTS = ["MELBOURNE", "SYDNEY", "BRISBANE", "FREMANTLE", "ADELAIDE"]
+CONTAINERS = ["20GP", "40GP", "40HC", "20RE", "40REHC"]
+DEST_PORTS = [f"PORT{i:03d}" for i in range(200)]
+
+LANE_INDEXES = {
+    "ix_rates_lane": "CREATE INDEX ix_rates_lane ON rates (load_port, destination_port, container_type)",
+    "ix_rates_destination_customer": "CREATE INDEX ix_rates_destination_customer ON rates (destination_port, customer_id)",
+    "uq_tariffs_lane_container": "CREATE UNIQUE INDEX uq_tariffs_lane_container ON tariffs (load_port, destination_port, container_type)",
+    "ix_tariffs_destination": "CREATE INDEX ix_tariffs_destination ON tariffs (destination_port)",
+}
+
+QUERIES = {
+    "rates_by_lane": (
+        "SELECT id, customer_id, freight_usd FROM rates "
+        "WHERE load_port = :lp AND destination_port = :dp AND container_type = :ct"
+    ),
+    "rates_by_destination": (
+        "SELECT customer_id, COUNT(*) FROM rates WHERE destination_port = :dp GROUP BY customer_id"
+    ),
+    "tariff_by_lane": (
+        "SELECT id, freight_usd FROM tariffs "
+        "WHERE load_port = :lp AND destination_port = :dp AND container_type = :ct"
+    ),
+    "tariffs_by_destination": "SELECT id FROM tariffs WHERE destination_port = :dp",
+}
+
+LANES = [(lp, dp, ct) for lp in LOAD_PORTS for dp in DEST_PORTS for ct in CONTAINERS]
+
+
+def populate(engine, rows, batch=50000):
+    customers = max(1, rows // len(LANES) + 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Customer), [{"name": f"CUSTOMER {i:06d}"} for i in range(customers)])
+        conn.execute(insert(Tariff), [_values(lane) for lane in LANES])
+        buf = []
+        for n in range(rows):
+            customer_id, lane_idx = divmod(n, len(LANES))
+            buf.append(dict(_values(LANES[lane_idx]), customer_id=customer_id + 1))
+            if len(buf) >= batch:
+                conn.execute(insert(Rate), buf)
+                buf = []
+        if buf:
+            conn.execute(insert(Rate), buf)
+
+
+def _values(lane):
+    lp, dp, ct = lane
+    return dict(
+        load_port=lp, destination_port=dp, container_type=ct,
+        freight_usd=500.0, othc_aud=300.0, doc_aud=100.0, cmr_aud=20.0,
+        ams_usd=35.0, lss_usd=30.0, dthc="COLLECT", free_time="14 Days",
+    )
+
+
+def time_queries(engine, lookups, seed=7):
+    rnd = random.Random(seed)
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            stmt = text(sql)
+            samples = []
+            for _ in range(lookups):
+                lp, dp, ct = rnd.choice(LANES)
+                started = time.perf_counter()
+                conn.execute(stmt, {"lp": lp, "dp": dp, "ct": ct}).all()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                "median_ms": round(statistics.median(samples), 4),
+                "p95_ms": round(sorted(samples)[int(len(samples) * 0.95) - 1], 4),
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for name in LANE_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        populate(engine, args.rows)
+
+        before = time_queries(engine, args.lookups)
+        with engine.begin() as conn:
+            for sql in LANE_INDEXES.values():
+                conn.exec_driver_sql(sql)
+            conn.exec_driver_sql("ANALYZE")
+        after = time_queries(engine, args.lookups)
+        engine.dispose()
+
+    print(json.dumps({"rows": args.rows, "before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
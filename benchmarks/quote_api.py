@@ -0,0 +1,113 @@
+"""Quote throughput and latency through the HTTP API (lib.server).
+
+    python -m benchmarks.quote_api --rows 100000 --requests 20000 --clients 16
+
+Builds a throwaway SQLite database with ``--rows`` synthetic rates, starts
+``python -m lib.server`` against it in a subprocess and sends
+``GET /price`` requests for random lanes over ``--clients`` keep-alive
+connections. Prints throughput and latency percentiles as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from sqlalchemy import create_engine
+
+from benchmarks.lane_lookup import LANES, populate
+from lib.db.models import Base
+
+
+async def _client(port, targets, samples):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for target in targets:
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b"\r\n":
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        writer.close()
+
+
+async def _wait_for(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def _run(port, requests, clients, customers, seed=7):
+    rnd = random.Random(seed)
+    targets = []
+    for _ in range(requests):
+        lp, dp, ct = rnd.choice(LANES)
+        query = {"customer": f"CUSTOMER {rnd.randrange(customers):06d}", "pol": lp, "pod": dp, "container": ct}
+        targets.append("/price?" + urlencode(query))
+
+    await _wait_for(port)
+    samples = []
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(port, targets[i::clients], samples) for i in range(clients)))
+    return samples, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_engine(url, future=True)
+        Base.metadata.create_all(engine)
+        populate(engine, args.rows)
+        engine.dispose()
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "lib.server", "--port", str(args.port)],
+            env=dict(os.environ, RATE_MANAGER_DB_URL=url),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            customers = max(1, args.rows // len(LANES))
+            samples, elapsed = asyncio.run(_run(args.port, args.requests, args.clients, customers))
+        finally:
+            server.terminate()
+            server.wait()
+
+    samples.sort()
+    print(json.dumps({
+        "rows": args.rows,
+        "requests": len(samples),
+        "clients": args.clients,
+        "requests_per_second": round(len(samples) / elapsed),
+        "median_ms": round(samples[len(samples) // 2], 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
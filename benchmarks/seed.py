@@ -0,0 +1,70 @@
+"""Seeding throughput and peak memory for lib.db.seed.
+
+    python -m benchmarks.seed --rates 1000000
+
+Writes ``--rates`` synthetic rates as JSON Lines (or a JSON array with
+``--array``), seeds a throwaway SQLite database from it twice (the second
+run exercises the unchanged-row path) and prints timings as JSON.
+"""
+import argparse
+import json
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.lane_lookup import LANES, _values
+from lib.db import seed
+from lib.db.models import Base, make_engine
+
+
+def write_rates(path: Path, rows: int, array: bool) -> None:
+    with open(path, "w") as fh:
+        if array:
+            fh.write("[\n")
+        for n in range(rows):
+            customer, lane = divmod(n, len(LANES))
+            record = dict(_values(LANES[lane]), customer=f"CUSTOMER {customer:06d}")
+            sep = ",\n" if array and n else ""
+            fh.write(sep + json.dumps(record) + ("" if array else "\n"))
+        if array:
+            fh.write("\n]\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", type=int, default=1_000_000)
+    parser.add_argument("--array", action="store_true", help="JSON array instead of JSON Lines")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / ("rates.json" if args.array else "rates.jsonl")
+        write_rates(source, args.rates, args.array)
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, future=True)
+
+        runs = []
+        for label in ("first", "reseed"):
+            s = Session()
+            started = time.perf_counter()
+            counts = seed.seed_customers_and_rates(s, source)
+            s.commit()
+            elapsed = time.perf_counter() - started
+            s.close()
+            runs.append(dict(counts, run=label, seconds=round(elapsed, 2),
+                             rates_per_second=round(counts["rates"] / elapsed)))
+        engine.dispose()
+
+    print(json.dumps({
+        "rates": args.rates,
+        "format": "json" if args.array else "jsonl",
+        "runs": runs,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Timings and peak memory for the main operations at realistic scale.
+
+    python -m benchmarks.suite --rows 10000 100000 [--repeat 3] [--output results.json]
+    python -m benchmarks.suite --rows 100000 --compare baseline.json [--tolerance 0.2]
+
+Synthetic data is ``customers x VALID_LOAD_PORTS x VALID_DEST_PORTS x
+VALID_CONTAINERS`` from ``data/data_constants.json``, taken in order until
+``--rows`` is reached, with fixed values so every run sees the same input.
+Tariffs are unique per lane, so they go to extra ``PORTnnnnn`` destinations
+registered in the benchmark database.
+
+Each operation runs ``--repeat`` times in its own process against a
+throwaway database (``RATE_MANAGER_DB_URL``), so ``peak_rss_mb`` is that
+operation's own high-water mark. Results are JSON, with the median time
+per operation; ``--compare`` reports operations slower or bigger than a
+saved run by more than ``--tolerance`` and exits 1 if there are any.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+OPERATIONS = (
+    "seed", "load_data", "export_rates_to_excel", "export_destination",
+    "lookup", "import_quote", "reimport_quote", "import_tariff_rates",
+    "export_destination_csv", "import_quote_csv",
+)
+# Operations that write start from a copy of the empty schema; the rest read
+# the database left by the last seed run.
+FRESH_DB = {"seed", "import_quote", "import_tariff_rates", "import_quote_csv"}
+LOOKUPS = 10_000
+
+
+def _constants():
+    from lib.registry import DATA_CONSTANTS, load_constants
+    return load_constants(DATA_CONSTANTS)
+
+
+def _values(lp, dp, ct, n):
+    return {
+        "load_port": lp, "destination_port": dp, "container_type": ct,
+        "freight_usd": 500.0 + n % 997, "othc_aud": 300.0, "doc_aud": 100.0, "cmr_aud": 20.0,
+        "ams_usd": 35.0, "lss_usd": 30.0, "dthc": "COLLECT", "free_time": "14 Days",
+    }
+
+
+def synthetic_rates(rows):
+    """``(customer, values)`` for ``rows`` rates over the registry lanes."""
+    c = _constants()
+    lanes = [(lp, dp, ct) for lp in c["VALID_LOAD_PORTS"]
+             for dp in c["VALID_DEST_PORTS"] for ct in c["VALID_CONTAINERS"]]
+    for n in range(rows):
+        customer, lane = divmod(n, len(lanes))
+        yield f"CUSTOMER {customer:06d}", _values(*lanes[lane], n)
+
+
+def tariff_ports(rows):
+    c = _constants()
+    per_port = len(c["VALID_LOAD_PORTS"]) * len(c["VALID_CONTAINERS"])
+    return [f"PORT{i:05d}" for i in range(-(-rows // per_port))]
+
+
+def synthetic_tariffs(rows):
+    c = _constants()
+    lanes = ((lp, dp, ct) for dp in tariff_ports(rows)
+             for lp in c["VALID_LOAD_PORTS"] for ct in c["VALID_CONTAINERS"])
+    for n, lane in zip(range(rows), lanes):
+        yield _values(*lane, n)
+
+
+def prepare(directory: Path, rows: int) -> None:
+    """Input files and an empty schema for one size; not timed."""
+    from sqlalchemy import create_engine, insert
+    from lib.db.models import Base, RegistryValue
+    from lib.exporter import EXPORT_HEADERS, EXPORT_HEADERS_WITH_CUSTOMER, write_excel, write_rows
+    from lib.importer import RATE_FIELDS
+
+    engine = create_engine(f"sqlite:///{directory / 'empty.db'}", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(RegistryValue), [
+            {"kind": "destination_port", "value": p} for p in tariff_ports(rows)
+        ])
+    engine.dispose()
+
+    with open(directory / "rates.jsonl", "w") as fh:
+        for customer, values in synthetic_rates(rows):
+            fh.write(json.dumps(dict(values, customer=customer)) + "\n")
+    write_excel(
+        directory / "quote.xlsx", EXPORT_HEADERS_WITH_CUSTOMER,
+        ([customer] + [v[k] for k in RATE_FIELDS] for customer, v in synthetic_rates(rows)),
+        "Quote", title="Benchmark rates",
+    )
+    write_rows(
+        directory / "quote.csv", EXPORT_HEADERS_WITH_CUSTOMER,
+        ([customer] + [v[k] for k in RATE_FIELDS] for customer, v in synthetic_rates(rows)), "Quote",
+    )
+    write_excel(
+        directory / "tariff.xlsx", EXPORT_HEADERS,
+        ([v[k] for k in RATE_FIELDS] for v in synthetic_tariffs(rows)), "Tariff Rates",
+    )
+
+
+def run_operation(name: str, directory: Path) -> dict:
+    """Run one operation in this process (``RATE_MANAGER_DB_URL`` already
+    points at its database) and return its timing and peak RSS."""
+    from sqlalchemy import select
+    from lib.db import seed
+    from lib.db.models import Session, Rate
+    from lib.exporter import export_destination_rates
+    from lib.helpers import export_rates_to_excel, load_data
+    from lib.importer import RateSheet, import_rate_sheet, import_tariff_sheet
+    from lib.pricing import LaneIndex
+    from lib.queries import destination_ports
+    from lib.repository import find_customer, find_rate, unit_of_work
+
+    out = directory / "out"
+    out.mkdir(exist_ok=True)
+    extra = {}
+
+    def op_seed():
+        with contextlib.redirect_stdout(io.StringIO()):
+            seed.main(["--rates", str(directory / "rates.jsonl"), "--tariffs", str(directory / "none.json")])
+
+    def op_load_data():
+        extra["customers"] = len(load_data())
+
+    def op_export_rates_to_excel():
+        s = Session()
+        try:
+            rates = s.scalars(select(Rate).order_by(Rate.id).execution_options(yield_per=5000))
+            export_rates_to_excel(rates, "Bench", out)
+        finally:
+            s.close()
+
+    def op_export_destination(fmt="xlsx"):
+        s = Session()
+        try:
+            extra["files"] = len([export_destination_rates(s, port, out, fmt) for port in destination_ports(s)])
+        finally:
+            s.close()
+
+    def op_export_destination_csv():
+        op_export_destination("csv")
+
+    def op_lookup():
+        s = Session()
+        try:
+            started = time.perf_counter()
+            index = LaneIndex.load(s)
+            extra["index_load_seconds"] = round(time.perf_counter() - started, 4)
+            lanes = [(c, v["load_port"], v["destination_port"], v["container_type"])
+                     for c, v in synthetic_rates(min(LOOKUPS, _rows()))]
+            started = time.perf_counter()
+            index.price_many(lanes)
+            extra["cached_price_us"] = round((time.perf_counter() - started) / len(lanes) * 1e6, 3)
+            started = time.perf_counter()
+            for customer, lp, dp, ct in lanes:
+                find_rate(s, find_customer(s, customer).id, lp, dp, ct)
+            extra["db_lookup_us"] = round((time.perf_counter() - started) / len(lanes) * 1e6, 3)
+        finally:
+            s.close()
+
+    def op_import_quote(name="quote.xlsx"):
+        with RateSheet(str(directory / name)) as sheet, unit_of_work(Session) as s:
+            extra["new"], extra["updated"], extra["skipped"] = import_rate_sheet(s, sheet)
+
+    op_reimport_quote = op_import_quote
+
+    def op_import_quote_csv():
+        op_import_quote("quote.csv")
+
+    def op_import_tariff_rates():
+        with RateSheet(str(directory / "tariff.xlsx"), allow_customer=False) as sheet, \
+                unit_of_work(Session) as s:
+            extra["new"], extra["updated"], extra["skipped"] = import_tariff_sheet(s, sheet)
+
+    def _rows():
+        return int(os.environ["BENCH_ROWS"])
+
+    operation = locals()[f"op_{name}"]
+    started = time.perf_counter()
+    operation()
+    elapsed = time.perf_counter() - started
+    return dict(
+        extra, seconds=elapsed,
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+
+
+def _worker(name: str, directory: Path, db: Path, rows: int) -> dict:
+    env = dict(os.environ, RATE_MANAGER_DB_URL=f"sqlite:///{db}", BENCH_ROWS=str(rows))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--worker", name, "--dir", str(directory)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_size(rows: int, repeat: int, operations) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        prepare(directory, rows)
+        seeded = directory / "seeded.db"
+        # Everything that reads needs a seeded database.
+        for name in ["seed"] + [op for op in operations if op != "seed"]:
+            runs = []
+            for i in range(repeat):
+                if name in FRESH_DB:
+                    db = directory / f"{name}.db"
+                    shutil.copy(directory / "empty.db", db)
+                elif name == "reimport_quote":
+                    # Same rows as seeded, so this times the unchanged-row path.
+                    db = directory / "reimport.db"
+                    shutil.copy(seeded, db)
+                else:
+                    db = seeded
+                runs.append(_worker(name, directory, db, rows))
+                if name == "seed":
+                    shutil.copy(db, seeded)
+            if name not in operations:
+                continue
+            seconds = [r.pop("seconds") for r in runs]
+            median = statistics.median(seconds)
+            results.append(dict(
+                runs[-1], rows=rows, operation=name,
+                seconds=round(median, 4), seconds_all=[round(s, 4) for s in seconds],
+                rows_per_second=round(rows / median) if median else None,
+                peak_rss_mb=max(r["peak_rss_mb"] for r in runs),
+            ))
+            print(f"{rows:>9} {name:<22} {median:9.3f}s {results[-1]['peak_rss_mb']:8.1f} MB",
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Operations whose time or peak RSS grew by more than ``tolerance``."""
+    before = {(r["rows"], r["operation"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = before.get((r["rows"], r["operation"]))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if old[metric] and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append({
+                    "rows": r["rows"], "operation": r["operation"], "metric": metric,
+                    "baseline": old[metric], "current": r[metric],
+                    "change": round(r[metric] / old[metric] - 1, 3),
+                })
+    return regressions
+
+
+def _meta() -> dict:
+    import sqlalchemy
+    import openpyxl
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+        "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+        "sqlalchemy": sqlalchemy.__version__, "openpyxl": openpyxl.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=OPERATIONS, help="run only these operations")
+    parser.add_argument("--output", type=Path, help="also write the results to this file")
+    parser.add_argument("--compare", type=Path, help="baseline results to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--worker", choices=OPERATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_operation(args.worker, args.dir)))
+        return 0
+
+    operations = args.only or OPERATIONS
+    results = [r for rows in args.rows for r in run_size(rows, args.repeat, operations)]
+    report = {"meta": _meta(), "results": results}
+    if args.compare:
+        report["regressions"] = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
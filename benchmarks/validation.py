@@ -0,0 +1,87 @@
+"""Per-row cost of the import validation stage against plain coercion.
+
+    python -m benchmarks.validation --rows 1000000
+
+Runs the same synthetic sheet rows (with ``--bad`` percent typos) through
+the old coerce-to-0.0 normalisation and through ``Validator`` with the
+registry, and prints both timings as JSON.
+"""
+import argparse
+import json
+import random
+import time
+
+from lib.registry import Registry, load_constants, KINDS
+from lib.validation import Validator
+
+TYPOS = ["5OO", "", "n/a", "SYD", "40H"]
+
+
+def _legacy_f(x):
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def legacy_normalise(row):
+    """The pre-validation import normalisation, kept here as the baseline."""
+    lp, dp, ct, fr, othc, doc, cmr, ams, lss, dthc, ft = row
+    return dict(
+        load_port=str(lp or "").strip(), destination_port=str(dp or "").strip(),
+        container_type=str(ct or "").strip(), freight_usd=_legacy_f(fr), othc_aud=_legacy_f(othc),
+        doc_aud=_legacy_f(doc), cmr_aud=_legacy_f(cmr), ams_usd=_legacy_f(ams),
+        lss_usd=_legacy_f(lss), dthc=str(dthc or "").upper(), free_time=str(ft or ""),
+    )
+
+
+def synthetic_rows(n, registry, bad_percent, seed=11):
+    rnd = random.Random(seed)
+    choices = registry.choices
+    rows = []
+    for _ in range(n):
+        row = [
+            rnd.choice(choices["load_port"]), rnd.choice(choices["destination_port"]),
+            rnd.choice(choices["container_type"]), rnd.randint(100, 4000), 300, 100.0, 20,
+            35, 30, rnd.choice(choices["dthc"]), "14 Days",
+        ]
+        if rnd.random() * 100 < bad_percent:
+            row[rnd.choice((0, 2, 3))] = rnd.choice(TYPOS)
+        rows.append(tuple(row))
+    return rows
+
+
+def _time(fn, rows):
+    started = time.perf_counter()
+    for row in rows:
+        fn(row)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--bad", type=float, default=1.0, help="Percent of rows with a typo")
+    args = parser.parse_args(argv)
+
+    constants = load_constants()
+    registry = Registry({kind: constants.get(name, []) for kind, name in KINDS.items()})
+    rows = synthetic_rows(args.rows, registry, args.bad)
+    validate = Validator(registry).validate
+
+    legacy = _time(legacy_normalise, rows)
+    validated = _time(validate, rows)
+    rejected = sum(1 for row in rows if validate(row)[1])
+
+    print(json.dumps({
+        "rows": args.rows,
+        "rejected": rejected,
+        "legacy_seconds": round(legacy, 3),
+        "validator_seconds": round(validated, 3),
+        "validator_rows_per_second": round(args.rows / validated),
+        "overhead_ns_per_row": round((validated - legacy) / args.rows * 1e9),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,42 @@
+from operator import attrgetter
+
+RATE_FIELDS = (
+    "load_port",
+    "destination_port",
+    "container_type",
+    "freight_usd",
+    "othc_aud",
+    "doc_aud",
+    "cmr_aud",
+    "ams_usd",
+    "lss_usd",
+    "dthc",
+    "free_time",
+)
+LANE_FIELDS = RATE_FIELDS[:3]
+_rate_values = attrgetter(*RATE_FIELDS)
+_lane = attrgetter(*LANE_FIELDS)
+
+
+def _lane_field(name):
+    slot = "_" + name
+
+    def set_value(self, value):
+        setattr(self, slot, value)
+        # The customer holding this rate indexed it under the old lane.
+        if self._owner is not None:
+            self._owner._lanes = None
+
+    return property(attrgetter(slot), set_value)
+
+
 class Rate:
+    __slots__ = tuple("_" + name for name in LANE_FIELDS) + RATE_FIELDS[3:] + ("_owner",)
+
+    load_port = _lane_field("load_port")
+    destination_port = _lane_field("destination_port")
+    container_type = _lane_field("container_type")
+
     def __init__(
         self,
         load_port,
@@ -13,9 +51,9 @@ class Rate:
         dthc,
         free_time,
     ):
-        self.load_port = load_port
-        self.destination_port = destination_port
-        self.container_type = container_type
+        self._load_port = load_port
+        self._destination_port = destination_port
+        self._container_type = container_type
         self.freight_usd = freight_usd
         self.othc_aud = othc_aud
         self.doc_aud = doc_aud
@@ -24,36 +62,13 @@ class Rate:
         self.lss_usd = lss_usd
         self.dthc = dthc
         self.free_time = free_time
+        self._owner = None
 
     def to_dict(self):
-        return {
-            "load_port": self.load_port,
-            "destination_port": self.destination_port,
-            "container_type": self.container_type,
-            "freight_usd": self.freight_usd,
-            "othc_aud": self.othc_aud,
-            "doc_aud": self.doc_aud,
-            "cmr_aud": self.cmr_aud,
-            "ams_usd": self.ams_usd,
-            "lss_usd": self.lss_usd,
-            "dthc": self.dthc,
-            "free_time": self.free_time,
-        }
+        return dict(zip(RATE_FIELDS, _rate_values(self)))
 
     def to_row(self):
-        return [
-            self.load_port,
-            self.destination_port,
-            self.container_type,
-            self.freight_usd,
-            self.othc_aud,
-            self.doc_aud,
-            self.cmr_aud,
-            self.ams_usd,
-            self.lss_usd,
-            self.dthc,
-            self.free_time,
-        ]
+        return list(_rate_values(self))
 
     def __str__(self):
         return (
@@ -64,22 +79,84 @@ class Rate:
         )
 
 
+class RateList(list):
+    """A customer's rates. It is a plain list, but any change other than
+    adding at the end makes the customer rebuild its lane index."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner, rates=()):
+        super().__init__(rates)
+        self._owner = owner
+
+
+def _reindexing(name):
+    method = getattr(list, name)
+
+    def change(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._owner._lanes = None
+        return result
+
+    change.__name__ = name
+    return change
+
+
+for _name in ("__setitem__", "__delitem__", "__imul__", "insert", "pop", "remove",
+              "clear", "sort", "reverse"):
+    setattr(RateList, _name, _reindexing(_name))
+
+
 class Customer:
+    __slots__ = ("name", "_rates", "_lanes", "_indexed")
+
     def __init__(self, name):
         self.name = name
         self.rates = []
 
+    @property
+    def rates(self):
+        return self._rates
+
+    @rates.setter
+    def rates(self, rates):
+        self._rates = RateList(self, rates)
+        self._lanes = None
+
+    def _index(self):
+        # lane -> position of the first rate on that lane. Appended rates are
+        # indexed on the next lookup; every other change drops the index.
+        rates = self._rates
+        if self._lanes is None:
+            self._lanes, self._indexed = {}, 0
+        lanes = self._lanes
+        for i in range(self._indexed, len(rates)):
+            rate = rates[i]
+            rate._owner = self
+            lanes.setdefault(_lane(rate), i)
+        self._indexed = len(rates)
+        return lanes
+
+    def find_rate(self, load_port, destination_port, container_type):
+        i = self._index().get((load_port, destination_port, container_type))
+        return None if i is None else self._rates[i]
+
     def add_rate(self, rate):
-        self.rates.append(rate)
+        self._rates.append(rate)
+
+    def remove_rate(self, rate):
+        self._rates.remove(rate)
 
     def to_dict(self):
-        return {"name": self.name, "rates": [rate.to_dict() for rate in self.rates]}
+        return {"name": self.name, "rates": [rate.to_dict() for rate in self._rates]}
 
     def __str__(self):
-        return f"Customer: {self.name} | {len(self.rates)} rates"
+        return f"Customer: {self.name} | {len(self._rates)} rates"
 
 
 class TariffRate(Rate):
+    __slots__ = ()
+
     def __init__(self, load_port, destination_port, container_type, tariff_values):
         super().__init__(
             load_port,
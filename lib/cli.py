@@ -1,25 +1,41 @@
+import argparse
+import csv
+import json
+import os
+import sys
 import questionary
 import importlib
 from lib.db.models import Session, Customer, Rate
 from tabulate import tabulate
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font
 from datetime import datetime
-import re
 from lib.helpers import (
-    load_data, get_valid_ports, rate_values_prompt, format_rate_choice,
-    TariffManager, export_rates_to_excel, export_tariff_rates_to_excel
+    load_data, ask_customer, get_valid_ports, rate_values_prompt, format_rate_choice,
+    TariffManager, export_tariff_rates_to_excel
+)
+from lib.importer import (
+    RATE_FIELDS, Progress, RateSheet, expand_paths, import_rate_files,
+    import_rate_sheet, import_tariff_sheet,
+)
+from lib.exporter import (
+    EXPORT_HEADERS_WITH_CUSTOMER,
+    export_customer_quote, export_destination_rates,
+)
+from lib import instrumentation
+from lib.formats import SUFFIXES
+from lib.history import lane_history, rate_as_of
+from lib.pricing import LaneIndex
+from lib.registry import KINDS, add_value, get_registry, remove_value
+from lib.repository import (
+    delete_rates, find_rate, get_or_create_customer, save_rate, unit_of_work, update_rate,
+)
+from lib.reports import export_margin_report
+from lib.queries import (
+    customer_names, customer_rates_stmt, destination_ports, filtered_rates_stmt, rate_page,
 )
 from pathlib import Path
 EXPORT_DIR = "exports"
 Path(EXPORT_DIR).mkdir(exist_ok=True)
 
-EXPORT_HEADERS = [
-    "POL","POD","Container","Freight USD","OTHC AUD","DOC AUD",
-    "CMR AUD","AMS USD","LSS USD","DTHC","Free Time"
-]
-EXPORT_HEADERS_WITH_CUSTOMER = ["Customer"] + EXPORT_HEADERS
-
 
 def main_menu():
     while True:
@@ -38,435 +54,289 @@ def main_menu():
             ],
         ).ask()
 
-        if choice == "Add Rate":
-            add_rate()
-        elif choice == "View Rates":
-            view_rates()
-        elif choice == "Edit Rates":
-            edit_rates()
-        elif choice == "Delete Rate":
-            delete_rate()
-        elif choice == "Export Quote to Excel":
-            export_quote()
-        elif choice == "Export Customers by Destination Port":
-            export_by_destination()
-        elif choice == "Import Quote from Excel":
-            import_quote()
-        elif choice == "Manage Tariff Rates":
-            manage_tariff_rate()
-        elif choice == "Exit":
+        if choice == "Exit":
             print("Exiting Rate Manager App")
             break
 
+        with instrumentation.action(choice):
+            if choice == "Add Rate":
+                add_rate()
+            elif choice == "View Rates":
+                view_rates()
+            elif choice == "Edit Rates":
+                edit_rates()
+            elif choice == "Delete Rate":
+                delete_rate()
+            elif choice == "Export Quote to Excel":
+                export_quote()
+            elif choice == "Export Customers by Destination Port":
+                export_by_destination()
+            elif choice == "Import Quote from Excel":
+                import_quote()
+            elif choice == "Manage Tariff Rates":
+                manage_tariff_rate()
+
 
 def add_rate():
     customer_name = questionary.text("Enter customer name:").ask().strip().upper()
     load_ports, dest_ports, containers, dthc_values = get_valid_ports()
     values = rate_values_prompt(load_ports, dest_ports, containers, dthc_values)
 
-    s = Session()
-    try:
-        customer = s.query(Customer).filter_by(name=customer_name).first()
-        if not customer:
-            customer = Customer(name=customer_name)
-            s.add(customer)
-            s.flush()
-
-        existing = s.query(Rate).filter_by(
-            customer_id=customer.id,
-            load_port=values["load_port"],
-            destination_port=values["destination_port"],
-            container_type=values["container_type"],
-        ).first()
+    with unit_of_work(Session) as s:
+        customer = get_or_create_customer(s, customer_name)
+        existing = find_rate(
+            s, customer.id,
+            values["load_port"], values["destination_port"], values["container_type"],
+        )
 
         if existing:
             print("\n A rate for this route and container type already exists.")
             print("Existing:", format_rate_choice(existing, 0))
-            if questionary.confirm("Do you want to update the existing rate?").ask():
-                for k in ("freight_usd","othc_aud","doc_aud","cmr_aud","ams_usd","lss_usd","dthc","free_time"):
-                    setattr(existing, k, values[k])
-            else:
+            if not questionary.confirm("Do you want to update the existing rate?").ask():
                 print("\n Skipped.\n")
                 return
-        else:
-            s.add(Rate(customer_id=customer.id, **values))
 
-        s.commit()
-        print("\n Rate saved.\n")
-    finally:
-        s.close()
+        save_rate(s, customer.id, values, existing)
+    print("\n Rate saved.\n")
+
+def _rate_filters():
+    if not questionary.confirm("Filter rates?", default=False).ask():
+        return {}
+    prompts = [
+        ("customer", "Customer name starts with (blank for all):"),
+        ("load_port", "POL (blank for all):"),
+        ("destination_port", "POD (blank for all):"),
+        ("container_type", "Container (blank for all):"),
+    ]
+    filters = {}
+    for key, prompt in prompts:
+        value = (questionary.text(prompt).ask() or "").strip().upper()
+        if value:
+            filters[key] = value
+    return filters
 
 def view_rates():
-    customers = load_data()
-    if not customers:
-        print("\n No rates found. Please add rates first")
-        return
+    filters = _rate_filters()
+    previous = []
+    after = None
 
-    headers = ["POL","POD","Container","Freight USD","OTHC AUD","DOC AUD","CMR AUD","AMS USD","LSS USD","DTHC","Free Time"]
-    for customer in customers:
-        print(f"\nCustomer: {customer.name}")
-        rows = [[
-            r.load_port, r.destination_port, r.container_type,
-            r.freight_usd, r.othc_aud, r.doc_aud, r.cmr_aud,
-            r.ams_usd, r.lss_usd, r.dthc, r.free_time
-        ] for r in customer.rates]
-        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    s = Session()
+    try:
+        while True:
+            rows, next_after = rate_page(s, filters, after=after)
+            if not rows and after is None:
+                print("\n No rates found. Please add rates first" if not filters
+                      else "\n No rates match those filters.")
+                return
 
-def edit_rates():
-    customers = load_data()
-    if not customers:
-        print("\n No rates found.")
-        return
+            print(f"\nPage {len(previous) + 1}")
+            instrumentation.record_rows(len(rows))
+            with instrumentation.phase("render"):
+                print(tabulate(rows, headers=EXPORT_HEADERS_WITH_CUSTOMER, tablefmt="grid"))
+
+            choices = []
+            if next_after is not None:
+                choices.append("Next page")
+            if previous:
+                choices.append("Previous page")
+            choices.append("Back to Main Menu")
+            action = questionary.select("Rates:", choices=choices).ask()
+
+            if action == "Next page":
+                previous.append(after)
+                after = next_after
+            elif action == "Previous page":
+                after = previous.pop()
+            else:
+                return
+    finally:
+        s.close()
 
-    customer_choices = [c.name for c in customers]
-    customer_name = questionary.autocomplete(
-        "Select Customer:",
-        choices=customer_choices,
-        validate=lambda text: text in customer_choices
-        or "Please select a valid customer",
-    ).ask()
-    customer = next(c for c in customers if c.name == customer_name)
+def _pick_customer_rate(action):
+    """Prompt for a customer, then one of their rates. Only that customer's
+    rates are read; returns the ``(id, *RATE_FIELDS)`` row or ``None``."""
+    s = Session()
+    try:
+        if not customer_names(s, limit=1):
+            print("\n No rates found.")
+            return None
+        customer_name = ask_customer(s)
+        rows = s.execute(customer_rates_stmt(customer_name, Rate.id)).all()
+    finally:
+        s.close()
 
-    if not customer.rates:
+    if not rows:
         print("\n Customer has no rates.")
-        return
-
+        return None
     rate_choices = [
         f"{idx + 1}: {r.load_port} to {r.destination_port} ({r.container_type})"
-        for idx, r in enumerate(customer.rates)
+        for idx, r in enumerate(rows)
     ]
-    selected = questionary.select("Select Rate to Edit:", choices=rate_choices).ask()
-    rate_idx = int(selected.split(":")[0]) - 1
-    rate = customer.rates[rate_idx]
+    selected = questionary.select(f"Select Rate to {action}:", choices=rate_choices).ask()
+    return rows[int(selected.split(":")[0]) - 1]
+
+def edit_rates():
+    rate = _pick_customer_rate("Edit")
+    if rate is None:
+        return
 
     load_ports, dest_ports, containers, dthc_values = get_valid_ports()
     values = rate_values_prompt(
         load_ports, dest_ports, containers, dthc_values,
-        defaults={
-            "load_port": rate.load_port, "destination_port": rate.destination_port,
-            "container_type": rate.container_type, "freight_usd": rate.freight_usd,
-            "othc_aud": rate.othc_aud, "doc_aud": rate.doc_aud, "cmr_aud": rate.cmr_aud,
-            "ams_usd": rate.ams_usd, "lss_usd": rate.lss_usd, "dthc": rate.dthc,
-            "free_time": rate.free_time,
-        },
+        defaults={k: getattr(rate, k) for k in RATE_FIELDS},
     )
 
-    s = Session()
-    try:
-        db_rate = s.query(Rate).filter_by(
-            customer_id=rate.customer_id,
-            load_port=rate.load_port,
-            destination_port=rate.destination_port,
-            container_type=rate.container_type,
-        ).first()
-        for k in ("load_port","destination_port","container_type","freight_usd","othc_aud",
-                  "doc_aud","cmr_aud","ams_usd","lss_usd","dthc","free_time"):
-            setattr(db_rate, k, values[k])
-        s.commit()
-        print("\n Rate updated.\n")
-    finally:
-        s.close()
+    with unit_of_work(Session) as s:
+        updated = update_rate(s, rate.id, values)
+    print("\n Rate updated.\n" if updated else "\n Rate not found.\n")
 
 def delete_rate():
-    customers = load_data()
-    if not customers:
-        print("\n No rates found.")
+    target = _pick_customer_rate("Delete")
+    if target is None:
         return
 
-    customer_choices = [c.name for c in customers]
-    customer_name = questionary.select(
-        "Select Customer:", choices=customer_choices
-    ).ask()
-    customer = next(c for c in customers if c.name == customer_name)
-
-    if not customer.rates:
-        print("\n Customer has no rates.")
-        return
-    rate_choices = [
-        f"{idx + 1}: {r.load_port} to {r.destination_port} ({r.container_type})"
-        for idx, r in enumerate(customer.rates)
-    ]
-    selected = questionary.select("Select Rate to Delete:", choices=rate_choices).ask()
-    rate_idx = int(selected.split(":")[0]) - 1
-    target = customer.rates[rate_idx]    
-
     if not questionary.confirm("Confirm to delete rate?").ask():
         print("\nCancelled. \n")
         return
 
-    s = Session()
-    try:
-        obj = s.query(Rate).filter_by(
-            customer_id=target.customer_id,
-            load_port=target.load_port,
-            destination_port=target.destination_port,
-            container_type=target.container_type,
-        ).first()
-        if obj:
-            s.delete(obj)
-            s.commit()
-            print(f"\n Deleted rate: {target.load_port} to {target.destination_port}\n")
-        else:
-            print("\n Rate not found.\n")
-    finally:
-        s.close()
+    with unit_of_work(Session) as s:
+        deleted = delete_rates(s, [target.id])
+    if deleted:
+        print(f"\n Deleted rate: {target.load_port} to {target.destination_port}\n")
+    else:
+        print("\n Rate not found.\n")
 
 
 def export_quote():
-    customers = load_data()
-
-    if not customers:
-        print("\n No rates found.")
-        return
+    s = Session()
+    try:
+        customer_choices = customer_names(s)
+        if not customer_choices:
+            print("\n No rates found.")
+            return
 
-    customer_choices = [c.name for c in customers]
-    customer_name = questionary.select(
-        "Select Customer:", choices=customer_choices
-    ).ask()
+        customer_name = questionary.select(
+            "Select Customer:", choices=customer_choices
+        ).ask()
 
-    customer = next(c for c in customers if c.name == customer_name)
+        filename, _ = export_customer_quote(s, customer_name, EXPORT_DIR)
+    finally:
+        s.close()
 
-    if not customer.rates:
+    if filename is None:
         print("\n Customer has no rates.")
         return
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Quote"
-
-    ws["A1"] = f"Customer: {customer.name}"
-    ws["A1"].font = Font(bold=True, size=14)
-
-    ws.append([])
-
-    ws.append(EXPORT_HEADERS)
-
-    for cell in ws[3]:
-        cell.font = Font(bold=True)
-
-    for r in customer.rates:
-        row = [r.load_port, r.destination_port, r.container_type,
-        r.freight_usd, r.othc_aud, r.doc_aud, r.cmr_aud,
-        r.ams_usd, r.lss_usd, r.dthc, r.free_time]
-        ws.append(row)
-
-    for column_cells in ws.columns:
-        length = max(len(str(cell.value)) for cell in column_cells)
-        col_letter = column_cells[0].column_letter
-        ws.column_dimensions[col_letter].width = length + 2
-
-    safe_name = re.sub(r"\W+", "_", customer_name)
-    current_date = datetime.now().strftime("%d_%m_%Y")
-    filename = f"{EXPORT_DIR}/Quote_{safe_name}_{current_date}.xlsx"
-    wb.save(filename)
-
     print(f"\n Quote exported to {filename}\n")
 
 
 def export_by_destination():
-    customers = load_data()
-
-    if not customers:
-        print("\n No rates found.")
-        return
-
-    all_dest_ports = sorted(set(r.destination_port for c in customers for r in c.rates))
-
-    dest_port = questionary.select(
-        "Select Destination Port to export:", choices=all_dest_ports
-    ).ask()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Quote"
-
-    ws["A1"] = f"Destination Port: {dest_port}"
-    ws["A1"].font = Font(bold=True, size=14)
-
-    ws.append([])
-
-    ws.append(EXPORT_HEADERS_WITH_CUSTOMER)
-
-    for cell in ws[3]:
-        cell.font = Font(bold=True)
-
-    rates_exported = 0
+    s = Session()
+    try:
+        all_dest_ports = destination_ports(s)
+        if not all_dest_ports:
+            print("\n No rates found.")
+            return
 
-    for customer in customers:
-        matching_rates = [r for r in customer.rates if r.destination_port == dest_port]
-        for rate in matching_rates:
-            ws.append([
-                customer.name,
-                rate.load_port, rate.destination_port, rate.container_type,
-                rate.freight_usd, rate.othc_aud, rate.doc_aud, rate.cmr_aud,
-                rate.ams_usd, rate.lss_usd, rate.dthc, rate.free_time
-            ])
-            rates_exported += 1
+        dest_port = questionary.select(
+            "Select Destination Port to export:", choices=all_dest_ports
+        ).ask()
 
-    for column_cells in ws.columns:
-        length = max(len(str(cell.value)) for cell in column_cells)
-        col_letter = column_cells[0].column_letter
-        ws.column_dimensions[col_letter].width = length + 2
+        filename, rates_exported = export_destination_rates(s, dest_port, EXPORT_DIR)
+    finally:
+        s.close()
 
-    if rates_exported == 0:
+    if filename is None:
         print(f"\n No rates found for {dest_port}.")
         return
-
-    safe_dest = re.sub(r"\W+", "_", dest_port)
-    current_date = datetime.now().strftime("%d_%m_%Y")
-
-    filename = f"{EXPORT_DIR}/Rates_{safe_dest}_{current_date}.xlsx"
-    wb.save(filename)
-
     print(f"\n Exported {rates_exported} rates for {dest_port} to {filename}\n")
 
 
-def import_quote():
+def _legacy_load_data():
+    """``load_data`` of a legacy ``main`` module, if one is installed."""
     try:
-        legacy_main = importlib.import_module("main")
-        load_data_fn = getattr(legacy_main, "load_data", load_data)
+        load_data_fn = getattr(importlib.import_module("main"), "load_data", None)
     except Exception:
-        load_data_fn = load_data
+        return None
+    return None if load_data_fn is load_data else load_data_fn
+
 
-    customers = load_data_fn()
+def import_quote():
+    # Only the legacy in-memory store is loaded up front; database imports
+    # look up the one target customer and stream the file.
+    legacy_load_data = _legacy_load_data()
+    customers = legacy_load_data() if legacy_load_data else []
     legacy_mode = bool(customers) and customers[0].__class__.__module__ == "customer"
     if legacy_mode:
         from customer import Rate as LegacyRate
 
     file_path = questionary.text(
-        "Enter path to Excel file to import:", default=f"{EXPORT_DIR}/"
+        "Enter path to rate file to import (.xlsx, .csv, .parquet, .arrow):", default=f"{EXPORT_DIR}/"
     ).ask()
 
     try:
-        wb = load_workbook(filename=file_path)
+        sheet = RateSheet(file_path)
     except Exception as e:
         print(f"\n Could not open file: {e}\n")
         return
 
-    ws = wb.active
-    first_header = (ws["A3"].value or "").strip().lower()
-    is_multi_customer = first_header == "customer"
-    start_row = 4 if is_multi_customer else 2
+    with sheet:
+        is_multi_customer = sheet.is_multi_customer
 
-    if not is_multi_customer:
-        customer_choices = [c.name for c in customers]
-        if not customer_choices:
-            print("\n No customers found. Add at least one rate or choose a multi-customer file.\n")
-            return
-        customer_name = questionary.select(
-            "Select Customer to import rates to:", choices=customer_choices
-        ).ask()
-
-        target_customer = next((c for c in customers if c.name == customer_name), None)
-        if not target_customer and not legacy_mode:
+        if not is_multi_customer and legacy_mode:
+            customer_name = questionary.select(
+                "Select Customer to import rates to:", choices=[c.name for c in customers]
+            ).ask()
+            target_customer = next((c for c in customers if c.name == customer_name), None)
+        elif not is_multi_customer:
             s = Session()
             try:
-                target_customer = s.query(Customer).filter_by(name=customer_name).first()
-                if not target_customer:
-                    target_customer = Customer(name=customer_name)
-                    s.add(target_customer)
-                    s.commit()
+                if not customer_names(s, limit=1):
+                    print("\n No customers found. Add at least one rate or choose a multi-customer file.\n")
+                    return
+                customer_name = ask_customer(s, "Select Customer to import rates to:")
             finally:
                 s.close()
 
-    s = Session() if not legacy_mode else None
-    new_count = updated_count = skipped_count = 0
-    try:
-        for row in ws.iter_rows(min_row=start_row, values_only=True):
-            if row is None or all(v is None for v in row):
-                continue
-
-            if is_multi_customer:
-                (
-                    customer_name, load_port, destination_port, container_type,
-                    freight_usd, othc_aud, doc_aud, cmr_aud,
-                    ams_usd, lss_usd, dthc, free_time
-                ) = row
-
-                customer_name = (customer_name or "").strip().upper()
-                if not customer_name:
-                    skipped_count += 1
-                    continue
-
-                if legacy_mode:
-                    target_customer = next((c for c in customers if c.name == customer_name), None)
-                    if not target_customer:
-                        from customer import Customer as LegacyCustomer
-                        target_customer = LegacyCustomer(customer_name)
-                        customers.append(target_customer)
-                else:
-                    target_customer = s.query(Customer).filter_by(name=customer_name).first()
-                    if not target_customer:
-                        target_customer = Customer(name=customer_name)
-                        s.add(target_customer)
-                        s.flush()
-            else:
-                (
-                    load_port, destination_port, container_type,
-                    freight_usd, othc_aud, doc_aud, cmr_aud,
-                    ams_usd, lss_usd, dthc, free_time
-                ) = row
-
-            def _f(x):
-                try:
-                    return float(x)
-                except Exception:
-                    return 0.0
-
-            values = dict(
-                load_port=(load_port or "").strip(),
-                destination_port=(destination_port or "").strip(),
-                container_type=(container_type or "").strip(),
-                freight_usd=_f(freight_usd),
-                othc_aud=_f(othc_aud),
-                doc_aud=_f(doc_aud),
-                cmr_aud=_f(cmr_aud),
-                ams_usd=_f(ams_usd),
-                lss_usd=_f(lss_usd),
-                dthc=str(dthc or "").upper(),
-                free_time=str(free_time or ""),
-            )
-
-            if legacy_mode:
-                legacy_rate = LegacyRate(
-                    values["load_port"], values["destination_port"], values["container_type"],
-                    values["freight_usd"], values["othc_aud"], values["doc_aud"], values["cmr_aud"],
-                    values["ams_usd"], values["lss_usd"], values["dthc"], values["free_time"],
-                )
-                from lib.helpers import replace_or_add_rate
-                before = len(getattr(target_customer, "rates", []))
-                replace_or_add_rate(target_customer, legacy_rate, replace_existing=True)
-                after = len(getattr(target_customer, "rates", []))
-                if after > before:
-                    new_count += 1
-                else:
-                    updated_count += 1
-            else:
-                existing = s.query(Rate).filter_by(
-                    customer_id=target_customer.id,
-                    load_port=values["load_port"],
-                    destination_port=values["destination_port"],
-                    container_type=values["container_type"],
-                ).first()
-
-                if existing:
-                    changed = any(getattr(existing, k) != v for k, v in values.items())
-                    if changed:
-                        for k, v in values.items():
-                            setattr(existing, k, v)
-                        updated_count += 1
+        new_count = updated_count = skipped_count = 0
+        progress = Progress("Imported")
+
+        if legacy_mode:
+            from lib.helpers import replace_or_add_rate
+            from customer import Customer as LegacyCustomer
+            by_name = {}
+            for c in customers:
+                by_name.setdefault(c.name, c)
+            for chunk in sheet.chunks(progress):
+                for customer_name, values in chunk:
+                    if is_multi_customer:
+                        target_customer = by_name.get(customer_name)
+                        if not target_customer:
+                            target_customer = by_name[customer_name] = LegacyCustomer(customer_name)
+                            customers.append(target_customer)
+
+                    legacy_rate = LegacyRate(*(values[k] for k in RATE_FIELDS))
+                    before = len(getattr(target_customer, "rates", []))
+                    replace_or_add_rate(target_customer, legacy_rate, replace_existing=True)
+                    after = len(getattr(target_customer, "rates", []))
+                    if after > before:
+                        new_count += 1
                     else:
-                        skipped_count += 1
-                else:
-                    s.add(Rate(customer_id=target_customer.id, **values))
-                    new_count += 1
+                        updated_count += 1
+            skipped_count += sheet.skipped
+        else:
+            with unit_of_work(Session) as s:
+                new_count, updated_count, skipped_count = import_rate_sheet(
+                    s, sheet, None if is_multi_customer else customer_name, progress
+                )
 
-        if s:
-            s.commit()
-        print(f"\n Import complete: {new_count} new, {updated_count} updated, {skipped_count} skipped.\n")
-    finally:
-        if s:
-            s.close()
+        progress.done()
+
+    if sheet.unchanged:
+        print("\n File unchanged since it was last imported; nothing to do.\n")
+        return
+    print(f"\n Import complete: {new_count} new, {updated_count} updated, {skipped_count} skipped.\n")
+    if sheet.rejected:
+        print(f" {len(sheet.rejected)} rows rejected; see {sheet.write_rejected(EXPORT_DIR)}\n")
 
 def manage_tariff_rate():
     tariff_manager = TariffManager()
@@ -476,6 +346,7 @@ def manage_tariff_rate():
             "What would you like to do?",
             choices=[
                 "View Tariff Rates",
+                "Refresh Tariff Rates",
                 "Add Tariff Rate",
                 "Delete Tariff Rate",
                 "Export Tariff Rates to Excel",
@@ -485,7 +356,7 @@ def manage_tariff_rate():
         ).ask()
 
         if action == "View Tariff Rates":
-            tariff_manager.load_tariffs()
+            tariff_manager.ensure_loaded()
             if not tariff_manager.items:
                 print("\n No Tariff rates found.")
             else:
@@ -498,29 +369,37 @@ def manage_tariff_rate():
                     t.freight_usd, t.othc_aud, t.doc_aud, t.cmr_aud,
                     t.ams_usd, t.lss_usd, t.dthc, t.free_time
                 ] for t in tariff_manager.items]
-                print(tabulate(rows, headers=headers, tablefmt="grid"))            
+                with instrumentation.phase("render"):
+                    print(tabulate(rows, headers=headers, tablefmt="grid"))
+        elif action == "Refresh Tariff Rates":
+            tariff_manager.load_tariffs()
+            print(f"\n Loaded {len(tariff_manager.items)} tariff rates.\n")
         elif action == "Add Tariff Rate":
             load_ports, dest_ports, containers, dthc_values = get_valid_ports()
             values = rate_values_prompt(load_ports, dest_ports, containers, dthc_values)
-            tariff_manager.add_tariffs(
-                values["load_port"],
-                values["destination_port"],
-                values["container_type"],
-                {
-                    "freight_usd": values["freight_usd"],
-                    "othc_aud": values["othc_aud"],
-                    "doc_aud": values["doc_aud"],
-                    "cmr_aud": values["cmr_aud"],
-                    "ams_usd": values["ams_usd"],
-                    "lss_usd": values["lss_usd"],
-                    "dthc": values["dthc"],
-                    "free_time": values["free_time"],
-                },
-            )
+            try:
+                tariff_manager.add_tariffs(
+                    values["load_port"],
+                    values["destination_port"],
+                    values["container_type"],
+                    {
+                        "freight_usd": values["freight_usd"],
+                        "othc_aud": values["othc_aud"],
+                        "doc_aud": values["doc_aud"],
+                        "cmr_aud": values["cmr_aud"],
+                        "ams_usd": values["ams_usd"],
+                        "lss_usd": values["lss_usd"],
+                        "dthc": values["dthc"],
+                        "free_time": values["free_time"],
+                    },
+                )
+            except ValueError as e:
+                print(f"\n {e}\n")
+                continue
             print("\nTariff Added.\n")
 
         elif action == "Delete Tariff Rate":
-            tariff_manager.load_tariffs()
+            tariff_manager.ensure_loaded()
             if not tariff_manager.items:
                 print("\n No Tariff rates to delete.")
                 continue
@@ -533,7 +412,7 @@ def manage_tariff_rate():
             tariff_manager.delete_tariff(idx)
 
         elif action == "Export Tariff Rates to Excel":
-            tariff_manager.load_tariffs()
+            tariff_manager.ensure_loaded()
             if not tariff_manager.items:
                 print("\n No Tariff rates to export.")
                 continue
@@ -547,5 +426,410 @@ def manage_tariff_rate():
         elif action == "Back to Main Menu":
             break
 
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+
+
+def _emit(result):
+    print(json.dumps(result, default=str))
+
+
+def _fail(command, message, code=EXIT_ERROR):
+    print(json.dumps({"status": "error", "command": command, "error": message}), file=sys.stderr)
+    return code
+
+
+def _open_sheet(command, path, allow_customer=True):
+    try:
+        return RateSheet(path, allow_customer=allow_customer)
+    except Exception as e:
+        _fail(command, f"Could not open file: {e}")
+        return None
+
+
+def _filters_from_args(args):
+    return {
+        key: value.strip().upper()
+        for key, value in (
+            ("customer", args.customer), ("load_port", args.pol),
+            ("destination_port", args.pod), ("container_type", args.container),
+        )
+        if value
+    }
+
+
+def cmd_import_quote(args):
+    sheet = _open_sheet("import-quote", args.file)
+    if sheet is None:
+        return EXIT_ERROR
+    customer_name = (args.customer or "").strip().upper() or None
+
+    with sheet:
+        if not sheet.is_multi_customer and not customer_name:
+            return _fail("import-quote", "Single-customer file needs --customer.", EXIT_USAGE)
+        if sheet.is_multi_customer and customer_name:
+            return _fail("import-quote", "Multi-customer file takes its customers from the "
+                         "Customer column; drop --customer.", EXIT_USAGE)
+        with unit_of_work(Session) as s:
+            new, updated, skipped = import_rate_sheet(s, sheet, customer_name, force=args.force)
+
+    rejected_file = sheet.write_rejected(args.rejects_dir)
+    _emit({"status": "ok", "command": "import-quote", "file": args.file,
+           "new": new, "updated": updated, "skipped": skipped, "unchanged": sheet.unchanged,
+           "rejected": len(sheet.rejected), "rejected_file": rejected_file})
+    return EXIT_OK
+
+
+def cmd_import_batch(args):
+    paths = expand_paths(args.target)
+    if not paths:
+        return _fail("import-batch", f"No rate files found for {args.target}.")
+    customer_name = (args.customer or "").strip().upper() or None
+
+    summaries, totals = import_rate_files(
+        paths, customer_name, workers=args.workers, session_factory=Session, force=args.force,
+        rejects_dir=args.rejects_dir,
+    )
+    for summary in summaries:
+        _emit(dict(summary, status="error" if "error" in summary else "ok", command="import-batch"))
+    _emit(dict(totals, status="ok" if not totals["failed"] else "error", command="import-batch"))
+    return EXIT_OK if not totals["failed"] else EXIT_ERROR
+
+
+def cmd_import_tariff(args):
+    sheet = _open_sheet("import-tariff", args.file, allow_customer=False)
+    if sheet is None:
+        return EXIT_ERROR
+
+    with sheet, unit_of_work(Session) as s:
+        new, updated, skipped = import_tariff_sheet(s, sheet, force=args.force)
+
+    rejected_file = sheet.write_rejected(args.rejects_dir)
+    _emit({"status": "ok", "command": "import-tariff", "file": args.file,
+           "new": new, "updated": updated, "skipped": skipped, "unchanged": sheet.unchanged,
+           "rejected": len(sheet.rejected), "rejected_file": rejected_file})
+    return EXIT_OK
+
+
+def cmd_export_quote(args):
+    customer_name = args.customer.strip().upper()
+    s = Session()
+    try:
+        path, count = export_customer_quote(s, customer_name, args.dir, args.format)
+    finally:
+        s.close()
+
+    if path is None:
+        return _fail("export-quote", f"No rates found for customer {customer_name}.")
+    _emit({"status": "ok", "command": "export-quote", "file": str(path), "rows": count})
+    return EXIT_OK
+
+
+def cmd_export_destination(args):
+    dest_port = args.port.strip().upper()
+    s = Session()
+    try:
+        path, count = export_destination_rates(s, dest_port, args.dir, args.format)
+    finally:
+        s.close()
+
+    if path is None:
+        return _fail("export-destination", f"No rates found for {dest_port}.")
+    _emit({"status": "ok", "command": "export-destination", "file": str(path), "rows": count})
+    return EXIT_OK
+
+
+def cmd_list_rates(args):
+    filters = _filters_from_args(args)
+    stmt = filtered_rates_stmt(filters).order_by(Customer.name, Rate.id)
+    keys = ["customer"] + list(RATE_FIELDS)
+
+    s = Session()
+    try:
+        rows = s.execute(stmt.execution_options(yield_per=1000))
+        count = 0
+        if args.format == "csv":
+            writer = csv.writer(sys.stdout)
+            writer.writerow(EXPORT_HEADERS_WITH_CUSTOMER)
+            for part in rows.partitions():
+                writer.writerows(part)
+                count += len(part)
+        elif args.format == "json":
+            for row in rows:
+                print(json.dumps(dict(zip(keys, row))))
+                count += 1
+        else:
+            rows = list(rows)
+            count = len(rows)
+            with instrumentation.phase("render"):
+                print(tabulate(rows, headers=EXPORT_HEADERS_WITH_CUSTOMER, tablefmt="grid"))
+        instrumentation.record_rows(count)
+    finally:
+        s.close()
+    return EXIT_OK
+
+
+def cmd_price(args):
+    if args.file:
+        with open(args.file, newline="") as fh:
+            lanes = [tuple(row[:4]) for row in csv.reader(fh) if len(row) >= 4]
+        if lanes and lanes[0][0].strip().lower() == "customer":
+            lanes = lanes[1:]
+    elif args.customer and len(args.lane) == 3:
+        lanes = [(args.customer, *args.lane)]
+    else:
+        return _fail("price", "Give --customer with POL POD CONTAINER, or --file.", EXIT_USAGE)
+
+    s = Session()
+    try:
+        index = LaneIndex.load(s)
+    finally:
+        s.close()
+
+    missing = 0
+    for lane, quote in zip(lanes, index.price_many(lanes)):
+        if quote is None:
+            missing += 1
+            _emit({"status": "error", "command": "price", "lane": list(lane), "error": "No contract or tariff rate."})
+        else:
+            _emit(dict(quote._asdict(), status="ok", command="price"))
+    return EXIT_OK if not missing else EXIT_ERROR
+
+
+def cmd_reprice(args):
+    # NumPy is only needed here, so the interactive menu doesn't pay for it.
+    from lib.repricing import reprice_rates
+
+    filters = _filters_from_args(args)
+    fx = {"AUD": args.aud_usd} if args.aud_usd else None
+
+    s = Session()
+    try:
+        result = reprice_rates(
+            s, filters, fields=args.field or ["freight_usd"], percent=args.percent,
+            amount=args.amount, amount_currency=args.currency, fx=fx,
+            decimals=args.decimals, dry_run=args.dry_run,
+        )
+        if not args.dry_run:
+            s.commit()
+    except ValueError as e:
+        return _fail("reprice", str(e), EXIT_USAGE)
+    finally:
+        s.close()
+
+    _emit(dict(result._asdict(), status="ok", command="reprice", dry_run=args.dry_run))
+    return EXIT_OK
+
+
+def _version_dict(version):
+    return {
+        "customer_id": version.customer_id,
+        **{k: getattr(version, k) for k in RATE_FIELDS},
+        "valid_from": version.valid_from.isoformat(),
+        "valid_to": version.valid_to.isoformat() if version.valid_to else None,
+    }
+
+
+def _as_of(value):
+    when = datetime.fromisoformat(value)
+    if len(value) == 10:
+        # A bare date means the rate in force at the end of that day.
+        when = when.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return when
+
+
+def cmd_rate_history(args):
+    lane = (args.customer, *[v.strip().upper() for v in args.lane])
+    s = Session()
+    try:
+        if args.as_of:
+            try:
+                when = _as_of(args.as_of)
+            except ValueError:
+                return _fail("rate-history", f"Not a date: {args.as_of}", EXIT_USAGE)
+            version = rate_as_of(s, *lane, when)
+            if version is None:
+                return _fail("rate-history", f"No rate in force at {when.isoformat()}.")
+            _emit(dict(_version_dict(version), status="ok", command="rate-history"))
+            return EXIT_OK
+
+        versions = lane_history(s, *lane)
+    finally:
+        s.close()
+
+    if not versions:
+        return _fail("rate-history", "No history for that lane.")
+    for version in versions:
+        _emit(dict(_version_dict(version), status="ok", command="rate-history"))
+    return EXIT_OK
+
+
+def cmd_registry(args):
+    if args.action == "list":
+        registry = get_registry()
+        kinds = [args.kind] if args.kind else list(KINDS)
+        _emit({"status": "ok", "command": "registry",
+               **{kind: list(registry.choices[kind]) for kind in kinds}})
+        return EXIT_OK
+
+    if not (args.kind and args.value):
+        return _fail("registry", f"registry {args.action} needs KIND and VALUE.", EXIT_USAGE)
+    s = Session()
+    try:
+        if args.action == "add":
+            value = add_value(s, args.kind, args.value)
+        else:
+            value = args.value.strip().upper()
+            if not remove_value(s, args.kind, value):
+                return _fail("registry", f"{value} is not a runtime {args.kind}; defaults live in data_constants.json.")
+        s.commit()
+    finally:
+        s.close()
+    _emit({"status": "ok", "command": "registry", "action": args.action, "kind": args.kind, "value": value})
+    return EXIT_OK
+
+
+def cmd_margin_report(args):
+    filters = _filters_from_args(args)
+    s = Session()
+    try:
+        paths, report = export_margin_report(s, args.dir, args.format, filters)
+    finally:
+        s.close()
+
+    _emit({"status": "ok", "command": "margin-report", "files": [str(p) for p in paths],
+           "lanes": report.lanes, "customers": len(report.by_customer),
+           "destinations": len(report.by_destination)})
+    return EXIT_OK
+
+
+def _add_filter_args(parser):
+    parser.add_argument("--customer", help="Customer name prefix")
+    parser.add_argument("--pol")
+    parser.add_argument("--pod")
+    parser.add_argument("--container")
+
+
+def _add_profile_arg(parser):
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Log per-action timings to RATE_MANAGER_PROFILE_LOG (default logs/profile.jsonl)",
+    )
+    parser.add_argument(
+        "--profile-mode", choices=instrumentation.MODES,
+        help="timing (the default) or cprofile, which also dumps a .prof per action; implies --profile",
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m lib.cli",
+        description="Rate Manager. Run without a command for the interactive menu.",
+    )
+    _add_profile_arg(parser)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-quote", help="Import customer rates from an .xlsx, .csv, .parquet or .arrow file")
+    p.add_argument("file")
+    p.add_argument("--customer", help="Customer for single-customer files")
+    p.add_argument("--force", action="store_true", help="Re-import even if the file is unchanged")
+    p.add_argument("--rejects-dir", default=EXPORT_DIR, help="Where to write the rejected-rows workbook")
+    p.set_defaults(func=cmd_import_quote)
+
+    p = sub.add_parser("import-batch", help="Import every workbook in a directory or glob in parallel")
+    p.add_argument("target", help="Directory of rate files or a glob pattern")
+    p.add_argument("--customer", help="Customer for single-customer files")
+    p.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    p.add_argument("--force", action="store_true", help="Re-import even if the file is unchanged")
+    p.add_argument("--rejects-dir", default=EXPORT_DIR, help="Where to write the rejected-rows workbook")
+    p.set_defaults(func=cmd_import_batch)
+
+    p = sub.add_parser("import-tariff", help="Import tariff rates from an .xlsx, .csv, .parquet or .arrow file")
+    p.add_argument("file")
+    p.add_argument("--force", action="store_true", help="Re-import even if the file is unchanged")
+    p.add_argument("--rejects-dir", default=EXPORT_DIR, help="Where to write the rejected-rows workbook")
+    p.set_defaults(func=cmd_import_tariff)
+
+    p = sub.add_parser("export-quote", help="Export one customer's quote")
+    p.add_argument("--customer", required=True)
+    p.add_argument("--dir", default=EXPORT_DIR)
+    p.add_argument("--format", choices=list(SUFFIXES), default="xlsx")
+    p.set_defaults(func=cmd_export_quote)
+
+    p = sub.add_parser("export-destination", help="Export every customer's rates to a port")
+    p.add_argument("port")
+    p.add_argument("--dir", default=EXPORT_DIR)
+    p.add_argument("--format", choices=list(SUFFIXES), default="xlsx")
+    p.set_defaults(func=cmd_export_destination)
+
+    p = sub.add_parser("list-rates", help="List rates, optionally filtered")
+    _add_filter_args(p)
+    p.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    p.set_defaults(func=cmd_list_rates)
+
+    p = sub.add_parser("price", help="Landed price per lane, falling back to the tariff")
+    p.add_argument("lane", nargs="*", metavar="POL POD CONTAINER")
+    p.add_argument("--customer")
+    p.add_argument("--file", help="CSV of customer,pol,pod,container rows to price in one call")
+    p.set_defaults(func=cmd_price)
+
+    p = sub.add_parser("reprice", help="Bulk percentage/absolute change to matching rates")
+    _add_filter_args(p)
+    p.add_argument("--field", action="append",
+                   choices=["freight_usd", "ams_usd", "lss_usd", "othc_aud", "doc_aud", "cmr_aud"],
+                   help="Field to adjust; repeat for several (default freight_usd)")
+    p.add_argument("--percent", type=float, default=0.0)
+    p.add_argument("--amount", type=float, default=0.0)
+    p.add_argument("--currency", choices=["USD", "AUD"], help="Currency of --amount (default: the field's)")
+    p.add_argument("--aud-usd", type=float, help="USD per 1 AUD; required when --currency differs from a field's")
+    p.add_argument("--decimals", type=int, default=2)
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_reprice)
+
+    p = sub.add_parser("rate-history", help="Every version of a customer's lane, or the one in force at a date")
+    p.add_argument("lane", nargs=3, metavar=("POL", "POD", "CONTAINER"))
+    p.add_argument("--customer", required=True)
+    p.add_argument("--as-of", help="ISO date or datetime; a bare date means end of that day")
+    p.set_defaults(func=cmd_rate_history)
+
+    p = sub.add_parser("registry", help="List, add or remove valid ports, containers and DTHC terms")
+    p.add_argument("action", choices=["list", "add", "remove"])
+    p.add_argument("kind", nargs="?", choices=list(KINDS))
+    p.add_argument("value", nargs="?")
+    p.set_defaults(func=cmd_registry)
+
+    p = sub.add_parser("margin-report", help="Contract vs tariff discount per lane, customer and port")
+    _add_filter_args(p)
+    p.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    p.add_argument("--dir", default=EXPORT_DIR)
+    p.set_defaults(func=cmd_margin_report)
+
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # The profiling flags go before or after the command, or alone for the
+    # interactive menu, so they are taken out before the real parse.
+    pre = argparse.ArgumentParser(add_help=False)
+    _add_profile_arg(pre)
+    known, rest = pre.parse_known_args(argv)
+    if known.profile or known.profile_mode:
+        instrumentation.configure(
+            known.profile_mode or "timing", os.environ.get("RATE_MANAGER_PROFILE_LOG")
+        )
+    if not rest:
+        main_menu()
+        return EXIT_OK
+
+    args = build_parser().parse_args(rest)
+    try:
+        with instrumentation.action(args.command):
+            return args.func(args)
+    except Exception as e:
+        return _fail(args.command, str(e))
+
+
 if __name__ == "__main__":
-    main_menu()
+    sys.exit(main())
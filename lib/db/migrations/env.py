@@ -9,13 +9,17 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from lib.db.models import Base
+from lib.db.models import Base, database_url
 
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrate the same database the app uses when RATE_MANAGER_DB_URL is set.
+if os.environ.get("RATE_MANAGER_DB_URL"):
+    config.set_main_option("sqlalchemy.url", database_url())
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
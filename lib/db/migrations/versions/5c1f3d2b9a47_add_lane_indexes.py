@@ -0,0 +1,60 @@
+"""add lane indexes to rates and tariffs
+
+Revision ID: 5c1f3d2b9a47
+Revises: ae29ad8166a1
+Create Date: 2026-10-17 09:12:41.508213
+
+"""
+import logging
+
+from alembic import op
+
+log = logging.getLogger("alembic.runtime.migration")
+
+# revision identifiers, used by Alembic.
+revision = '5c1f3d2b9a47'
+down_revision = 'ae29ad8166a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # tariffs had no lane key before this revision; keep the oldest row per
+    # lane (the one imports used to update) so the unique index can be built,
+    # and report every row removed.
+    conn = op.get_bind()
+    duplicates = conn.exec_driver_sql(
+        "SELECT id, load_port, destination_port, container_type, freight_usd FROM tariffs "
+        "WHERE id NOT IN (SELECT MIN(id) FROM tariffs "
+        "GROUP BY load_port, destination_port, container_type) ORDER BY id"
+    ).all()
+    for tariff_id, lp, dp, ct, freight in duplicates:
+        log.warning("Removing duplicate tariff id=%s %s -> %s (%s) freight_usd=%s; "
+                    "the oldest tariff for the lane is kept", tariff_id, lp, dp, ct, freight)
+    if duplicates:
+        log.warning("Removed %d duplicate tariff rows", len(duplicates))
+        op.execute(
+            "DELETE FROM tariffs WHERE id NOT IN ("
+            "SELECT MIN(id) FROM tariffs "
+            "GROUP BY load_port, destination_port, container_type)"
+        )
+    op.create_index(
+        'uq_tariffs_lane_container', 'tariffs',
+        ['load_port', 'destination_port', 'container_type'], unique=True
+    )
+    op.create_index('ix_tariffs_destination', 'tariffs', ['destination_port'], unique=False)
+    op.create_index(
+        'ix_rates_lane', 'rates',
+        ['load_port', 'destination_port', 'container_type'], unique=False
+    )
+    op.create_index(
+        'ix_rates_destination_customer', 'rates',
+        ['destination_port', 'customer_id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_rates_destination_customer', table_name='rates')
+    op.drop_index('ix_rates_lane', table_name='rates')
+    op.drop_index('ix_tariffs_destination', table_name='tariffs')
+    op.drop_index('uq_tariffs_lane_container', table_name='tariffs')
@@ -0,0 +1,63 @@
+"""add rate_history
+
+Revision ID: 8e4b2c7d1f03
+Revises: 5c1f3d2b9a47
+Create Date: 2026-10-17 11:40:05.117342
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b2c7d1f03'
+down_revision = '5c1f3d2b9a47'
+branch_labels = None
+depends_on = None
+
+RATE_COLUMNS = (
+    'customer_id, load_port, destination_port, container_type, freight_usd, othc_aud, '
+    'doc_aud, cmr_aud, ams_usd, lss_usd, dthc, free_time'
+)
+
+
+def upgrade():
+    op.create_table('rate_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('load_port', sa.String(), nullable=False),
+    sa.Column('destination_port', sa.String(), nullable=False),
+    sa.Column('container_type', sa.String(), nullable=False),
+    sa.Column('freight_usd', sa.Float(), nullable=False),
+    sa.Column('othc_aud', sa.Float(), nullable=False),
+    sa.Column('doc_aud', sa.Float(), nullable=False),
+    sa.Column('cmr_aud', sa.Float(), nullable=False),
+    sa.Column('ams_usd', sa.Float(), nullable=False),
+    sa.Column('lss_usd', sa.Float(), nullable=False),
+    sa.Column('dthc', sa.String(), nullable=False),
+    sa.Column('free_time', sa.String(), nullable=False),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_rate_history_lane_valid_from', 'rate_history',
+        ['customer_id', 'load_port', 'destination_port', 'container_type', 'valid_from'],
+        unique=False
+    )
+    # Existing rates become the first version of each lane.
+    op.get_bind().execute(
+        sa.text(
+            f"INSERT INTO rate_history ({RATE_COLUMNS}, valid_from) "
+            f"SELECT {RATE_COLUMNS}, :now FROM rates"
+        ).bindparams(sa.bindparam('now', type_=sa.DateTime())),
+        {'now': datetime.now()},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_rate_history_lane_valid_from', table_name='rate_history')
+    op.drop_table('rate_history')
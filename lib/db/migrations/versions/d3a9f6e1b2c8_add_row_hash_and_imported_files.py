@@ -0,0 +1,71 @@
+"""add row_hash to rates/tariffs and imported_files
+
+Revision ID: d3a9f6e1b2c8
+Revises: 8e4b2c7d1f03
+Create Date: 2026-10-17 13:05:52.604127
+
+"""
+from hashlib import blake2b
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f6e1b2c8'
+down_revision = '8e4b2c7d1f03'
+branch_labels = None
+depends_on = None
+
+BATCH = 5000
+
+# Frozen copies of lib.db.models.RATE_FIELDS and row_hash as of this
+# revision, so later changes to the models can't change what it writes.
+FIELDS = (
+    "load_port", "destination_port", "container_type", "freight_usd", "othc_aud",
+    "doc_aud", "cmr_aud", "ams_usd", "lss_usd", "dthc", "free_time",
+)
+
+
+def _row_hash(lp, dp, ct, freight, othc, doc, cmr, ams, lss, dthc, free_time):
+    text = "\x1f".join((
+        str(lp), str(dp), str(ct),
+        repr(float(freight)), repr(float(othc)), repr(float(doc)),
+        repr(float(cmr)), repr(float(ams)), repr(float(lss)),
+        str(dthc), str(free_time),
+    ))
+    return blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _backfill(table):
+    conn = op.get_bind()
+    rows = conn.execution_options(yield_per=BATCH).execute(
+        sa.text(f"SELECT id, {', '.join(FIELDS)} FROM {table}")
+    )
+    update = sa.text(f"UPDATE {table} SET row_hash = :row_hash WHERE id = :id")
+    for batch in rows.partitions():
+        conn.execute(update, [{"id": row[0], "row_hash": _row_hash(*row[1:])} for row in batch])
+
+
+def upgrade():
+    op.add_column('rates', sa.Column('row_hash', sa.String(length=32), nullable=True))
+    op.add_column('tariffs', sa.Column('row_hash', sa.String(length=32), nullable=True))
+    op.create_table('imported_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('target', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('imported_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'target', 'sha256', name='uq_imported_files_kind_target_sha256')
+    )
+    _backfill('rates')
+    _backfill('tariffs')
+
+
+def downgrade():
+    op.drop_table('imported_files')
+    with op.batch_alter_table('tariffs') as batch_op:
+        batch_op.drop_column('row_hash')
+    with op.batch_alter_table('rates') as batch_op:
+        batch_op.drop_column('row_hash')
@@ -0,0 +1,30 @@
+"""add registry_values
+
+Revision ID: f7c2a4e9d5b1
+Revises: d3a9f6e1b2c8
+Create Date: 2026-10-17 14:21:37.880914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2a4e9d5b1'
+down_revision = 'd3a9f6e1b2c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('registry_values',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'value', name='uq_registry_values_kind_value')
+    )
+
+
+def downgrade():
+    op.drop_table('registry_values')
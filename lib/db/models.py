@@ -1,10 +1,98 @@
+import os
+from datetime import datetime
+from hashlib import blake2b
+from operator import itemgetter
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, ForeignKey,
-    CheckConstraint, UniqueConstraint
+    create_engine, event, Column, Integer, String, Float, DateTime, ForeignKey,
+    CheckConstraint, UniqueConstraint, Index
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 
-engine = create_engine("sqlite:///shipping.db", future=True)
+DEFAULT_DB_URL = "sqlite:///shipping.db"
+
+LANE_FIELDS = ("load_port", "destination_port", "container_type")
+VALUE_FIELDS = (
+    "freight_usd", "othc_aud", "doc_aud", "cmr_aud",
+    "ams_usd", "lss_usd", "dthc", "free_time",
+)
+RATE_FIELDS = LANE_FIELDS + VALUE_FIELDS
+MONEY_COLUMNS = VALUE_FIELDS[:6]
+_rate_values = itemgetter(*RATE_FIELDS)
+
+
+def row_hash(values) -> str:
+    """Stable fingerprint of a rate/tariff row's 11 fields, so imports can
+    compare one stored value instead of every column."""
+    lp, dp, ct, freight, othc, doc, cmr, ams, lss, dthc, free_time = _rate_values(values)
+    text = "\x1f".join((
+        str(lp), str(dp), str(ct),
+        repr(float(freight)), repr(float(othc)), repr(float(doc)),
+        repr(float(cmr)), repr(float(ams)), repr(float(lss)),
+        str(dthc), str(free_time),
+    ))
+    return blake2b(text.encode(), digest_size=16).hexdigest()
+
+# Applied to every new SQLite connection. WAL lets readers carry on while an
+# import is writing; each can be overridden with RATE_MANAGER_SQLITE_<NAME>.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": "-65536",       # KiB when negative: 64 MiB page cache
+    "mmap_size": "268435456",     # 256 MiB
+    "busy_timeout": "5000",       # ms to wait on a locked database
+    "temp_store": "MEMORY",
+}
+
+POOL_SETTINGS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 3600,
+}
+
+
+def database_url() -> str:
+    return os.environ.get("RATE_MANAGER_DB_URL", DEFAULT_DB_URL)
+
+
+def sqlite_pragmas() -> dict:
+    return {
+        name: os.environ.get(f"RATE_MANAGER_SQLITE_{name.upper()}", value)
+        for name, value in SQLITE_PRAGMAS.items()
+    }
+
+
+def make_engine(url=None, **kwargs):
+    """Build an engine for ``url`` (default: ``RATE_MANAGER_DB_URL`` or
+    ``sqlite:///shipping.db``) with pooling and, for SQLite, the
+    ``SQLITE_PRAGMAS`` tuning applied once per pooled connection."""
+    url = make_url(url or database_url())
+    is_sqlite = url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and url.database in (None, "", ":memory:")
+
+    if not in_memory:
+        for name, value in POOL_SETTINGS.items():
+            env = os.environ.get(f"RATE_MANAGER_{name.upper()}")
+            kwargs.setdefault(name, int(env) if env else value)
+
+    engine = create_engine(url, future=True, **kwargs)
+
+    if is_sqlite:
+        pragmas = sqlite_pragmas()
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_conn, _record):
+            cursor = dbapi_conn.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return engine
+
+
+engine = make_engine()
 Session = sessionmaker(bind=engine, future=True)
 Base = declarative_base()
 
@@ -29,6 +117,7 @@ class Rate(Base):
     lss_usd = Column(Float, nullable=False)
     dthc = Column(String, nullable=False)
     free_time = Column(String, nullable=False)
+    row_hash = Column(String(32))
 
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
     customer = relationship("Customer", back_populates="rates")
@@ -39,6 +128,8 @@ class Rate(Base):
             "customer_id", "load_port", "destination_port", "container_type",
             name="uq_customer_lane_container"
         ),
+        Index("ix_rates_lane", "load_port", "destination_port", "container_type"),
+        Index("ix_rates_destination_customer", "destination_port", "customer_id"),
     )
 
 class Tariff(Base):
@@ -54,4 +145,82 @@ class Tariff(Base):
     ams_usd = Column(Float, nullable=False)
     lss_usd = Column(Float, nullable=False)
     dthc = Column(String, nullable=False)
-    free_time = Column(String, nullable=False)
\ No newline at end of file
+    free_time = Column(String, nullable=False)
+    row_hash = Column(String(32))
+
+    __table_args__ = (
+        Index(
+            "uq_tariffs_lane_container",
+            "load_port", "destination_port", "container_type",
+            unique=True,
+        ),
+        Index("ix_tariffs_destination", "destination_port"),
+    )
+
+
+class RateHistory(Base):
+    """Append-only versions of customer rates. A version is current while
+    ``valid_to`` is NULL; superseded versions are closed, never rewritten."""
+    __tablename__ = "rate_history"
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    load_port = Column(String, nullable=False)
+    destination_port = Column(String, nullable=False)
+    container_type = Column(String, nullable=False)
+    freight_usd = Column(Float, nullable=False)
+    othc_aud = Column(Float, nullable=False)
+    doc_aud = Column(Float, nullable=False)
+    cmr_aud = Column(Float, nullable=False)
+    ams_usd = Column(Float, nullable=False)
+    lss_usd = Column(Float, nullable=False)
+    dthc = Column(String, nullable=False)
+    free_time = Column(String, nullable=False)
+    valid_from = Column(DateTime, nullable=False)
+    valid_to = Column(DateTime)
+
+    __table_args__ = (
+        Index(
+            "ix_rate_history_lane_valid_from",
+            "customer_id", "load_port", "destination_port", "container_type", "valid_from",
+        ),
+    )
+
+
+class ImportedFile(Base):
+    """Content hash of each workbook imported, per kind ("rates" or
+    "tariffs") and target customer ("" for multi-customer files)."""
+    __tablename__ = "imported_files"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    target = Column(String, nullable=False, default="")
+    sha256 = Column(String(64), nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    imported_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "target", "sha256", name="uq_imported_files_kind_target_sha256"),
+    )
+
+
+class RegistryValue(Base):
+    """A valid port, container type or DTHC term added at runtime, on top of
+    the defaults in ``data/data_constants.json``."""
+    __tablename__ = "registry_values"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "value", name="uq_registry_values_kind_value"),
+    )
+
+
+def _set_row_hash(_mapper, _connection, target) -> None:
+    target.row_hash = row_hash({k: getattr(target, k) for k in RATE_FIELDS})
+
+
+# ORM writes (add/edit prompts, seeding) keep row_hash current; bulk writers
+# that bypass the unit of work set it themselves.
+for _model in (Rate, Tariff):
+    event.listen(_model, "before_insert", _set_row_hash)
+    event.listen(_model, "before_update", _set_row_hash)
@@ -1,107 +1,198 @@
+import argparse
 import json
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session as OrmSession
-from lib.db.models import Base, engine, Session, Customer, Rate, Tariff
+
+from lib.db.models import (
+    Base, engine, Session, Rate, Tariff, LANE_FIELDS, RATE_FIELDS, VALUE_FIELDS, row_hash
+)
+from lib.fingerprints import forget_files
+from lib.history import record_rates_by_id
+from lib.repository import customer_ids, unit_of_work
+from lib.validation import Validator
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
 RATES_JSON = DATA_DIR / "rates.json"
 TARIFF_JSON = DATA_DIR/ "tariff.json"
 
-def _to_float(v):
-    try:
-        return float(v)
-    except Exception:
-        return 0.0
+# Records per batch; also bounds how much of the input is held at once.
+BATCH = 5000
+READ_BLOCK = 1 << 16
+
+_SCHEMA = Validator()
 
-def seed_customers_and_rates(session: OrmSession):
-    if not RATES_JSON.exists():
-        return
 
-    data = json.loads(RATES_JSON.read_text())
-
-    for c in data:
-        name = str(c.get("name", "")).upper().strip()
-        customer = session.query(Customer).filter_by(name=name).first()
-        if not customer:
-            customer = Customer(name=name)
-            session.add(customer)
-            session.flush()
-
-        for r in c.get("rates", []):
-            rate = session.query(Rate).filter_by(
-                customer_id=customer.id,
-                load_port=r["load_port"],
-                destination_port=r["destination_port"],
-                container_type=r.get("container_type", ""),
-            ).first()
-
-            fields = dict(
-                load_port=r["load_port"],
-                destination_port=r["destination_port"],
-                container_type=r.get("container_type", ""),
-                freight_usd=_to_float(r["freight_usd"]),
-                othc_aud=_to_float(r["othc_aud"]),
-                doc_aud=_to_float(r["doc_aud"]),
-                cmr_aud=_to_float(r["cmr_aud"]),
-                ams_usd=_to_float(r["ams_usd"]),
-                lss_usd=_to_float(r["lss_usd"]),
-                dthc=str(r["dthc"]).upper(),
-                free_time=str(r["free_time"]),
-                customer_id=customer.id,
-            )
-
-            if rate:
-                for k, v in fields.items():
-                    setattr(rate, k, v)
-            else:
-                session.add(Rate(**fields))
-
-def seed_tariffs(session: OrmSession):
-    if not TARIFF_JSON.exists():
+def iter_json_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the objects of a top-level JSON array one at a time, or each
+    line of a JSON Lines file (``.jsonl``/``.ndjson``), without loading the
+    whole file."""
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
         return
 
-    data = json.loads(TARIFF_JSON.read_text())
-
-    for t in data:
-        tariff = session.query(Tariff).filter_by(
-            load_port=t["load_port"],
-            destination_port=t["destination_port"],
-            container_type=t["container_type"],
-        ).first()
-
-        fields = dict(
-            load_port=t["load_port"],
-            destination_port=t["destination_port"],
-            container_type=t["container_type"],
-            freight_usd=_to_float(t["freight_usd"]),
-            othc_aud=_to_float(t["othc_aud"]),
-            doc_aud=_to_float(t["doc_aud"]),
-            cmr_aud=_to_float(t["cmr_aud"]),
-            ams_usd=_to_float(t["ams_usd"]),
-            lss_usd=_to_float(t["lss_usd"]),
-            dthc=str(t["dthc"]).upper(),
-            free_time=str(t["free_time"]),
-        )
-
-        if tariff:
-            for k, v in fields.items():
-                setattr(tariff, k, v)
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as fh:
+        buf = fh.read(READ_BLOCK).lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"{path.name}: expected a JSON array")
+        buf, pos, eof = buf[1:], 0, False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                block = fh.read(READ_BLOCK)
+                eof = not block
+                buf, pos = buf[pos:] + block, 0
+                continue
+            yield record
+
+
+def _rate_rows(records: Iterator[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """``(customer, raw rate)`` pairs from either layout: customer objects
+    with a nested ``rates`` list, or flat rates carrying a ``customer`` key."""
+    for record in records:
+        if "rates" in record:
+            name = record.get("name", "")
+            for rate in record["rates"]:
+                yield name, rate
         else:
-            session.add(Tariff(**fields))
+            yield record.get("customer", record.get("name", "")), record
+
+
+def _batches(items, size: int = BATCH):
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _parse(record: Dict[str, Any]) -> Optional[Tuple]:
+    """``RATE_FIELDS`` values plus row_hash as a tuple, or ``None`` if invalid."""
+    values, errors = _SCHEMA.validate([record.get(k) for k in RATE_FIELDS])
+    if errors:
+        return None
+    return tuple(values[k] for k in RATE_FIELDS) + (row_hash(values),)
+
+
+def _parsed_rates(path: Path) -> Iterator[Tuple[List[Tuple[str, Tuple]], int]]:
+    """``([(customer, parsed rate), ...], rejected)`` per batch of ``path``."""
+    for batch in _batches(_rate_rows(iter_json_records(path))):
+        parsed = []
+        for name, record in batch:
+            name = str(name or "").strip().upper()
+            values = _parse(record) if name else None
+            if values is not None:
+                parsed.append((name, values))
+        yield parsed, len(batch) - len(parsed)
+
+
+class _ChangedOnlyUpsert:
+    """``INSERT ... ON CONFLICT DO UPDATE ... WHERE row_hash differs
+    RETURNING id``: unchanged records cost no write, and the ids that were
+    written come back for history. Rows are positional tuples in
+    ``columns`` order. They are sent as one executemany, which SQLAlchemy
+    batches into multi-row statements within the dialect's bound-parameter
+    limit (999 before SQLite 3.32)."""
+
+    def __init__(self, model, columns: Tuple[str, ...], conflict: Tuple[str, ...]) -> None:
+        table = model.__table__
+        stmt = sqlite_insert(table)
+        self.columns = columns
+        self.statement = stmt.on_conflict_do_update(
+            index_elements=list(conflict),
+            set_={k: stmt.excluded[k] for k in VALUE_FIELDS + ("row_hash",)},
+            where=or_(table.c.row_hash.is_(None), table.c.row_hash != stmt.excluded.row_hash),
+        ).returning(table.c.id)
+
+    def __call__(self, session: OrmSession, rows: List[Tuple]) -> List[int]:
+        params = [dict(zip(self.columns, row)) for row in rows]
+        return list(session.connection().execute(self.statement, params).scalars())
+
+
+def seed_customers_and_rates(session: OrmSession, path: Path = RATES_JSON) -> Dict[str, int]:
+    """Stream ``path`` into customers and rates in ``BATCH``-sized Core
+    upserts. Safe to re-run: unchanged rates are not rewritten, changed ones
+    get a history version. Returns counts of rates written and rejected."""
+    counts = {"rates": 0, "written": 0, "rejected": 0}
+    if not Path(path).exists():
+        return counts
+
+    upsert = _ChangedOnlyUpsert(
+        Rate, RATE_FIELDS + ("row_hash", "customer_id"), ("customer_id",) + LANE_FIELDS
+    )
+    ids: Dict[str, int] = {}
+    for parsed, rejected in _parsed_rates(path):
+        counts["rejected"] += rejected
+        ids.update(customer_ids(session, {name for name, _ in parsed if name not in ids}))
+        # Last record wins when a lane repeats inside one batch.
+        rows = {
+            (ids[name],) + values[:3]: values + (ids[name],) for name, values in parsed
+        }
+        if rows:
+            written = upsert(session, list(rows.values()))
+            record_rates_by_id(session, written)
+            counts["written"] += len(written)
+        counts["rates"] += len(parsed)
+
+    forget_files(session, "rates")
+    return counts
+
+
+def seed_tariffs(session: OrmSession, path: Path = TARIFF_JSON) -> Dict[str, int]:
+    counts = {"tariffs": 0, "written": 0, "rejected": 0}
+    if not Path(path).exists():
+        return counts
+
+    upsert = _ChangedOnlyUpsert(Tariff, RATE_FIELDS + ("row_hash",), LANE_FIELDS)
+    for batch in _batches(iter_json_records(path)):
+        rows = {}
+        for record in batch:
+            values = _parse(record)
+            if values is None:
+                counts["rejected"] += 1
+                continue
+            rows[values[:3]] = values
+            counts["tariffs"] += 1
+        if rows:
+            counts["written"] += len(upsert(session, list(rows.values())))
+
+    forget_files(session, "tariffs")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the database from JSON or JSON Lines.")
+    parser.add_argument("--rates", type=Path, default=RATES_JSON)
+    parser.add_argument("--tariffs", type=Path, default=TARIFF_JSON)
+    args = parser.parse_args(argv)
 
-def main():
     Base.metadata.create_all(engine)
-    s = Session()
-    try:
-        seed_customers_and_rates(s)
-        seed_tariffs(s)
-        s.commit()
-        print("Seed complete.")
-    except Exception:
-        s.rollback()
-        raise
-    finally:
-        s.close()
+    with unit_of_work(Session) as s:
+        rates = seed_customers_and_rates(s, args.rates)
+        tariffs = seed_tariffs(s, args.tariffs)
+    print(
+        f"Seed complete: {rates['rates']} rates ({rates['written']} written, "
+        f"{rates['rejected']} rejected), {tariffs['tariffs']} tariffs "
+        f"({tariffs['written']} written, {tariffs['rejected']} rejected)."
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
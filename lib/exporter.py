@@ -0,0 +1,173 @@
+from __future__ import annotations
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.formats import SUFFIXES, file_format, write_columnar, write_csv
+from lib.instrumentation import record_rows
+from lib.queries import customer_rates_stmt, destination_rates_stmt
+
+EXPORT_HEADERS = [
+    "POL","POD","Container","Freight USD","OTHC AUD","DOC AUD",
+    "CMR AUD","AMS USD","LSS USD","DTHC","Free Time"
+]
+EXPORT_HEADERS_WITH_CUSTOMER = ["Customer"] + EXPORT_HEADERS
+
+# Rows fetched per round trip when streaming an export from the DB.
+STREAM_BATCH = 1000
+
+
+class ColumnWidths:
+    """Running ``max(len(str(value)))`` per column, as the old exporters
+    computed by walking ``ws.columns`` after the sheet was filled."""
+
+    def __init__(self, headers: Sequence[str], title: Optional[str] = None) -> None:
+        self.widths = [len(str(h)) for h in headers]
+        if title:
+            self.widths[0] = max(self.widths[0], len(title))
+
+    def observe(self, row: Sequence[Any]) -> None:
+        widths = self.widths
+        for i, value in enumerate(row):
+            n = len(str(value))
+            if n > widths[i]:
+                widths[i] = n
+
+    def observe_query(self, session: OrmSession, stmt) -> None:
+        # openpyxl's write-only writer emits <cols> before the first row, so
+        # widths for a DB-backed export come from one aggregate over the same
+        # statement instead of a second walk of the written sheet.
+        sub = stmt.order_by(None).subquery()
+        longest = session.execute(
+            select(*[func.max(func.length(cast(c, String))) for c in sub.c])
+        ).one()
+        self.observe(["x" * (n or 0) for n in longest])
+
+    def apply(self, ws) -> None:
+        for i, width in enumerate(self.widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width + 2
+
+
+def fill_sheet(
+    wb: Workbook,
+    sheet_title: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    title: Optional[str] = None,
+    widths: Optional[ColumnWidths] = None,
+) -> int:
+    """Stream ``rows`` into a new sheet of the write-only workbook ``wb``.
+
+    With a ``title`` the sheet gets the quote layout (bold title in A1, a
+    blank row, bold headers on row 3); otherwise headers go on row 1.
+    Returns the number of data rows written.
+    """
+    ws = wb.create_sheet(sheet_title)
+    if widths:
+        widths.apply(ws)
+
+    if title:
+        title_cell = WriteOnlyCell(ws, value=title)
+        title_cell.font = Font(bold=True, size=14)
+        ws.append([title_cell])
+        ws.append([])
+        header_cells: List[Any] = []
+        for h in headers:
+            cell = WriteOnlyCell(ws, value=h)
+            cell.font = Font(bold=True)
+            header_cells.append(cell)
+        ws.append(header_cells)
+    else:
+        ws.append(list(headers))
+
+    count = 0
+    for row in rows:
+        ws.append(list(row))
+        count += 1
+    record_rows(count)
+    return count
+
+
+def write_excel(
+    path: Path,
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    sheet_title: str,
+    title: Optional[str] = None,
+    widths: Optional[ColumnWidths] = None,
+) -> int:
+    """Write a single-sheet workbook at ``path``; see ``fill_sheet``."""
+    wb = Workbook(write_only=True)
+    count = fill_sheet(wb, sheet_title, headers, rows, title=title, widths=widths)
+    wb.save(path)
+    return count
+
+
+def write_rows(
+    path: Path,
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    sheet_title: str,
+    title: Optional[str] = None,
+    widths: Optional[ColumnWidths] = None,
+) -> int:
+    """Write ``rows`` in the format given by ``path``'s extension.
+
+    ``.xlsx`` goes through ``write_excel``; CSV, Parquet and Arrow get one
+    header row and no title, sheet name or column widths.
+    """
+    fmt = file_format(path)
+    if fmt == "xlsx":
+        return write_excel(path, headers, rows, sheet_title, title=title, widths=widths)
+    count = write_csv(path, headers, rows) if fmt == "csv" else write_columnar(path, headers, rows, fmt)
+    record_rows(count)
+    return count
+
+
+def dated_path(directory, prefix: str, name: str, suffix: str = ".xlsx") -> Path:
+    outdir = Path(directory)
+    outdir.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r"\W+", "_", name)
+    current_date = datetime.now().strftime("%d_%m_%Y")
+    return outdir / f"{prefix}_{safe_name}_{current_date}{suffix}"
+
+
+def _export_stmt(session: OrmSession, stmt, path: Path, headers, title: str) -> int:
+    widths = None
+    if file_format(path) == "xlsx":
+        widths = ColumnWidths(headers, title=title)
+        widths.observe_query(session, stmt)
+    rows = session.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+    return write_rows(path, headers, rows, "Quote", title=title, widths=widths)
+
+
+def export_customer_quote(
+    session: OrmSession, customer_name: str, directory, fmt: str = "xlsx"
+) -> Tuple[Optional[Path], int]:
+    """Write ``Quote_<customer>_<date>.<fmt>``; ``(None, 0)`` if the customer has no rates."""
+    stmt = customer_rates_stmt(customer_name)
+    if session.execute(stmt.limit(1)).first() is None:
+        return None, 0
+    path = dated_path(directory, "Quote", customer_name, SUFFIXES[fmt])
+    return path, _export_stmt(session, stmt, path, EXPORT_HEADERS, f"Customer: {customer_name}")
+
+
+def export_destination_rates(
+    session: OrmSession, destination_port: str, directory, fmt: str = "xlsx"
+) -> Tuple[Optional[Path], int]:
+    """Write ``Rates_<port>_<date>.<fmt>``; ``(None, 0)`` if no rates go to the port."""
+    stmt = destination_rates_stmt(destination_port)
+    if session.execute(stmt.limit(1)).first() is None:
+        return None, 0
+    path = dated_path(directory, "Rates", destination_port, SUFFIXES[fmt])
+    return path, _export_stmt(
+        session, stmt, path, EXPORT_HEADERS_WITH_CUSTOMER, f"Destination Port: {destination_port}"
+    )
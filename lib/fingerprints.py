@@ -0,0 +1,58 @@
+from __future__ import annotations
+import hashlib
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import ImportedFile
+
+FILE_BLOCK = 1 << 20
+
+
+def file_digest(path) -> str:
+    """SHA-256 of a file's bytes, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(FILE_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def imported_rows(
+    session: OrmSession, kind: str, targets: Sequence[str], digest: str
+) -> Optional[int]:
+    """Row count recorded when a file with ``digest`` was last imported into
+    one of ``targets``, or ``None`` if it hasn't been (or has been forgotten)."""
+    return session.scalars(
+        select(ImportedFile.rows).where(
+            ImportedFile.kind == kind,
+            ImportedFile.target.in_(list(targets)),
+            ImportedFile.sha256 == digest,
+        )
+    ).first()
+
+
+def remember_file(
+    session: OrmSession, kind: str, target: str, digest: str, rows: int, changed: bool,
+    complete: bool = True,
+) -> None:
+    """Record an import. If it changed any rows, other files' fingerprints of
+    the same kind may no longer describe the table, so they are dropped. A
+    file that left rows out (``complete`` false) is not remembered, so the
+    next import reads it again."""
+    if changed:
+        forget_files(session, kind)
+    else:
+        session.execute(delete(ImportedFile).where(
+            ImportedFile.kind == kind, ImportedFile.target == target, ImportedFile.sha256 == digest,
+        ))
+    if complete:
+        session.execute(insert(ImportedFile).values(kind=kind, target=target, sha256=digest, rows=rows))
+
+
+def forget_files(session: OrmSession, kind: str) -> None:
+    """Call after writing rates/tariffs outside an import so re-importing a
+    file always re-applies it."""
+    session.execute(delete(ImportedFile).where(ImportedFile.kind == kind))
+
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import csv
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+
+# File formats by extension. CSV and the columnar formats have one header
+# row, with "Customer" first for multi-customer files; Parquet and Arrow IPC
+# (Feather v2) need pyarrow, which is only imported when one is used.
+FORMATS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+SUFFIXES = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+COLUMNAR = ("parquet", "arrow")
+
+# Rows per CSV write and per Arrow record batch.
+BATCH_SIZE = 5000
+
+
+def file_format(path) -> str:
+    """The format of ``path`` from its extension; ``ValueError`` if unsupported."""
+    suffix = Path(path).suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(
+            f"Unsupported file type {suffix or Path(path).name!r}; "
+            f"expected one of {', '.join(FORMATS)}"
+        )
+    return FORMATS[suffix]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet and Arrow files need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def _batches(rows: Iterable[Sequence[Any]], size: int = BATCH_SIZE) -> Iterator[List[Sequence[Any]]]:
+    rows = iter(rows)
+    return iter(lambda: list(islice(rows, size)), [])
+
+
+class WorkbookRows:
+    """Rows of the active sheet of a workbook, read-only and streamed."""
+
+    def __init__(self, path) -> None:
+        self._wb = load_workbook(filename=path, read_only=True, data_only=True)
+        self._ws = self._wb.active
+
+    def head(self, n: int) -> List[Tuple[Any, ...]]:
+        return list(self._ws.iter_rows(min_row=1, max_row=n, values_only=True))
+
+    def rows(self, start: int) -> Iterator[Tuple[Any, ...]]:
+        return self._ws.iter_rows(min_row=start, values_only=True)
+
+    def close(self) -> None:
+        self._wb.close()
+
+
+class CsvRows:
+    """Rows of a UTF-8 CSV file (a BOM from Excel is dropped), as strings."""
+
+    def __init__(self, path) -> None:
+        self._fh = open(path, newline="", encoding="utf-8-sig")
+
+    def head(self, n: int) -> List[Tuple[Any, ...]]:
+        self._fh.seek(0)
+        return [tuple(row) for row in islice(csv.reader(self._fh), n)]
+
+    def rows(self, start: int) -> Iterator[Tuple[Any, ...]]:
+        self._fh.seek(0)
+        return islice(csv.reader(self._fh), start - 1, None)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class ArrowRows:
+    """Rows of a Parquet or Arrow IPC file, converted a record batch at a
+    time. The column names stand in for the header row, so data starts on
+    row 2 as it does in a CSV file."""
+
+    def __init__(self, path, fmt: str) -> None:
+        pa = _pyarrow()
+        if fmt == "parquet":
+            self._file = pa.parquet.ParquetFile(path)
+            self.names = self._file.schema_arrow.names
+            self._source = None
+        else:
+            self._source = pa.memory_map(str(path))
+            self._file = pa.ipc.open_file(self._source)
+            self.names = self._file.schema.names
+
+    def _record_batches(self):
+        if self._source is None:
+            return self._file.iter_batches(batch_size=BATCH_SIZE)
+        return (self._file.get_batch(i) for i in range(self._file.num_record_batches))
+
+    def head(self, n: int) -> List[Tuple[Any, ...]]:
+        return [tuple(self.names)] + list(islice(self.rows(2), n - 1))
+
+    def rows(self, start: int) -> Iterator[Tuple[Any, ...]]:
+        def generate():
+            for batch in self._record_batches():
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+        return islice(generate(), start - 2, None)
+
+    def close(self) -> None:
+        if self._source is not None:
+            self._source.close()
+
+
+def open_rows(path, fmt: Optional[str] = None):
+    """A row reader for ``path`` with ``head(n)``, ``rows(start)`` and
+    ``close()``; row numbers are 1-based and include the header."""
+    fmt = fmt or file_format(path)
+    if fmt == "xlsx":
+        return WorkbookRows(path)
+    if fmt == "csv":
+        return CsvRows(path)
+    return ArrowRows(path, fmt)
+
+
+def write_csv(path, headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """Stream ``rows`` to a CSV file under one header row; returns the row count."""
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(headers)
+        for batch in _batches(rows):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def _column_type(pa, header: str):
+    # Money columns are the ones named for their currency.
+    return pa.float64() if header.endswith((" USD", " AUD")) else pa.string()
+
+
+def _column(pa, values, kind):
+    if kind == pa.string():
+        values = [None if v is None else str(v) for v in values]
+    return pa.array(values, type=kind)
+
+
+def write_columnar(path, headers: Sequence[str], rows: Iterable[Sequence[Any]], fmt: str) -> int:
+    """Write ``rows`` as Parquet or Arrow IPC in ``BATCH_SIZE`` record
+    batches; money columns are float64, everything else string."""
+    pa = _pyarrow()
+    schema = pa.schema([(h, _column_type(pa, h)) for h in headers])
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(str(path), schema)
+    else:
+        writer = pa.ipc.new_file(str(path), schema)
+    count = 0
+    with writer:
+        for batch in _batches(rows):
+            columns = zip(*batch)
+            writer.write_batch(pa.record_batch(
+                [_column(pa, values, field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(batch)
+    return count
@@ -1,37 +1,29 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
-import json
+from typing import Iterable, List, Tuple, Dict, Any, Optional
 import questionary
-from openpyxl import Workbook
+from prompt_toolkit.completion import Completer, Completion
 from lib.db.models import Session, Customer, Rate, Tariff
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
-from openpyxl import load_workbook
+from lib.importer import IN_CHUNK, Progress, RateSheet, import_tariff_sheet
+from lib.validation import parse_money
+from lib.exporter import write_rows
+from lib.formats import SUFFIXES
+from lib.fingerprints import forget_files
+from lib.registry import KINDS, add_value, get_registry
+from lib.queries import customer_names
+from lib.repository import find_customer, unit_of_work
 from datetime import datetime
 
-DATA_CONSTANTS = Path(__file__).resolve().parents[1] / "data" / "data_constants.json"
-
-def _load_constants() -> Dict[str, Any]:
-    if DATA_CONSTANTS.exists():
-        try:
-            return json.loads(DATA_CONSTANTS.read_text())
-        except Exception:
-            pass
-    return {
-        "VALID_LOAD_PORTS": ["MELBOURNE", "SYDNEY", "BRISBANE"],
-        "VALID_DEST_PORTS": ["TAICHUNG", "SHANGHAI", "NINGBO", "SHEKOU", "TOKYO"],
-        "VALID_CONTAINERS": ["20GP", "40GP", "40HC", "20RE", "40REHC"],
-        "VALID_DTHC": ["COLLECT", "PREPAID"],
-    }
+ADD_NEW_CHOICE = "+ Add new..."
+# Suggestions shown by the customer name autocomplete.
+CUSTOMER_MATCHES = 20
 
 def get_valid_ports() -> Tuple[List[str], List[str], List[str], List[str]]:
-    const = _load_constants()
-    return (
-        const.get("VALID_LOAD_PORTS", []),
-        const.get("VALID_DEST_PORTS", []),
-        const.get("VALID_CONTAINERS", []),
-        const.get("VALID_DTHC", []),
-    )
+    registry = get_registry()
+    return tuple(list(registry.choices[kind]) for kind in KINDS)
 
 def load_data() -> List[Customer]:
     s = Session()
@@ -54,6 +46,42 @@ def _ask_choice(prompt: str, choices: List[str]) -> str:
 def _ask_text(prompt: str, default: Optional[str] = None) -> str:
     return questionary.text(prompt, default=default or "").ask() or ""
 
+def _ask_registered(prompt: str, kind: str, choices: List[str]) -> str:
+    while True:
+        answer = _ask_choice(prompt, list(choices) + [ADD_NEW_CHOICE])
+        if answer != ADD_NEW_CHOICE:
+            return answer
+        value = _ask_text(f"New {kind.replace('_', ' ')}:").strip().upper()
+        if not value:
+            continue
+        with unit_of_work(Session) as s:
+            value = add_value(s, kind, value)
+        return value
+
+class CustomerCompleter(Completer):
+    """Completes customer names with an indexed prefix query per keystroke,
+    so the prompt never loads the full customer list."""
+
+    def __init__(self, session, limit: int = CUSTOMER_MATCHES) -> None:
+        self.session = session
+        self.limit = limit
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        for name in customer_names(self.session, text.strip().upper(), self.limit):
+            yield Completion(name, start_position=-len(text))
+
+def ask_customer(session, prompt: str = "Select Customer:") -> str:
+    """Autocomplete a customer name; only names that exist are accepted."""
+    answer = questionary.autocomplete(
+        prompt,
+        choices=[],
+        completer=CustomerCompleter(session),
+        validate=lambda text: find_customer(session, text) is not None
+        or "Please select a valid customer",
+    ).ask()
+    return (answer or "").strip().upper()
+
 def _ask_confirm(prompt: str, default: bool = False) -> bool:
     return questionary.confirm(prompt, default=default).ask()
 
@@ -65,16 +93,17 @@ def rate_values_prompt(
     defaults: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     defaults = defaults or {}
-    load_port = _ask_choice("Load Port:", load_ports)
-    dest_port = _ask_choice("Destination Port:", dest_ports)
-    container = _ask_choice("Container Type:", containers)
+    load_port = _ask_registered("Load Port:", "load_port", load_ports)
+    dest_port = _ask_registered("Destination Port:", "destination_port", dest_ports)
+    container = _ask_registered("Container Type:", "container_type", containers)
 
     def _num(name: str, default: Any = "") -> float:
-        val = _ask_text(f"{name}:", str(defaults.get(name, default)))
-        try:
-            return float(val)
-        except Exception:
-            return 0.0
+        while True:
+            val = _ask_text(f"{name}:", str(defaults.get(name, default)))
+            try:
+                return parse_money(val)
+            except ValueError:
+                print(f" {val!r} is not a number.")
 
     freight_usd = _num("freight_usd", defaults.get("freight_usd", "0"))
     othc_aud = _num("othc_aud", defaults.get("othc_aud", "0"))
@@ -102,17 +131,42 @@ def rate_values_prompt(
 def format_rate_choice(r: Rate, idx: int) -> str:
     return f"{idx+1}: {r.load_port} → {r.destination_port} ({r.container_type})  USD {r.freight_usd:.2f}"
 
+def _tariff_fields(values: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(
+        load_port=values["load_port"],
+        destination_port=values["destination_port"],
+        container_type=values["container_type"],
+        freight_usd=float(values["freight_usd"]),
+        othc_aud=float(values["othc_aud"]),
+        doc_aud=float(values["doc_aud"]),
+        cmr_aud=float(values["cmr_aud"]),
+        ams_usd=float(values["ams_usd"]),
+        lss_usd=float(values["lss_usd"]),
+        dthc=str(values["dthc"]).upper(),
+        free_time=str(values["free_time"]),
+    )
+
 class TariffManager:
-    def __init__(self) -> None:
+    """Tariffs for the menu. ``items`` is read once, then kept in step with
+    each add and delete; ``load_tariffs`` re-reads the whole table."""
+
+    def __init__(self, session_factory=Session) -> None:
         self.items: List[Tariff] = []
+        self.loaded = False
+        self._session_factory = session_factory
 
     def load_tariffs(self) -> None:
-        s = Session()
+        s = self._session_factory()
         try:
-            self.items = s.query(Tariff).all()
+            self.items = s.query(Tariff).order_by(Tariff.id).all()
+            self.loaded = True
         finally:
             s.close()
 
+    def ensure_loaded(self) -> None:
+        if not self.loaded:
+            self.load_tariffs()
+
     def save_tariffs(self) -> None:
         return
 
@@ -122,27 +176,55 @@ class TariffManager:
         destination_port: str,
         container_type: str,
         values: Dict[str, Any],
-    ) -> None:
-        s = Session()
+    ) -> Tariff:
+        return self.add_many([dict(
+            values,
+            load_port=load_port,
+            destination_port=destination_port,
+            container_type=container_type,
+        )])[0]
+
+    def add_many(self, rows: Iterable[Dict[str, Any]]) -> List[Tariff]:
+        """Insert every row in one transaction and append them to ``items``.
+
+        Each lane can have one tariff, so if any row's lane already exists
+        (or repeats within ``rows``) nothing is added and ``ValueError``
+        names the clashing lanes.
+        """
+        tariffs = [Tariff(**_tariff_fields(values)) for values in rows]
+        if not tariffs:
+            return []
+        try:
+            with unit_of_work(self._session_factory) as s:
+                s.add_all(tariffs)
+                forget_files(s, "tariffs")
+                s.flush()
+                # Detach before commit so ids and values stay loaded without a re-read.
+                for t in tariffs:
+                    s.expunge(t)
+        except IntegrityError:
+            raise ValueError(self._clashes(tariffs)) from None
+        if self.loaded:
+            self.items.extend(tariffs)
+        return tariffs
+
+    def _clashes(self, tariffs: List[Tariff]) -> str:
+        lanes = [(t.load_port, t.destination_port, t.container_type) for t in tariffs]
+        seen, clashing = set(), []
+        for lane in lanes:
+            if lane in seen:
+                clashing.append(lane)
+            seen.add(lane)
+        s = self._session_factory()
         try:
-            t = Tariff(
-                load_port=load_port,
-                destination_port=destination_port,
-                container_type=container_type,
-                freight_usd=float(values["freight_usd"]),
-                othc_aud=float(values["othc_aud"]),
-                doc_aud=float(values["doc_aud"]),
-                cmr_aud=float(values["cmr_aud"]),
-                ams_usd=float(values["ams_usd"]),
-                lss_usd=float(values["lss_usd"]),
-                dthc=str(values["dthc"]).upper(),
-                free_time=str(values["free_time"]),
-            )
-            s.add(t)
-            s.commit()
+            cols = (Tariff.load_port, Tariff.destination_port, Tariff.container_type)
+            for i in range(0, len(lanes), IN_CHUNK // 3):
+                stmt = select(*cols).where(tuple_(*cols).in_(lanes[i:i + IN_CHUNK // 3]))
+                clashing.extend(tuple(row) for row in s.execute(stmt))
         finally:
             s.close()
-        self.load_tariffs()
+        names = ", ".join(f"{lp} → {dp} ({ct})" for lp, dp, ct in dict.fromkeys(clashing))
+        return f"Tariff already exists: {names}"
 
     def delete_tariff(self, selected_index: int) -> bool:
         if not self.items:
@@ -150,88 +232,55 @@ class TariffManager:
             return False
         i = max(0, min(selected_index, len(self.items) - 1))
         to_delete = self.items[i]
-        s = Session()
-        try:
-            obj = s.get(Tariff, to_delete.id)
-            if obj:
-                s.delete(obj)
-                s.commit()
-                print(
-                    f"\n Deleted tariff: {to_delete.load_port} → "
-                    f"{to_delete.destination_port} ({to_delete.container_type})\n"
-                )
-                return True
+        if not self.delete_many([i]):
             return False
-        finally:
-            s.close()
-            self.load_tariffs()
+        print(
+            f"\n Deleted tariff: {to_delete.load_port} → "
+            f"{to_delete.destination_port} ({to_delete.container_type})\n"
+        )
+        return True
+
+    def delete_many(self, indexes: Iterable[int]) -> int:
+        """Delete the tariffs at ``indexes`` of ``items`` in one transaction
+        and drop them from ``items``. Returns how many were deleted."""
+        ids = sorted({self.items[i].id for i in indexes})
+        if not ids:
+            return 0
+        deleted = 0
+        with unit_of_work(self._session_factory) as s:
+            for chunk in range(0, len(ids), IN_CHUNK):
+                deleted += s.execute(
+                    delete(Tariff).where(Tariff.id.in_(ids[chunk:chunk + IN_CHUNK]))
+                ).rowcount
+            if deleted:
+                forget_files(s, "tariffs")
+        gone = set(ids)
+        self.items = [t for t in self.items if t.id not in gone]
+        return deleted
 
     def import_tariff_rates(self):
         file_path = questionary.text(
-            "Enter path to Tariff Excel file:", default=f"{EXPORTS_DIR}/"
+            "Enter path to tariff file (.xlsx, .csv, .parquet, .arrow):", default=f"{EXPORTS_DIR}/"
         ).ask()
 
         try:
-            wb = load_workbook(filename=file_path)
+            sheet = RateSheet(file_path, allow_customer=False)
         except Exception as e:
             print(f"\n Could not open file: {e}\n")
             return
 
-        ws = wb.active
-        new_count = updated_count = skipped_count = 0
-        s = Session()
-        try:
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row is None or all(v is None for v in row):
-                    continue
-
-                (load_port, destination_port, container_type,
-                freight_usd, othc_aud, doc_aud, cmr_aud,
-                ams_usd, lss_usd, dthc, free_time) = row
-
-                def _f(x):
-                    try:
-                        return float(x)
-                    except Exception:
-                        return 0.0
-
-                values = dict(
-                    load_port=(load_port or "").strip(),
-                    destination_port=(destination_port or "").strip(),
-                    container_type=(container_type or "").strip(),
-                    freight_usd=_f(freight_usd),
-                    othc_aud=_f(othc_aud),
-                    doc_aud=_f(doc_aud),
-                    cmr_aud=_f(cmr_aud),
-                    ams_usd=_f(ams_usd),
-                    lss_usd=_f(lss_usd),
-                    dthc=str(dthc or "").upper(),
-                    free_time=str(free_time or ""),
-                )
-
-                existing = s.query(Tariff).filter_by(
-                    load_port=values["load_port"],
-                    destination_port=values["destination_port"],
-                    container_type=values["container_type"],
-                ).first()
-
-                if existing:
-                    changed = any(getattr(existing, k) != v for k, v in values.items())
-                    if changed:
-                        for k, v in values.items():
-                            setattr(existing, k, v)
-                        updated_count += 1
-                    else:
-                        skipped_count += 1
-                else:
-                    s.add(Tariff(**values))
-                    new_count += 1
-
-            s.commit()
-            print(f"\n Tariff import complete: {new_count} new, {updated_count} updated, {skipped_count} skipped.\n")
-        finally:
-            s.close()
-            self.load_tariffs()
+        progress = Progress("Imported")
+        with sheet, unit_of_work(self._session_factory) as s:
+            new_count, updated_count, skipped_count = import_tariff_sheet(s, sheet, progress)
+        progress.done()
+        if sheet.unchanged:
+            print("\n File unchanged since it was last imported; nothing to do.\n")
+            return
+        # An import can touch any number of rows; re-read on next use.
+        self.loaded = False
+        print(f"\n Tariff import complete: {new_count} new, {updated_count} updated, {skipped_count} skipped.\n")
+        if sheet.rejected:
+            print(f" {len(sheet.rejected)} rows rejected; see {sheet.write_rejected(EXPORTS_DIR)}\n")
 
 EXPORTS_DIR = Path(__file__).resolve().parents[1] / "exports"
 EXPORTS_DIR.mkdir(exist_ok=True)
@@ -250,114 +299,44 @@ def _tariff_to_row(t: Tariff) -> List[Any]:
         t.ams_usd, t.lss_usd, t.dthc, t.free_time
     ]
 
-def export_rates_to_excel(rates, file_prefix, directory=None) -> Path:
+EXPORT_FILE_HEADERS = [
+    "Load Port", "Destination Port", "Container",
+    "Freight USD", "OTHC AUD", "DOC AUD", "CMR AUD",
+    "AMS USD", "LSS USD", "DTHC", "Free Time"
+]
+
+def export_rates_to_excel(rates, file_prefix, directory=None, fmt: str = "xlsx") -> Path:
     outdir = Path(directory) if directory else EXPORTS_DIR
     outdir.mkdir(parents=True, exist_ok=True)
 
     current_date = datetime.now().strftime("%d_%m_%Y")
 
-    out_path = outdir / f"{file_prefix}_{current_date}.xlsx"
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rates"
-    headers = [
-        "Load Port", "Destination Port", "Container",
-        "Freight USD", "OTHC AUD", "DOC AUD", "CMR AUD",
-        "AMS USD", "LSS USD", "DTHC", "Free Time"
-    ]
-    ws.append(headers)
-
-    for r in rates:
-        if hasattr(r, "to_row") and callable(getattr(r, "to_row")):
-            ws.append(list(r.to_row()))
-        else:
-            ws.append(_rate_to_row(r))
+    out_path = outdir / f"{file_prefix}_{current_date}{SUFFIXES[fmt]}"
 
-    wb.save(out_path)
+    rows = (
+        list(r.to_row()) if hasattr(r, "to_row") and callable(getattr(r, "to_row"))
+        else _rate_to_row(r)
+        for r in rates
+    )
+    write_rows(out_path, EXPORT_FILE_HEADERS, rows, "Rates")
     return out_path
 
-def export_tariff_rates_to_excel(tariffs: List[Tariff], filename: str) -> Path:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Tariff Rates"
-    headers = [
-        "Load Port", "Destination Port", "Container",
-        "Freight USD", "OTHC AUD", "DOC AUD", "CMR AUD",
-        "AMS USD", "LSS USD", "DTHC", "Free Time"
-    ]
-    ws.append(headers)
-    for t in tariffs:
-        ws.append(_tariff_to_row(t))
-    out = EXPORTS_DIR / f"{filename}.xlsx"
-    wb.save(out)
+def export_tariff_rates_to_excel(tariffs: Iterable[Tariff], filename: str, fmt: str = "xlsx") -> Path:
+    out = EXPORTS_DIR / f"{filename}{SUFFIXES[fmt]}"
+    write_rows(out, EXPORT_FILE_HEADERS, (_tariff_to_row(t) for t in tariffs), "Tariff Rates")
     return out
 
-def replace_or_add_rate(customer_name, values):
-
-    name = (customer_name or "").strip().upper()
-    s = Session()
-    try:
-        customer = s.query(Customer).filter_by(name=name).first()
-        if not customer:
-            customer = Customer(name=name)
-            s.add(customer)
-            s.flush()
-
-        lp  = (values.get("load_port") or "").strip()
-        dp  = (values.get("destination_port") or "").strip()
-        ctn = (values.get("container_type") or "").strip()
-
-        rate = s.query(Rate).filter_by(
-            customer_id=customer.id,
-            load_port=lp,
-            destination_port=dp,
-            container_type=ctn,
-        ).first()
-
-        def _f(x):
-            try: return float(x)
-            except Exception: return 0.0
-
-        fields = dict(
-            load_port=lp,
-            destination_port=dp,
-            container_type=ctn,
-            freight_usd=_f(values.get("freight_usd")),
-            othc_aud=_f(values.get("othc_aud")),
-            doc_aud=_f(values.get("doc_aud")),
-            cmr_aud=_f(values.get("cmr_aud")),
-            ams_usd=_f(values.get("ams_usd")),
-            lss_usd=_f(values.get("lss_usd")),
-            dthc=str(values.get("dthc") or "").upper(),
-            free_time=str(values.get("free_time") or ""),
-            customer_id=customer.id,
-        )
-
-        if rate:
-            for k, v in fields.items():
-                setattr(rate, k, v)
-        else:
-            rate = Rate(**fields)
-            s.add(rate)
-
-        s.commit()
-        s.refresh(rate)
-        return rate
-    finally:
-        s.close()
-
 def replace_or_add_rate(customer, new_rate, replace_existing=None):
 
-    match = None
-    for r in getattr(customer, "rates", []):
-        if (
-            r.load_port == new_rate.load_port and
-            r.destination_port == new_rate.destination_port and
-            r.container_type == new_rate.container_type
-        ):
-            match = r
-            break
+    lane = (new_rate.load_port, new_rate.destination_port, new_rate.container_type)
+    if hasattr(customer, "find_rate"):
+        match = customer.find_rate(*lane)
+    else:
+        match = next(
+            (r for r in getattr(customer, "rates", [])
+             if (r.load_port, r.destination_port, r.container_type) == lane),
+            None,
+        )
 
     if match:
         if replace_existing is None:
@@ -376,8 +355,11 @@ def replace_or_add_rate(customer, new_rate, replace_existing=None):
             setattr(match, attr, getattr(new_rate, attr))
         return match
     else:
-        if not hasattr(customer, "rates"):
-            customer.rates = []
-        customer.rates.append(new_rate)
+        if hasattr(customer, "add_rate"):
+            customer.add_rate(new_rate)
+        else:
+            if not hasattr(customer, "rates"):
+                customer.rates = []
+            customer.rates.append(new_rate)
         return new_rate
 
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, insert, literal, or_, select, tuple_, update
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import Customer, Rate, RateHistory, RATE_FIELDS
+
+# Row-value IN lists bind four parameters per lane.
+LANE_CHUNK = 125
+ID_CHUNK = 500
+
+VERSION_COLUMNS = ("customer_id",) + RATE_FIELDS
+
+
+def _lane(model):
+    return tuple_(model.customer_id, model.load_port, model.destination_port, model.container_type)
+
+
+def close_rate_versions(session: OrmSession, where, now: datetime) -> None:
+    """End the open version of every lane currently matched by ``where`` on rates."""
+    lanes = select(Rate.customer_id, Rate.load_port, Rate.destination_port, Rate.container_type).where(where)
+    session.execute(
+        update(RateHistory)
+        .where(RateHistory.valid_to.is_(None), _lane(RateHistory).in_(lanes))
+        .values(valid_to=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def open_rate_versions(session: OrmSession, where, now: datetime) -> None:
+    """Copy the rates matched by ``where`` into history as versions starting at ``now``."""
+    session.execute(
+        insert(RateHistory).from_select(
+            list(VERSION_COLUMNS) + ["valid_from"],
+            select(*[getattr(Rate, c) for c in VERSION_COLUMNS], literal(now, DateTime)).where(where),
+        )
+    )
+
+
+def record_rate_versions(session: OrmSession, where, now: Optional[datetime] = None) -> None:
+    """Close the current version of each matched rate and append its new
+    values. Call after the rates table has been written, in the same
+    transaction; the copy happens entirely in SQL."""
+    now = now or datetime.now()
+    close_rate_versions(session, where, now)
+    open_rate_versions(session, where, now)
+
+
+def record_rates_by_id(session: OrmSession, ids: Iterable[int], now: Optional[datetime] = None) -> None:
+    ids = list(ids)
+    now = now or datetime.now()
+    for i in range(0, len(ids), ID_CHUNK):
+        record_rate_versions(session, Rate.id.in_(ids[i:i + ID_CHUNK]), now)
+
+
+def record_rates_by_lane(
+    session: OrmSession, lanes: Iterable[Tuple[int, str, str, str]], now: Optional[datetime] = None
+) -> None:
+    lanes = list(lanes)
+    now = now or datetime.now()
+    for i in range(0, len(lanes), LANE_CHUNK):
+        record_rate_versions(session, _lane(Rate).in_(lanes[i:i + LANE_CHUNK]), now)
+
+
+def _lane_filter(customer_name: str, load_port: str, destination_port: str, container_type: str):
+    return (
+        Customer.name == customer_name.strip().upper(),
+        RateHistory.load_port == load_port,
+        RateHistory.destination_port == destination_port,
+        RateHistory.container_type == container_type,
+    )
+
+
+def rate_as_of(
+    session: OrmSession,
+    customer_name: str,
+    load_port: str,
+    destination_port: str,
+    container_type: str,
+    when: datetime,
+) -> Optional[RateHistory]:
+    """The version of a customer's lane that was in force at ``when``."""
+    return session.scalars(
+        select(RateHistory)
+        .join(Customer, Customer.id == RateHistory.customer_id)
+        .where(
+            *_lane_filter(customer_name, load_port, destination_port, container_type),
+            RateHistory.valid_from <= when,
+            or_(RateHistory.valid_to.is_(None), RateHistory.valid_to > when),
+        )
+        .order_by(RateHistory.valid_from.desc())
+        .limit(1)
+    ).first()
+
+
+def lane_history(
+    session: OrmSession,
+    customer_name: str,
+    load_port: str,
+    destination_port: str,
+    container_type: str,
+) -> List[RateHistory]:
+    return session.scalars(
+        select(RateHistory)
+        .join(Customer, Customer.id == RateHistory.customer_id)
+        .where(*_lane_filter(customer_name, load_port, destination_port, container_type))
+        .order_by(RateHistory.valid_from, RateHistory.id)
+    ).all()
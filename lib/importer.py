@@ -0,0 +1,540 @@
+from __future__ import annotations
+import glob
+import os
+import time
+from functools import cached_property
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, update, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import (
+    Session, Rate, Tariff, LANE_FIELDS, VALUE_FIELDS, RATE_FIELDS, row_hash
+)
+from lib.formats import FORMATS, file_format, open_rows
+from lib.fingerprints import file_digest, imported_rows, remember_file
+from lib.history import record_rates_by_lane
+from lib.instrumentation import record_rows
+from lib.registry import Registry, get_registry
+from lib.repository import customer_ids
+from lib.validation import Rejected, Validator, write_rejected_rows
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lists.
+IN_CHUNK = 500
+# Rows handed to the DB writer at a time when streaming a workbook.
+CHUNK_SIZE = 5000
+
+HEADER_LABELS = {"customer", "pol", "load port"}
+
+
+_SCHEMA = Validator()
+
+
+def normalise_rate_values(row: Iterable[Any]) -> Dict[str, Any]:
+    """Parse one 11-column row; raises ``ValueError`` listing what's wrong."""
+    row = tuple(row)
+    if len(row) != len(RATE_FIELDS):
+        raise ValueError(f"Expected {len(RATE_FIELDS)} values, got {len(row)}")
+    values, errors = _SCHEMA.validate(row)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return values
+
+
+def _chunks(items: List[Any], size: int = IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _existing_rates(session: OrmSession, ids: Iterable[int]) -> Dict[Tuple, Tuple]:
+    cols = [Rate.id, Rate.customer_id, Rate.load_port, Rate.destination_port,
+            Rate.container_type, Rate.row_hash]
+    existing: Dict[Tuple, Tuple] = {}
+    for chunk in _chunks(sorted(set(ids))):
+        for rate_id, customer_id, lp, dp, ct, stored in session.execute(
+            select(*cols).where(Rate.customer_id.in_(chunk))
+        ):
+            existing[(customer_id, lp, dp, ct)] = (rate_id, stored)
+    return existing
+
+
+def _existing_tariffs(session: OrmSession, keys: Iterable[Tuple]) -> Dict[Tuple, Tuple]:
+    cols = [Tariff.id, Tariff.load_port, Tariff.destination_port, Tariff.container_type,
+            Tariff.row_hash]
+    lane = tuple_(Tariff.load_port, Tariff.destination_port, Tariff.container_type)
+    existing: Dict[Tuple, Tuple] = {}
+    for chunk in _chunks(sorted(set(keys)), IN_CHUNK // 3):
+        for tariff_id, lp, dp, ct, stored in session.execute(
+            select(*cols).where(lane.in_(chunk)).order_by(Tariff.id)
+        ):
+            existing.setdefault((lp, dp, ct), (tariff_id, stored))
+    return existing
+
+
+def _upsert_stmt(model, conflict: Tuple[str, ...]):
+    stmt = sqlite_insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=list(conflict),
+        set_={k: stmt.excluded[k] for k in VALUE_FIELDS + ("row_hash",)},
+    )
+
+
+def _write_diff(
+    session: OrmSession,
+    model,
+    conflict: Tuple[str, ...],
+    keyed: List[Tuple[Tuple, Dict[str, Any]]],
+    existing: Dict[Tuple, Tuple],
+) -> Tuple[Tuple[int, int, int], List[Tuple]]:
+    """Write the rows whose ``row_hash`` differs from the stored one in
+    ``existing``; returns the counts and the keys of every row inserted or
+    changed. ``existing`` is updated to match, with ``None`` for the id of
+    rows inserted here, so it can be reused for the next batch."""
+    inserts: Dict[Tuple, Dict[str, Any]] = {}
+    updates: Dict[int, Dict[str, Any]] = {}
+    updated_keys: List[Tuple] = []
+    new_count = updated_count = skipped_count = 0
+
+    for key, values in keyed:
+        current = values["row_hash"]
+
+        if key in inserts:
+            if inserts[key]["row_hash"] == current:
+                skipped_count += 1
+            else:
+                inserts[key] = values
+                updated_count += 1
+            continue
+
+        found = existing.get(key)
+        if found is None:
+            inserts[key] = values
+            new_count += 1
+            continue
+
+        row_id, stored = found
+        if stored == current:
+            skipped_count += 1
+        elif row_id is None:
+            # Inserted by an earlier batch; the upsert updates it by lane.
+            inserts[key] = values
+            updated_count += 1
+        else:
+            updates[row_id] = dict(values, id=row_id)
+            updated_keys.append(key)
+            existing[key] = (row_id, current)
+            updated_count += 1
+
+    if inserts:
+        # The lane key is unique on both tables, so a row written by another
+        # process since the prefetch turns into an update rather than an error.
+        session.execute(_upsert_stmt(model, conflict), list(inserts.values()))
+        # The last repeat of a lane is what was written.
+        for key, values in inserts.items():
+            existing[key] = (None, values["row_hash"])
+    if updates:
+        session.execute(update(model), list(updates.values()))
+
+    changed = list(inserts) + [k for k in dict.fromkeys(updated_keys) if k not in inserts]
+    return (new_count, updated_count, skipped_count), changed
+
+
+class ExistingRates:
+    """``(customer_id, *lane) -> (rate id, row_hash)`` for every customer
+    seen so far in one import. Each customer's rates are read once, however
+    many batches they span, and the map follows the batches' own writes."""
+
+    def __init__(self) -> None:
+        self.lanes: Dict[Tuple, Tuple] = {}
+        self.customers: set = set()
+
+    def load(self, session: OrmSession, ids: Iterable[int]) -> Dict[Tuple, Tuple]:
+        missing = set(ids) - self.customers
+        if missing:
+            self.lanes.update(_existing_rates(session, missing))
+            self.customers |= missing
+        return self.lanes
+
+
+def upsert_rates(
+    session: OrmSession,
+    rows: Iterable[Tuple[str, Dict[str, Any]]],
+    existing: Optional[ExistingRates] = None,
+) -> Tuple[int, int, int]:
+    """Insert or update ``(customer_name, values)`` rows as one set operation.
+
+    Every existing rate for the affected customers is fetched in a single
+    pass keyed on the ``uq_customer_lane_container`` tuple, or taken from
+    ``existing``, which a caller writing many batches passes to each so no
+    customer is read twice. The diff compares each row's ``row_hash`` in
+    memory and the writes go out as two executemany batches; the lanes
+    that changed get a new version in ``rate_history``. Returns
+    ``(new, updated, skipped)`` counted the same way as the old per-row
+    import: a lane repeated later in the same batch counts as an update.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0, 0, 0
+
+    ids = customer_ids(session, (name for name, _ in rows))
+    lanes = (existing or ExistingRates()).load(session, ids.values())
+    keyed = []
+    for name, values in rows:
+        customer_id = ids[name]
+        key = (customer_id,) + tuple(values[k] for k in LANE_FIELDS)
+        keyed.append((key, dict(values, customer_id=customer_id, row_hash=row_hash(values))))
+    counts, changed = _write_diff(session, Rate, ("customer_id",) + LANE_FIELDS, keyed, lanes)
+    record_rates_by_lane(session, changed)
+    return counts
+
+
+def upsert_tariffs(
+    session: OrmSession, rows: Iterable[Dict[str, Any]]
+) -> Tuple[int, int, int]:
+    keyed = [
+        (tuple(values[k] for k in LANE_FIELDS), dict(values, row_hash=row_hash(values)))
+        for values in rows
+    ]
+    if not keyed:
+        return 0, 0, 0
+    existing = _existing_tariffs(session, (key for key, _ in keyed))
+    counts, _ = _write_diff(session, Tariff, LANE_FIELDS, keyed, existing)
+    return counts
+
+
+class Progress:
+    def __init__(self, label: str = "Processed") -> None:
+        self.label = label
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def tick(self, n: int) -> None:
+        self.rows += n
+        print(f"\r {self.label} {self.rows:,} rows ({self.rate:,.0f} rows/s)", end="", flush=True)
+
+    def done(self) -> None:
+        if self.rows:
+            print()
+
+
+class RateSheet:
+    """Read-only, streaming view over a rate or tariff file.
+
+    The format comes from the extension (see ``lib.formats``): a workbook,
+    CSV, Parquet or Arrow IPC file with the ``EXPORT_HEADERS`` columns, plus
+    a leading Customer column for multi-customer files. Workbooks keep the
+    quote layout (headers on row 3 when there is a Customer column); the
+    other formats have their headers on row 1.
+
+    Rows are pulled lazily and handed out in lists of at most
+    ``chunk_size`` normalised ``(customer, values)`` pairs, so memory is
+    bounded by the chunk rather than the file. The customer is ``None`` for
+    single-customer sheets. ``unchanged`` is set when an import
+    short-circuits on the file's content hash.
+
+    Every row goes through ``validator``; rows that fail are kept in
+    ``rejected`` rather than imported. Call ``validate_against`` with the
+    registry before reading to also check ports, containers and DTHC.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = CHUNK_SIZE,
+        allow_customer: bool = True,
+        registry: Optional[Registry] = None,
+    ) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        self.skipped = 0
+        self.unchanged = False
+        self.validator = Validator(registry)
+        self.rejected: List[Rejected] = []
+        self.format = file_format(path)
+        self._reader = open_rows(path, self.format)
+
+        header_row = 3 if self.format == "xlsx" else 1
+        head = self._reader.head(header_row)
+        first_header = head[-1][0] if len(head) == header_row and head[-1] else None
+        self.is_multi_customer = (
+            allow_customer and str(first_header or "").strip().lower() == "customer"
+        )
+        self.start_row = header_row + 1 if self.is_multi_customer else 2
+        self.width = len(RATE_FIELDS) + (1 if self.is_multi_customer else 0)
+
+    def validate_against(self, registry: Registry) -> None:
+        self.validator = Validator(registry)
+
+    def write_rejected(self, directory) -> Optional[Path]:
+        if not self.rejected:
+            return None
+        return write_rejected_rows(self.path, self.rejected, directory, self.is_multi_customer)
+
+    @cached_property
+    def digest(self) -> str:
+        return file_digest(self.path)
+
+    def __enter__(self) -> "RateSheet":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._reader.close()
+
+    def _rows(self) -> Iterator[Tuple[Optional[str], Dict[str, Any]]]:
+        validate = self.validator.validate
+        rows = self._reader.rows(self.start_row)
+        for number, row in enumerate(rows, self.start_row):
+            if row is None or all(v is None or v == "" for v in row):
+                continue
+            if str(row[0] or "").strip().lower() in HEADER_LABELS:
+                continue
+            row = tuple(row[:self.width]) + (None,) * (self.width - len(row))
+
+            if self.is_multi_customer:
+                customer_name, *rate_row = row
+                customer_name = str(customer_name or "").strip().upper()
+                if not customer_name:
+                    self.skipped += 1
+                    continue
+            else:
+                customer_name, rate_row = None, row
+
+            values, errors = validate(rate_row)
+            if errors:
+                self.rejected.append(Rejected(number, row, errors))
+                continue
+            yield customer_name, values
+
+    def chunks(self, progress: Optional[Progress] = None) -> Iterator[List[Tuple[Optional[str], Dict[str, Any]]]]:
+        chunk: List[Tuple[Optional[str], Dict[str, Any]]] = []
+        for item in self._rows():
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                if progress:
+                    progress.tick(len(chunk))
+                record_rows(len(chunk))
+                yield chunk
+                chunk = []
+        if chunk:
+            if progress:
+                progress.tick(len(chunk))
+            record_rows(len(chunk))
+            yield chunk
+
+
+def import_rate_sheet(
+    session: OrmSession,
+    sheet: RateSheet,
+    customer_name: Optional[str] = None,
+    progress: Optional[Progress] = None,
+    force: bool = False,
+) -> Tuple[int, int, int]:
+    """Stream every chunk of ``sheet`` through ``upsert_rates``.
+
+    Single-customer sheets are written to ``customer_name``. Returns
+    ``(new, updated, skipped)``; rows without a customer count as skipped.
+    A file already imported byte-for-byte into the same target is not read
+    again unless ``force``: every row counts as skipped and
+    ``sheet.unchanged`` is set. Rows failing validation against the
+    registry are left in ``sheet.rejected``. Any write drops the other
+    files' fingerprints, but a file with rejected rows is not fingerprinted
+    itself, so it is re-read once the registry or file is fixed.
+    """
+    if not sheet.is_multi_customer and not customer_name:
+        raise ValueError("A single-customer sheet needs a customer to import into.")
+    sheet.validate_against(get_registry(session))
+
+    target = "" if sheet.is_multi_customer else customer_name
+    if not force:
+        rows = imported_rows(session, "rates", [target], sheet.digest)
+        if rows is not None:
+            sheet.unchanged = True
+            return 0, 0, rows
+
+    new_count = updated_count = skipped_count = 0
+    existing = ExistingRates()
+    for chunk in sheet.chunks(progress):
+        if not sheet.is_multi_customer:
+            chunk = [(customer_name, values) for _, values in chunk]
+        new, updated, skipped = upsert_rates(session, chunk, existing)
+        new_count += new
+        updated_count += updated
+        skipped_count += skipped
+    skipped_count += sheet.skipped
+    remember_file(session, "rates", target, sheet.digest, new_count + updated_count + skipped_count,
+                  bool(new_count or updated_count), complete=not sheet.rejected)
+    return new_count, updated_count, skipped_count
+
+
+def import_tariff_sheet(
+    session: OrmSession, sheet: RateSheet, progress: Optional[Progress] = None, force: bool = False
+) -> Tuple[int, int, int]:
+    if not force:
+        rows = imported_rows(session, "tariffs", [""], sheet.digest)
+        if rows is not None:
+            sheet.unchanged = True
+            return 0, 0, rows
+
+    sheet.validate_against(get_registry(session))
+    new_count = updated_count = skipped_count = 0
+    for chunk in sheet.chunks(progress):
+        new, updated, skipped = upsert_tariffs(session, (values for _, values in chunk))
+        new_count += new
+        updated_count += updated
+        skipped_count += skipped
+    remember_file(session, "tariffs", "", sheet.digest, new_count + updated_count + skipped_count,
+                  bool(new_count or updated_count), complete=not sheet.rejected)
+    return new_count, updated_count, skipped_count
+
+
+def expand_paths(target: str) -> List[str]:
+    """Rate files (any supported format) under a directory, or the matches
+    of a glob pattern."""
+    if os.path.isdir(target):
+        return sorted(
+            str(p) for p in Path(target).iterdir()
+            if p.suffix.lower() in FORMATS and not p.name.startswith("~$")
+        )
+    return sorted(glob.glob(target))
+
+
+def parse_rate_file(
+    path: str, digest: Optional[str] = None, registry: Optional[Registry] = None
+) -> Dict[str, Any]:
+    """Parse and validate one rate file in a worker process; the writer gets
+    plain rows and the rejected ones back."""
+    started = time.perf_counter()
+    try:
+        with RateSheet(path, registry=registry) as sheet:
+            rows = [item for chunk in sheet.chunks() for item in chunk]
+            return {
+                "file": path, "digest": digest, "is_multi_customer": sheet.is_multi_customer,
+                "rows": rows, "skipped": sheet.skipped, "rejected": sheet.rejected,
+                "parse_seconds": time.perf_counter() - started,
+            }
+    except Exception as e:
+        return {"file": path, "error": f"Could not open file: {e}"}
+
+
+def import_rate_files(
+    paths: List[str],
+    customer_name: Optional[str] = None,
+    workers: Optional[int] = None,
+    session_factory=Session,
+    force: bool = False,
+    rejects_dir=None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Parse ``paths`` in parallel and write them through one session.
+
+    Parsing (openpyxl above all) is CPU-bound, so files are parsed across a
+    process pool while this process does all the writing, one file per
+    transaction in ``CHUNK_SIZE`` batches, in the order of ``paths`` so the
+    last file wins any lane several files share. A file that fails to parse
+    or write is reported and rolled back on its own. Files whose content
+    hash was already imported are skipped before parsing unless ``force``;
+    each file that changes rows drops the fingerprints recorded before it,
+    as a single import would. Rows failing validation are counted per file
+    and, with ``rejects_dir``, written to a rejected-rows workbook there.
+    Returns per-file summaries and a total with throughput.
+    """
+    started = time.perf_counter()
+    summaries: List[Dict[str, Any]] = []
+    totals = {"files": len(paths), "failed": 0, "unchanged": 0,
+              "rows": 0, "new": 0, "updated": 0, "skipped": 0, "rejected": 0}
+
+    s = session_factory()
+    try:
+        pending = []
+        for path in paths:
+            try:
+                digest = file_digest(path)
+            except OSError as e:
+                summaries.append({"file": path, "error": f"Could not open file: {e}"})
+                totals["failed"] += 1
+                continue
+            # Multi-customer files are fingerprinted under "", single ones under the customer.
+            rows = None if force else imported_rows(s, "rates", ["", customer_name or ""], digest)
+            if rows is None:
+                pending.append((path, digest))
+                continue
+            summaries.append({"file": path, "rows": rows, "new": 0, "updated": 0,
+                              "skipped": rows, "unchanged": True})
+            totals["unchanged"] += 1
+            totals["skipped"] += rows
+
+        registry = get_registry(s)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(parse_rate_file, path, digest, registry) for path, digest in pending
+            ]
+            # Applied in input order, so when files share a lane the later
+            # file wins however the parses finish.
+            for future in futures:
+                parsed = future.result()
+                summary = {"file": parsed["file"]}
+                summaries.append(summary)
+
+                if "error" not in parsed and not parsed["is_multi_customer"] and not customer_name:
+                    parsed["error"] = "Single-customer file needs a customer."
+                if "error" in parsed:
+                    summary["error"] = parsed["error"]
+                    totals["failed"] += 1
+                    continue
+
+                rows = parsed["rows"]
+                if not parsed["is_multi_customer"]:
+                    rows = [(customer_name, values) for _, values in rows]
+                try:
+                    new_count = updated_count = skipped_count = 0
+                    existing = ExistingRates()
+                    for chunk in _chunks(rows, CHUNK_SIZE):
+                        new, updated, skipped = upsert_rates(s, chunk, existing)
+                        new_count += new
+                        updated_count += updated
+                        skipped_count += skipped
+                    skipped_count += parsed["skipped"]
+                    remember_file(
+                        s, "rates", "" if parsed["is_multi_customer"] else customer_name,
+                        parsed["digest"], new_count + updated_count + skipped_count,
+                        bool(new_count or updated_count), complete=not parsed["rejected"],
+                    )
+                    s.commit()
+                except Exception as e:
+                    s.rollback()
+                    summary["error"] = str(e)
+                    totals["failed"] += 1
+                    continue
+
+                summary.update(
+                    rows=len(rows), new=new_count, updated=updated_count, skipped=skipped_count,
+                    rejected=len(parsed["rejected"]),
+                    parse_seconds=round(parsed["parse_seconds"], 3),
+                )
+                if parsed["rejected"] and rejects_dir is not None:
+                    summary["rejected_file"] = str(write_rejected_rows(
+                        parsed["file"], parsed["rejected"], rejects_dir, parsed["is_multi_customer"]
+                    ))
+                totals["rows"] += len(rows)
+                record_rows(len(rows))
+                totals["rejected"] += len(parsed["rejected"])
+                totals["new"] += new_count
+                totals["updated"] += updated_count
+                totals["skipped"] += skipped_count
+    finally:
+        s.close()
+
+    elapsed = time.perf_counter() - started
+    totals["seconds"] = round(elapsed, 3)
+    totals["rows_per_second"] = round(totals["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    return summaries, totals
@@ -0,0 +1,208 @@
+"""Opt-in timing for CLI actions.
+
+Off unless ``RATE_MANAGER_PROFILE`` is set (or ``--profile`` is passed to
+``python -m lib.cli``):
+
+- ``1`` / ``timing`` — one JSON line per action with wall time, SQL
+  statement count and time (from engine events), rows processed and
+  rows/s, and named phases such as ``render``.
+- ``cprofile`` — the same, plus a ``.prof`` dump per action next to the log.
+
+Lines go to ``RATE_MANAGER_PROFILE_LOG`` (default ``logs/profile.jsonl``).
+Summarise a log per action with ``python -m lib.instrumentation [LOG]``.
+When profiling is off every hook is a no-op.
+"""
+from __future__ import annotations
+import argparse
+import cProfile
+import json
+import os
+import re
+import statistics
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_LOG = Path("logs") / "profile.jsonl"
+MODES = ("timing", "cprofile")
+_OFF = ("", "0", "off", "false", "no")
+
+_mode: Optional[str] = None
+_log_path: Path = DEFAULT_LOG
+_current: Optional["ActionStats"] = None
+_listening = False
+
+
+def _parse_mode(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip().lower()
+    if value in _OFF:
+        return None
+    return "cprofile" if value == "cprofile" else "timing"
+
+
+def configure(mode: Optional[str] = None, log_path=None) -> None:
+    """Turn profiling on (``"timing"`` or ``"cprofile"``) or off (``None``);
+    the environment variables are read at import."""
+    global _mode, _log_path
+    _mode = _parse_mode(mode)
+    _log_path = Path(log_path) if log_path else DEFAULT_LOG
+    if _mode:
+        _listen()
+
+
+def enabled() -> bool:
+    return _mode is not None
+
+
+class ActionStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.phases: Dict[str, float] = {}
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current is not None:
+        conn.info.setdefault("_profile_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_profile_started")
+    if _current is not None and started:
+        _current.sql_statements += 1
+        _current.sql_seconds += time.perf_counter() - started.pop()
+
+
+def _listen() -> None:
+    # Registered on the Engine class, so every engine (tests, benchmarks,
+    # RATE_MANAGER_DB_URL) is counted without knowing about it up front.
+    global _listening
+    if not _listening:
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+        _listening = True
+
+
+def record_rows(n: int) -> None:
+    """Count ``n`` rows read or written by the current action."""
+    if _current is not None:
+        _current.rows += n
+
+
+@contextmanager
+def _phase(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _current is not None:
+            _current.phases[name] = _current.phases.get(name, 0.0) + time.perf_counter() - started
+
+
+def phase(name: str):
+    """Time a named part of the current action, e.g. ``render``."""
+    return _phase(name) if _current is not None else nullcontext()
+
+
+def _write(record: Dict[str, Any]) -> None:
+    _log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(_log_path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def _action(name: str) -> Iterator[ActionStats]:
+    global _current
+    outer, stats = _current, ActionStats(name)
+    _current = stats
+    profiler = cProfile.Profile() if _mode == "cprofile" else None
+    status = "ok"
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield stats
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - started
+        _current = outer
+        if outer is not None:
+            outer.sql_statements += stats.sql_statements
+            outer.sql_seconds += stats.sql_seconds
+            outer.rows += stats.rows
+
+        now = datetime.now()
+        record = {
+            "ts": now.isoformat(timespec="milliseconds"),
+            "action": name,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "sql_statements": stats.sql_statements,
+            "sql_seconds": round(stats.sql_seconds, 6),
+            "rows": stats.rows,
+            "rows_per_second": round(stats.rows / seconds, 1) if stats.rows and seconds > 0 else None,
+            "phases": {k: round(v, 6) for k, v in stats.phases.items()},
+        }
+        if profiler:
+            slug = re.sub(r"\W+", "_", name).strip("_").lower()
+            path = _log_path.parent / f"{now:%Y%m%d_%H%M%S_%f}_{slug}.prof"
+            profiler.dump_stats(path)
+            record["profile"] = str(path)
+        _write(record)
+
+
+def action(name: str):
+    """Record one CLI action; a no-op context when profiling is off."""
+    return _action(name) if _mode is not None else nullcontext()
+
+
+def summarise(path=DEFAULT_LOG) -> List[Dict[str, Any]]:
+    """Per-action count, median/p95/max seconds, mean SQL statements and
+    total rows from a profile log."""
+    by_action: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                by_action.setdefault(record["action"], []).append(record)
+
+    summary = []
+    for name, records in sorted(by_action.items()):
+        seconds = sorted(r["seconds"] for r in records)
+        summary.append({
+            "action": name,
+            "count": len(records),
+            "median_seconds": round(statistics.median(seconds), 6),
+            "p95_seconds": round(seconds[max(0, int(len(seconds) * 0.95) - 1)], 6),
+            "max_seconds": seconds[-1],
+            "mean_sql_statements": round(statistics.mean(r["sql_statements"] for r in records), 1),
+            "mean_sql_seconds": round(statistics.mean(r["sql_seconds"] for r in records), 6),
+            "rows": sum(r["rows"] for r in records),
+        })
+    return summary
+
+
+configure(os.environ.get("RATE_MANAGER_PROFILE"), os.environ.get("RATE_MANAGER_PROFILE_LOG"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise a profile log per action.")
+    parser.add_argument("log", nargs="?", type=Path, default=Path(os.environ.get("RATE_MANAGER_PROFILE_LOG") or DEFAULT_LOG))
+    args = parser.parse_args(argv)
+    for row in summarise(args.log):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import Customer, Rate, Tariff
+
+USD_FIELDS = ("freight_usd", "ams_usd", "lss_usd")
+AUD_FIELDS = ("othc_aud", "doc_aud", "cmr_aud")
+
+LaneKey = Tuple[str, str, str]
+
+
+class Quote(NamedTuple):
+    customer: str
+    load_port: str
+    destination_port: str
+    container_type: str
+    source: str  # "contract" or "tariff"
+    total_usd: float
+    total_aud: float
+    dthc: str
+    free_time: str
+
+
+def _key(*parts: str) -> Tuple[str, ...]:
+    return tuple(str(p or "").strip().upper() for p in parts)
+
+
+def _priced_columns(model):
+    return [
+        model.load_port, model.destination_port, model.container_type,
+        model.freight_usd + model.ams_usd + model.lss_usd,
+        model.othc_aud + model.doc_aud + model.cmr_aud,
+        model.dthc, model.free_time,
+    ]
+
+
+class LaneIndex:
+    """Hash index of landed prices keyed by customer and lane.
+
+    Totals (freight + AMS + LSS in USD, OTHC + DOC + CMR in AUD) are summed
+    in SQL while the index is built, so a lookup is two dict probes: the
+    customer's contract rate, then the tariff for the lane.
+    """
+
+    def __init__(self) -> None:
+        self.contracts: Dict[Tuple[str, str, str, str], Tuple] = {}
+        self.tariffs: Dict[LaneKey, Tuple] = {}
+
+    @classmethod
+    def load(cls, session: OrmSession) -> "LaneIndex":
+        index = cls()
+        contracts = session.execute(
+            select(Customer.name, *_priced_columns(Rate))
+            .join(Customer)
+            .execution_options(yield_per=5000)
+        )
+        for name, lp, dp, ct, usd, aud, dthc, free_time in contracts:
+            index.contracts[_key(name, lp, dp, ct)] = ("contract", usd, aud, dthc, free_time)
+
+        for lp, dp, ct, usd, aud, dthc, free_time in session.execute(
+            select(*_priced_columns(Tariff))
+        ):
+            index.tariffs[_key(lp, dp, ct)] = ("tariff", usd, aud, dthc, free_time)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.contracts) + len(self.tariffs)
+
+    def price(
+        self, customer: str, load_port: str, destination_port: str, container_type: str
+    ) -> Optional[Quote]:
+        key = _key(customer, load_port, destination_port, container_type)
+        entry = self.contracts.get(key) or self.tariffs.get(key[1:])
+        if entry is None:
+            return None
+        return Quote(*key, *entry)
+
+    def price_many(
+        self, lanes: Iterable[Tuple[str, str, str, str]]
+    ) -> List[Optional[Quote]]:
+        """Price ``(customer, load_port, destination_port, container_type)``
+        tuples in order; lanes with neither a contract nor a tariff give ``None``."""
+        contracts, tariffs = self.contracts, self.tariffs
+        quotes: List[Optional[Quote]] = []
+        for lane in lanes:
+            key = _key(*lane)
+            entry = contracts.get(key) or tariffs.get(key[1:])
+            quotes.append(Quote(*key, *entry) if entry is not None else None)
+        return quotes
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import Customer, Rate, RATE_FIELDS
+
+PAGE_SIZE = 25
+
+
+def rate_columns(model) -> List[Any]:
+    return [getattr(model, k) for k in RATE_FIELDS]
+
+
+def customer_names(session: OrmSession, prefix: str = "", limit: Optional[int] = None) -> List[str]:
+    """Customer names in order, optionally only those starting with ``prefix``."""
+    stmt = select(Customer.name).order_by(Customer.name)
+    if prefix:
+        stmt = stmt.where(name_prefix(Customer.name, prefix))
+    if limit:
+        stmt = stmt.limit(limit)
+    return session.scalars(stmt).all()
+
+
+def destination_ports(session: OrmSession) -> List[str]:
+    return session.scalars(
+        select(Rate.destination_port).distinct().order_by(Rate.destination_port)
+    ).all()
+
+
+def customer_rates_stmt(customer_name: str, *extra):
+    return (
+        select(*extra, *rate_columns(Rate))
+        .join(Customer)
+        .where(Customer.name == customer_name)
+        .order_by(Rate.id)
+    )
+
+
+def destination_rates_stmt(destination_port: str):
+    return (
+        select(Customer.name, *rate_columns(Rate))
+        .join(Customer)
+        .where(Rate.destination_port == destination_port)
+        .order_by(Customer.name, Rate.id)
+    )
+
+
+def name_prefix(column, prefix: str):
+    # A half-open range rather than LIKE, so SQLite can use the index on name.
+    return (column >= prefix) & (column < prefix + "\uffff")
+
+
+def rate_filters(filters: Optional[Dict[str, str]] = None) -> List[Any]:
+    """WHERE clauses for a ``customer`` name prefix and exact ``load_port`` /
+    ``destination_port`` / ``container_type`` values; needs a join to customers."""
+    filters = filters or {}
+    clauses = []
+    if filters.get("customer"):
+        clauses.append(name_prefix(Customer.name, filters["customer"]))
+    for field in ("load_port", "destination_port", "container_type"):
+        if filters.get(field):
+            clauses.append(getattr(Rate, field) == filters[field])
+    return clauses
+
+
+def filtered_rates_stmt(filters: Optional[Dict[str, str]] = None, *extra):
+    """``(customer name, *extra, *RATE_FIELDS)`` rows matching ``filters``."""
+    return (
+        select(Customer.name, *extra, *rate_columns(Rate))
+        .join(Customer)
+        .where(*rate_filters(filters))
+    )
+
+
+def rate_page(
+    session: OrmSession,
+    filters: Optional[Dict[str, str]] = None,
+    after: Optional[Tuple[str, int]] = None,
+    limit: int = PAGE_SIZE,
+) -> Tuple[List[Any], Optional[Tuple[str, int]]]:
+    """One page of rates ordered by ``(customer name, rate id)``.
+
+    ``filters`` are as for ``rate_filters``. Paging is keyset-based:
+    pass the returned cursor as ``after`` to get the next page, so every
+    page costs the same however deep it is. The cursor is ``None`` on the
+    last page. Rows are ``(customer name, *RATE_FIELDS)``.
+    """
+    stmt = filtered_rates_stmt(filters, Rate.id)
+    if after is not None:
+        stmt = stmt.where(tuple_(Customer.name, Rate.id) > tuple_(*after))
+
+    rows = session.execute(stmt.order_by(Customer.name, Rate.id).limit(limit + 1)).all()
+    cursor = (rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+    return [(r[0],) + tuple(r[2:]) for r in rows[:limit]], cursor
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import RegistryValue, Session
+
+DATA_CONSTANTS = Path(__file__).resolve().parents[1] / "data" / "data_constants.json"
+
+# Registry kinds are the rate fields they validate, mapped to their key in
+# data_constants.json.
+KINDS = {
+    "load_port": "VALID_LOAD_PORTS",
+    "destination_port": "VALID_DEST_PORTS",
+    "container_type": "VALID_CONTAINERS",
+    "dthc": "VALID_DTHC",
+}
+
+DEFAULT_CONSTANTS = {
+    "VALID_LOAD_PORTS": ["MELBOURNE", "SYDNEY", "BRISBANE"],
+    "VALID_DEST_PORTS": ["TAICHUNG", "SHANGHAI", "NINGBO", "SHEKOU", "TOKYO"],
+    "VALID_CONTAINERS": ["20GP", "40GP", "40HC", "20RE", "40REHC"],
+    "VALID_DTHC": ["COLLECT", "PREPAID"],
+}
+
+
+def load_constants(path: Path = DATA_CONSTANTS) -> Dict[str, Any]:
+    if path.exists():
+        try:
+            return json.loads(path.read_text())
+        except Exception:
+            pass
+    return DEFAULT_CONSTANTS
+
+
+class Registry:
+    """Immutable snapshot of the valid values per kind: ordered tuples for
+    prompts and frozensets for O(1) membership checks during validation."""
+
+    def __init__(self, values: Mapping[str, List[str]]) -> None:
+        self.choices: Dict[str, Tuple[str, ...]] = {k: tuple(values.get(k, ())) for k in KINDS}
+        self.sets: Dict[str, FrozenSet[str]] = {k: frozenset(v) for k, v in self.choices.items()}
+
+    def is_valid(self, kind: str, value: Any) -> bool:
+        return value in self.sets[kind]
+
+    def unknown(self, values: Mapping[str, Any]) -> List[str]:
+        """Fields of a rate row whose value isn't registered."""
+        return [k for k, valid in self.sets.items() if values.get(k) not in valid]
+
+
+_cache: Dict[str, Any] = {"key": None, "registry": None}
+
+# add_value/remove_value bump this: SQLite's data_version doesn't move for
+# the connection that made the write, only for the others.
+_writes = 0
+_connection_ids = itertools.count()
+
+
+def _file_mtime(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _db_version(session: OrmSession) -> Tuple[int, int, int]:
+    # data_version moves whenever another connection commits, but values are
+    # only comparable on one connection, so each pooled connection gets its
+    # own id in the key. Row counts and max(id) can't be used: SQLite reuses
+    # the highest rowid after a delete.
+    conn = session.connection()
+    info = conn.connection.info
+    if "registry_id" not in info:
+        info["registry_id"] = next(_connection_ids)
+    return info["registry_id"], conn.exec_driver_sql("PRAGMA data_version").scalar(), _writes
+
+
+def get_registry(session: Optional[OrmSession] = None, path: Path = DATA_CONSTANTS) -> Registry:
+    """Defaults from ``data_constants.json`` plus values added in the DB.
+
+    The snapshot is cached in-process and rebuilt only when the file's mtime
+    or the database changes, so callers can ask for it per prompt;
+    bulk validation should take one snapshot and reuse it for every row.
+    """
+    own = session is None
+    session = session or Session()
+    try:
+        key = (str(path), _file_mtime(path), str(session.get_bind().url), _db_version(session))
+        if _cache["key"] == key:
+            return _cache["registry"]
+
+        constants = load_constants(path)
+        values = {
+            kind: [str(v).strip().upper() for v in constants.get(name, [])]
+            for kind, name in KINDS.items()
+        }
+        for kind, value in session.execute(
+            select(RegistryValue.kind, RegistryValue.value).order_by(RegistryValue.value)
+        ):
+            if kind in values and value not in values[kind]:
+                values[kind].append(value)
+    finally:
+        if own:
+            session.close()
+
+    registry = Registry(values)
+    _cache.update(key=key, registry=registry)
+    return registry
+
+
+def _check_kind(kind: str) -> None:
+    if kind not in KINDS:
+        raise ValueError(f"Unknown registry kind: {kind} (expected one of {', '.join(KINDS)})")
+
+
+def add_value(session: OrmSession, kind: str, value: str) -> str:
+    global _writes
+    _check_kind(kind)
+    value = value.strip().upper()
+    if not value:
+        raise ValueError("Registry values can't be blank.")
+    session.execute(
+        sqlite_insert(RegistryValue).values(kind=kind, value=value).on_conflict_do_nothing()
+    )
+    _writes += 1
+    return value
+
+
+def remove_value(session: OrmSession, kind: str, value: str) -> bool:
+    """Remove a value added at runtime; defaults live in data_constants.json."""
+    global _writes
+    _check_kind(kind)
+    result = session.execute(delete(RegistryValue).where(
+        RegistryValue.kind == kind, RegistryValue.value == value.strip().upper(),
+    ))
+    _writes += 1
+    return result.rowcount > 0
@@ -0,0 +1,156 @@
+from __future__ import annotations
+import csv
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import Workbook
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import Customer, Rate, Tariff
+from lib.exporter import STREAM_BATCH, dated_path, fill_sheet
+from lib.pricing import AUD_FIELDS, USD_FIELDS
+from lib.queries import rate_filters
+
+COMPONENTS = [
+    ("freight_usd", "Freight USD"), ("ams_usd", "AMS USD"), ("lss_usd", "LSS USD"),
+    ("othc_aud", "OTHC AUD"), ("doc_aud", "DOC AUD"), ("cmr_aud", "CMR AUD"),
+]
+
+MARGIN_HEADERS = (
+    ["Customer", "POL", "POD", "Container"]
+    + [f"{label} {kind}" for _, label in COMPONENTS for kind in ("Contract", "Tariff", "Discount")]
+    + ["USD Contract", "USD Tariff", "USD Discount", "USD Discount %",
+       "AUD Contract", "AUD Tariff", "AUD Discount", "AUD Discount %"]
+)
+
+SUMMARY_FIELDS = ["Lanes", "USD Contract", "USD Tariff", "USD Discount", "USD Discount %",
+                  "AUD Contract", "AUD Tariff", "AUD Discount", "AUD Discount %"]
+
+
+def margin_stmt(filters: Optional[Dict[str, str]] = None):
+    """Every contract rate joined to its tariff on the lane key, with the
+    per-component discount (tariff - contract) worked out in SQL."""
+    columns: List[Any] = [
+        Customer.name, Rate.load_port, Rate.destination_port, Rate.container_type,
+    ]
+    for field, _ in COMPONENTS:
+        contract, tariff = getattr(Rate, field), getattr(Tariff, field)
+        columns += [contract, tariff, tariff - contract]
+
+    usd_contract = sum(getattr(Rate, f) for f in USD_FIELDS)
+    usd_tariff = sum(getattr(Tariff, f) for f in USD_FIELDS)
+    aud_contract = sum(getattr(Rate, f) for f in AUD_FIELDS)
+    aud_tariff = sum(getattr(Tariff, f) for f in AUD_FIELDS)
+    columns += [usd_contract, usd_tariff, aud_contract, aud_tariff]
+
+    lane = and_(
+        Tariff.load_port == Rate.load_port,
+        Tariff.destination_port == Rate.destination_port,
+        Tariff.container_type == Rate.container_type,
+    )
+    return (
+        select(*columns)
+        .select_from(Rate)
+        .join(Customer)
+        .join(Tariff, lane)
+        .where(*rate_filters(filters))
+        .order_by(Customer.name, Rate.id)
+    )
+
+
+def _pct(discount: float, tariff: float) -> Optional[float]:
+    return round(discount / tariff * 100, 2) if tariff else None
+
+
+class _Totals:
+    __slots__ = ("lanes", "usd_contract", "usd_tariff", "aud_contract", "aud_tariff")
+
+    def __init__(self) -> None:
+        self.lanes = 0
+        self.usd_contract = self.usd_tariff = self.aud_contract = self.aud_tariff = 0.0
+
+    def add(self, usd_contract, usd_tariff, aud_contract, aud_tariff) -> None:
+        self.lanes += 1
+        self.usd_contract += usd_contract
+        self.usd_tariff += usd_tariff
+        self.aud_contract += aud_contract
+        self.aud_tariff += aud_tariff
+
+    def row(self, key: str) -> List[Any]:
+        usd_discount = self.usd_tariff - self.usd_contract
+        aud_discount = self.aud_tariff - self.aud_contract
+        return [
+            key, self.lanes,
+            round(self.usd_contract, 2), round(self.usd_tariff, 2), round(usd_discount, 2),
+            _pct(usd_discount, self.usd_tariff),
+            round(self.aud_contract, 2), round(self.aud_tariff, 2), round(aud_discount, 2),
+            _pct(aud_discount, self.aud_tariff),
+        ]
+
+
+class MarginReport:
+    """Single pass over ``margin_stmt``: lane rows stream straight to the
+    output while per-customer and per-destination totals accumulate, so
+    memory grows with the number of customers and ports, not rates."""
+
+    def __init__(self) -> None:
+        self.by_customer: Dict[str, _Totals] = {}
+        self.by_destination: Dict[str, _Totals] = {}
+        self.lanes = 0
+
+    def lanes_from(self, session: OrmSession, filters=None) -> Iterator[List[Any]]:
+        result = session.execute(margin_stmt(filters).execution_options(yield_per=STREAM_BATCH))
+        for row in result:
+            name, lp, dp, ct, *components, usd_c, usd_t, aud_c, aud_t = row
+            self.lanes += 1
+            self.by_customer.setdefault(name, _Totals()).add(usd_c, usd_t, aud_c, aud_t)
+            self.by_destination.setdefault(dp, _Totals()).add(usd_c, usd_t, aud_c, aud_t)
+            usd_d, aud_d = usd_t - usd_c, aud_t - aud_c
+            yield [
+                name, lp, dp, ct, *components,
+                usd_c, usd_t, usd_d, _pct(usd_d, usd_t),
+                aud_c, aud_t, aud_d, _pct(aud_d, aud_t),
+            ]
+
+    def customer_rows(self) -> Iterator[List[Any]]:
+        for name in sorted(self.by_customer):
+            yield self.by_customer[name].row(name)
+
+    def destination_rows(self) -> Iterator[List[Any]]:
+        for port in sorted(self.by_destination):
+            yield self.by_destination[port].row(port)
+
+
+def export_margin_report(
+    session: OrmSession, directory, fmt: str = "xlsx", filters=None
+) -> Tuple[List[Path], MarginReport]:
+    """Write the lane detail plus customer and destination summaries.
+
+    ``xlsx`` gives one write-only workbook with three sheets; ``csv`` gives
+    three files. Returns the written paths and the finished report.
+    """
+    report = MarginReport()
+    if fmt == "xlsx":
+        path = dated_path(directory, "Margin", "Report")
+        wb = Workbook(write_only=True)
+        fill_sheet(wb, "Lanes", MARGIN_HEADERS, report.lanes_from(session, filters))
+        fill_sheet(wb, "By Customer", ["Customer"] + SUMMARY_FIELDS, report.customer_rows())
+        fill_sheet(wb, "By Destination", ["POD"] + SUMMARY_FIELDS, report.destination_rows())
+        wb.save(path)
+        return [path], report
+
+    paths = []
+    outputs = [
+        ("Report", MARGIN_HEADERS, lambda: report.lanes_from(session, filters)),
+        ("By_Customer", ["Customer"] + SUMMARY_FIELDS, report.customer_rows),
+        ("By_Destination", ["POD"] + SUMMARY_FIELDS, report.destination_rows),
+    ]
+    for name, headers, rows in outputs:
+        path = dated_path(directory, "Margin", name, suffix=".csv")
+        with open(path, "w", encoding="utf-8", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(headers)
+            writer.writerows(rows())
+        paths.append(path)
+    return paths, report
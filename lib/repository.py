@@ -0,0 +1,183 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+
+from lib.db.models import Session, Customer, Rate, RATE_FIELDS, row_hash
+from lib.fingerprints import forget_files
+from lib.history import LANE_CHUNK, ID_CHUNK, close_rate_versions, record_rates_by_id
+
+# The hot single-row lookups are built once with bound parameters, so
+# SQLAlchemy compiles each a single time and later calls only bind values.
+_CUSTOMER_BY_NAME = select(Customer).where(Customer.name == bindparam("name"))
+_RATE_BY_LANE = select(Rate).where(
+    Rate.customer_id == bindparam("customer_id"),
+    Rate.load_port == bindparam("load_port"),
+    Rate.destination_port == bindparam("destination_port"),
+    Rate.container_type == bindparam("container_type"),
+)
+
+Lane = Tuple[int, str, str, str]
+
+
+@contextmanager
+def unit_of_work(session_factory=Session) -> Iterator[OrmSession]:
+    """One session per CLI action or import: committed if the block
+    finishes, rolled back if it raises, closed either way."""
+    s = session_factory()
+    try:
+        yield s
+        s.commit()
+    except BaseException:
+        s.rollback()
+        raise
+    finally:
+        s.close()
+
+
+def _customer_map(session: OrmSession) -> Dict[str, Customer]:
+    return session.info.setdefault("customers_by_name", {})
+
+
+def find_customer(session: OrmSession, name: str) -> Optional[Customer]:
+    """The customer called ``name``. Repeat lookups in one session reuse the
+    object already in its identity map instead of querying again."""
+    name = (name or "").strip().upper()
+    known = _customer_map(session)
+    customer = known.get(name)
+    # Objects created in a rolled-back transaction or a closed session are
+    # no longer attached; look those up again.
+    if customer is not None and customer in session:
+        return customer
+    customer = session.scalars(_CUSTOMER_BY_NAME, {"name": name}).first()
+    if customer is not None:
+        known[name] = customer
+    return customer
+
+
+def get_or_create_customer(session: OrmSession, name: str) -> Customer:
+    name = (name or "").strip().upper()
+    customer = find_customer(session, name)
+    if customer is None:
+        customer = Customer(name=name)
+        session.add(customer)
+        session.flush()
+        _customer_map(session)[name] = customer
+    return customer
+
+
+def customer_ids(session: OrmSession, names: Iterable[str]) -> Dict[str, int]:
+    """Bulk ``get_or_create_customer``: ids for ``names``, inserting the
+    missing customers in one statement."""
+    names = sorted(set(names))
+    ids: Dict[str, int] = {}
+    for i in range(0, len(names), ID_CHUNK):
+        ids.update(session.execute(
+            select(Customer.name, Customer.id).where(Customer.name.in_(names[i:i + ID_CHUNK]))
+        ).all())
+
+    missing = [n for n in names if n not in ids]
+    if missing:
+        session.execute(
+            sqlite_insert(Customer).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": n} for n in missing],
+        )
+        for i in range(0, len(missing), ID_CHUNK):
+            ids.update(session.execute(
+                select(Customer.name, Customer.id).where(Customer.name.in_(missing[i:i + ID_CHUNK]))
+            ).all())
+    return ids
+
+
+def find_rate(
+    session: OrmSession, customer_id: int, load_port: str, destination_port: str, container_type: str
+) -> Optional[Rate]:
+    return session.scalars(_RATE_BY_LANE, {
+        "customer_id": customer_id, "load_port": load_port,
+        "destination_port": destination_port, "container_type": container_type,
+    }).first()
+
+
+def rates_by_lane(session: OrmSession, lanes: Iterable[Lane]) -> Dict[Lane, Rate]:
+    """Bulk ``find_rate``: the rates on ``(customer_id, pol, pod, container)``
+    lanes, keyed by lane; lanes without a rate are left out."""
+    lanes = sorted(set(lanes))
+    lane = tuple_(Rate.customer_id, Rate.load_port, Rate.destination_port, Rate.container_type)
+    found: Dict[Lane, Rate] = {}
+    for i in range(0, len(lanes), LANE_CHUNK):
+        for rate in session.scalars(select(Rate).where(lane.in_(lanes[i:i + LANE_CHUNK]))):
+            found[(rate.customer_id, rate.load_port, rate.destination_port, rate.container_type)] = rate
+    return found
+
+
+def save_rate(
+    session: OrmSession, customer_id: int, values: Dict[str, Any], rate: Optional[Rate] = None
+) -> Rate:
+    """Write ``values`` over ``rate``, or add a new rate for the customer,
+    and record the change in rate history."""
+    return save_rates(session, [(customer_id, values, rate)])[0]
+
+
+def save_rates(
+    session: OrmSession, items: Iterable[Tuple[int, Dict[str, Any], Optional[Rate]]]
+) -> List[Rate]:
+    """Apply ``(customer_id, values, rate or None)`` items in one flush and
+    one history pass. Workbook imports go through ``importer.upsert_rates``,
+    which diffs whole sheets by row hash instead of loading objects."""
+    items = list(items)
+    now = datetime.now()
+    saved: List[Rate] = []
+    existing = [rate.id for _, _, rate in items if rate is not None]
+    # Close the old lanes' versions first in case an edit moves a lane.
+    for i in range(0, len(existing), ID_CHUNK):
+        close_rate_versions(session, Rate.id.in_(existing[i:i + ID_CHUNK]), now)
+    for customer_id, values, rate in items:
+        if rate is None:
+            rate = Rate(customer_id=customer_id, **{k: values[k] for k in RATE_FIELDS})
+            session.add(rate)
+        else:
+            for k in RATE_FIELDS:
+                setattr(rate, k, values[k])
+        saved.append(rate)
+    session.flush()
+    record_rates_by_id(session, [rate.id for rate in saved], now)
+    forget_files(session, "rates")
+    return saved
+
+
+def update_rate(session: OrmSession, rate_id: int, values: Dict[str, Any]) -> bool:
+    """Overwrite rate ``rate_id`` with one UPDATE by primary key, without
+    loading it, and record the change. Returns whether the rate existed."""
+    now = datetime.now()
+    where = Rate.id == rate_id
+    fields = {k: values[k] for k in RATE_FIELDS}
+    # Close first in case the edit moves the lane.
+    close_rate_versions(session, where, now)
+    updated = session.execute(
+        update(Rate).where(where).values(**fields, row_hash=row_hash(fields))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated:
+        record_rates_by_id(session, [rate_id], now)
+        forget_files(session, "rates")
+    return bool(updated)
+
+
+def delete_rates(session: OrmSession, ids: Iterable[int]) -> int:
+    """Delete rates by id, closing their history. Returns how many went."""
+    ids = list(ids)
+    now = datetime.now()
+    deleted = 0
+    for i in range(0, len(ids), ID_CHUNK):
+        where = Rate.id.in_(ids[i:i + ID_CHUNK])
+        close_rate_versions(session, where, now)
+        deleted += session.execute(
+            delete(Rate).where(where).execution_options(synchronize_session="fetch")
+        ).rowcount
+    if deleted:
+        forget_files(session, "rates")
+    return deleted
@@ -0,0 +1,340 @@
+"""Local HTTP quote API.
+
+    python -m lib.server [--host 127.0.0.1] [--port 8080]
+
+Endpoints (JSON in and out):
+
+- ``GET /price?customer=&pol=&pod=&container=`` — landed price for one lane
+- ``POST /price`` with ``{"lanes": [{"customer", "pol", "pod", "container"}, ...]}``
+- ``GET /rate?customer=&pol=&pod=&container=`` — the stored contract rate
+- ``GET /rates?customer=&pol=&pod=&container=&limit=&after_customer=&after_id=``
+- ``GET /customers?prefix=&limit=``
+- ``GET /health`` and ``POST /refresh``
+
+Prices come from an in-process ``LaneIndex`` so a quote never touches the
+database. The index is rebuilt in a worker thread when another connection
+commits a write (SQLite's ``data_version``, polled every
+``POLL_SECONDS``), and requests keep using the previous one until the new
+one is ready. Every other database call also runs in a worker thread, so
+the event loop only parses requests and probes dicts.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import time
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from lib.db.models import Session, RATE_FIELDS
+from lib.pricing import LaneIndex
+from lib.queries import PAGE_SIZE, customer_names, rate_page
+from lib.repository import find_customer, find_rate
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+POLL_SECONDS = 0.5
+MAX_BODY = 1 << 20
+MAX_LANES = 10_000
+MAX_LIMIT = 500
+
+log = logging.getLogger(__name__)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class QuoteCache:
+    """The ``LaneIndex`` shared by every request, kept warm across writes."""
+
+    def __init__(self, session_factory=Session, poll_seconds: float = POLL_SECONDS) -> None:
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.index = LaneIndex()
+        self.version: Optional[int] = None
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._conn = None
+
+    def _load(self) -> LaneIndex:
+        s = self.session_factory()
+        try:
+            return LaneIndex.load(s)
+        finally:
+            s.close()
+
+    def _data_version(self) -> Optional[int]:
+        """SQLite's ``data_version``, which moves whenever any other
+        connection commits. It is only comparable on one connection, so the
+        cache opens its own outside the engine's pool rather than keeping a
+        pooled one checked out. ``None`` for in-memory databases and other
+        backends, where only ``POST /refresh`` reloads."""
+        engine = self.session_factory.kw.get("bind")
+        if engine is None or engine.dialect.name != "sqlite":
+            return None
+        if engine.url.database in (None, "", ":memory:"):
+            return None
+        if self._conn is None:
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            self._conn = engine.dialect.connect(*cargs, **cparams)
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            # Read the version first: a write landing mid-load moves it
+            # again, so the next check reloads once more.
+            version = await asyncio.to_thread(self._data_version)
+            index = await asyncio.to_thread(self._load)
+            self.index, self.version, self.loaded_at = index, version, time.time()
+
+    async def check(self) -> bool:
+        """Reload if the database changed since the last load."""
+        if self.loaded_at is not None and await asyncio.to_thread(self._data_version) == self.version:
+            return False
+        await self.refresh()
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.check()
+            except Exception:
+                log.exception("Refreshing the quote cache failed; serving the previous one")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _lane(params: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    missing = [k for k in ("customer", "pol", "pod", "container") if not params.get(k)]
+    if missing:
+        raise HttpError(400, f"Missing {', '.join(missing)}.")
+    return params["customer"], params["pol"], params["pod"], params["container"]
+
+
+def _limit(params: Dict[str, str], default: int) -> int:
+    try:
+        limit = int(params.get("limit") or default)
+    except ValueError:
+        raise HttpError(400, "limit must be a whole number.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _upper(value: Optional[str]) -> str:
+    return (value or "").strip().upper()
+
+
+class QuoteServer:
+    def __init__(self, cache: QuoteCache) -> None:
+        self.cache = cache
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/price"): self.price,
+            ("POST", "/price"): self.price_many,
+            ("GET", "/rate"): self.rate,
+            ("GET", "/rates"): self.rates,
+            ("GET", "/customers"): self.customers,
+            ("POST", "/refresh"): self.refresh,
+        }
+
+    # Handlers return the JSON body; quotes are answered on the event loop,
+    # anything that needs the database goes to a worker thread.
+
+    async def health(self, params, body):
+        return {"lanes": len(self.cache.index), "loaded_at": self.cache.loaded_at}
+
+    async def price(self, params, body):
+        quote = self.cache.index.price(*_lane(params))
+        if quote is None:
+            raise HttpError(404, "No contract rate or tariff for that lane.")
+        return quote._asdict()
+
+    async def price_many(self, params, body):
+        try:
+            lanes = json.loads(body or b"{}")["lanes"]
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, 'Expected {"lanes": [...]}.')
+        if not isinstance(lanes, list) or len(lanes) > MAX_LANES:
+            raise HttpError(400, f"lanes must be a list of at most {MAX_LANES}.")
+        if not all(isinstance(lane, dict) for lane in lanes):
+            raise HttpError(400, "Each lane needs customer, pol, pod and container.")
+        quotes = self.cache.index.price_many(_lane(lane) for lane in lanes)
+        return {"quotes": [q._asdict() if q is not None else None for q in quotes]}
+
+    async def rate(self, params, body):
+        customer, pol, pod, container = (_upper(v) for v in _lane(params))
+
+        def lookup():
+            s = self.cache.session_factory()
+            try:
+                found = find_customer(s, customer)
+                rate = found and find_rate(s, found.id, pol, pod, container)
+                return rate and {"customer": customer, **{k: getattr(rate, k) for k in RATE_FIELDS}}
+            finally:
+                s.close()
+
+        result = await asyncio.to_thread(lookup)
+        if not result:
+            raise HttpError(404, "No contract rate for that lane.")
+        return result
+
+    async def rates(self, params, body):
+        filters = {
+            key: _upper(params.get(name))
+            for key, name in (("customer", "customer"), ("load_port", "pol"),
+                              ("destination_port", "pod"), ("container_type", "container"))
+            if params.get(name)
+        }
+        after = None
+        if params.get("after_customer") or params.get("after_id"):
+            try:
+                after = (params["after_customer"], int(params["after_id"]))
+            except (KeyError, ValueError):
+                raise HttpError(400, "after_customer and after_id go together; after_id is a number.")
+        limit = _limit(params, PAGE_SIZE)
+
+        def page():
+            s = self.cache.session_factory()
+            try:
+                return rate_page(s, filters, after=after, limit=limit)
+            finally:
+                s.close()
+
+        rows, cursor = await asyncio.to_thread(page)
+        return {
+            "rates": [dict(zip(("customer",) + RATE_FIELDS, row)) for row in rows],
+            "next": {"after_customer": cursor[0], "after_id": cursor[1]} if cursor else None,
+        }
+
+    async def customers(self, params, body):
+        prefix, limit = _upper(params.get("prefix")), _limit(params, PAGE_SIZE)
+
+        def names():
+            s = self.cache.session_factory()
+            try:
+                return customer_names(s, prefix, limit)
+            finally:
+                s.close()
+
+        return {"customers": await asyncio.to_thread(names)}
+
+    async def refresh(self, params, body):
+        await self.cache.refresh()
+        return {"lanes": len(self.cache.index)}
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            if handler is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise HttpError(405, f"{method} not allowed on {url.path}.")
+                raise HttpError(404, f"No endpoint {url.path}.")
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            return 200, {"status": "ok", **await handler(params, body)}
+        except HttpError as e:
+            return e.status, {"status": "error", "error": str(e)}
+        except Exception as e:
+            log.exception("%s %s failed", method, target)
+            return 500, {"status": "error", "error": str(e)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """One HTTP/1.1 connection; requests are answered in order and the
+        connection is kept open unless the client asks otherwise."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"status": "error", "error": "Bad request line."}, False)
+                    break
+
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"status": "error", "error": "Bad Content-Length."}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"status": "error", "error": "Body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status: int, payload: Dict[str, Any], keep_alive: bool) -> None:
+        data = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, session_factory=Session) -> None:
+    cache = QuoteCache(session_factory)
+    await cache.refresh()
+    app = QuoteServer(cache)
+    server = await asyncio.start_server(app.handle, host, port)
+    watcher = asyncio.create_task(cache.watch())
+    print(f"Serving quotes for {len(cache.index)} lanes on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+        cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve rate lookups and quotes over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from lib.db.models import MONEY_COLUMNS, RATE_FIELDS
+from lib.exporter import EXPORT_HEADERS, EXPORT_HEADERS_WITH_CUSTOMER, dated_path, write_excel
+from lib.registry import KINDS, Registry
+
+
+class Rejected(NamedTuple):
+    row: int                  # sheet row number, 1-based
+    values: Tuple[Any, ...]   # the cells as read
+    errors: Tuple[str, ...]
+
+
+def parse_money(value: Any) -> float:
+    """A finite float from a cell. Blank is 0.0; thousands separators and a
+    leading ``$`` are allowed. Anything else raises ``ValueError``."""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = float(value)
+    else:
+        text = str(value).strip().lstrip("$").replace(",", "")
+        if not text:
+            return 0.0
+        number = float(text)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+def _code(value: Any) -> str:
+    return str(value if value is not None else "").strip().upper()
+
+
+def _free_text(value: Any) -> str:
+    return str(value or "")
+
+
+PARSERS: Dict[str, Callable[[Any], Any]] = {
+    **{name: _code for name in RATE_FIELDS},
+    **{name: parse_money for name in MONEY_COLUMNS},
+    "free_time": _free_text,
+}
+
+REQUIRED = ("load_port", "destination_port", "container_type", "freight_usd")
+
+
+class Validator:
+    """Parse and check one 11-column rate row at a time.
+
+    Numbers are parsed with errors captured instead of coerced to 0.0,
+    required fields must be present, freight can't be negative, and with a
+    ``registry`` the ports, container and DTHC must be registered values.
+    ``validate`` tries a straight-line fast path for clean rows (plain
+    numbers, set lookups, no per-field calls) and only falls back to the
+    field-by-field ``check`` to describe what is wrong or to parse blanks
+    and formatted numbers such as ``"$1,200"``.
+    """
+
+    def __init__(self, registry: Optional[Registry] = None) -> None:
+        self.registry = registry
+        self._steps = [(name, PARSERS[name]) for name in RATE_FIELDS]
+        self._required = [(RATE_FIELDS.index(name), name) for name in REQUIRED]
+        self._sets = [(name, registry.sets[name]) for name in KINDS] if registry else []
+        sets = registry.sets if registry else {}
+        self._load_ports = sets.get("load_port")
+        self._dest_ports = sets.get("destination_port")
+        self._containers = sets.get("container_type")
+        self._dthc = sets.get("dthc")
+
+    def validate(self, row: Sequence[Any]) -> Tuple[Optional[Dict[str, Any]], Tuple[str, ...]]:
+        """``(values, ())`` for a good row, ``(None, errors)`` for a bad one."""
+        try:
+            lp, dp, ct, freight, othc, doc, cmr, ams, lss, dthc, free_time = row
+            lp, dp, ct, dthc = lp.strip().upper(), dp.strip().upper(), ct.strip().upper(), dthc.strip().upper()
+            money = (float(freight), float(othc), float(doc), float(cmr), float(ams), float(lss))
+        except (AttributeError, TypeError, ValueError):
+            return self.check(row)
+        # float(True) is 1.0; check() rejects bools, so let it report them.
+        if bool in (type(freight), type(othc), type(doc), type(cmr), type(ams), type(lss)):
+            return self.check(row)
+
+        if (
+            lp and dp and ct and money[0] >= 0 and math.isfinite(sum(money))
+            and (self._load_ports is None or (
+                lp in self._load_ports and dp in self._dest_ports
+                and ct in self._containers and dthc in self._dthc
+            ))
+        ):
+            return {
+                "load_port": lp, "destination_port": dp, "container_type": ct,
+                "freight_usd": money[0], "othc_aud": money[1], "doc_aud": money[2],
+                "cmr_aud": money[3], "ams_usd": money[4], "lss_usd": money[5],
+                "dthc": dthc, "free_time": str(free_time or ""),
+            }, ()
+        return self.check(row)
+
+    def check(self, row: Sequence[Any]) -> Tuple[Optional[Dict[str, Any]], Tuple[str, ...]]:
+        """Field-by-field parse that reports every problem in the row."""
+        values: Dict[str, Any] = {}
+        errors: List[str] = []
+        for (name, parse), cell in zip(self._steps, row):
+            try:
+                values[name] = parse(cell)
+            except ValueError:
+                errors.append(f"{name}: not a number ({cell!r})")
+        for index, name in self._required:
+            cell = row[index]
+            if cell is None or (isinstance(cell, str) and not cell.strip()):
+                errors.append(f"{name}: required")
+        if values.get("freight_usd", 0.0) < 0:
+            errors.append("freight_usd: negative")
+        for name, valid in self._sets:
+            value = values.get(name)
+            if value and value not in valid:
+                errors.append(f"{name}: unknown {value}")
+        if errors:
+            return None, tuple(errors)
+        return values, ()
+
+
+def write_rejected_rows(
+    source: str, rejected: Iterable[Rejected], directory, with_customer: bool = False
+) -> Path:
+    """Workbook of the rows an import refused: sheet row, original cells and
+    the reasons, ready to fix and re-import."""
+    headers = ["Row"] + (EXPORT_HEADERS_WITH_CUSTOMER if with_customer else EXPORT_HEADERS) + ["Errors"]
+    width = len(headers) - 2
+    path = dated_path(directory, "Rejected", Path(source).stem)
+    write_excel(
+        path, headers,
+        ([r.row, *r.values[:width], "; ".join(r.errors)] for r in rejected),
+        "Rejected", title=f"Rejected rows from {Path(source).name}",
+    )
+    return path
@@ -1,5 +1,9 @@
 import os, sys
 
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 # Ensure project root is on sys.path so 'lib' is importable
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
@@ -11,4 +15,36 @@ sys.modules['helpers'] = _helpers
 
 from lib import cli as _cli
 sys.modules['cli'] = _cli
-sys.modules['main'] = _helpers
\ No newline at end of file
+sys.modules['main'] = _helpers
+
+from lib.db.models import Base
+from lib.importer import normalise_rate_values
+
+
+def rate_values(pod="TOKYO", container="20GP", freight=500, pol="SYDNEY"):
+    """Normalised values for one rate or tariff row with the usual charges."""
+    return normalise_rate_values(
+        [pol, pod, container, freight, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+
+
+@pytest.fixture
+def engine():
+    """A fresh in-memory database with the current schema."""
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, future=True)
+
+
+@pytest.fixture
+def session(session_factory):
+    s = session_factory()
+    try:
+        yield s
+    finally:
+        s.close()
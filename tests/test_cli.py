@@ -0,0 +1,200 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import lib.cli as cli
+from conftest import rate_values
+from lib.db.models import Base
+from lib.importer import upsert_rates
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cli.db'}", future=True)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(cli, "Session", sessionmaker(bind=engine, future=True))
+    yield engine
+    engine.dispose()
+
+
+def _seed(rows):
+    s = cli.Session()
+    upsert_rates(s, rows)
+    s.commit()
+    s.close()
+
+
+def _last_json(capsys):
+    out = capsys.readouterr().out.strip().splitlines()
+    return json.loads(out[-1])
+
+
+def test_batch_export_then_import_round_trip(db, tmp_path, capsys):
+    _seed([("TEST CO", rate_values("TOKYO"))])
+
+    assert cli.main(["export-quote", "--customer", "test co", "--dir", str(tmp_path)]) == cli.EXIT_OK
+    exported = _last_json(capsys)
+    assert exported["rows"] == 1
+
+    assert cli.main(["import-quote", exported["file"]]) == cli.EXIT_USAGE
+    assert cli.main(["import-quote", exported["file"], "--customer", "other co"]) == cli.EXIT_OK
+    assert _last_json(capsys)["new"] == 1
+
+    assert cli.main(["list-rates", "--pod", "tokyo", "--format", "json"]) == cli.EXIT_OK
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["customer"] for r in rows] == ["OTHER CO", "TEST CO"]
+
+
+def test_batch_reports_missing_data_with_error_exit_code(db, tmp_path, capsys):
+    assert cli.main(["export-destination", "NOWHERE", "--dir", str(tmp_path)]) == cli.EXIT_ERROR
+    err = json.loads(capsys.readouterr().err)
+    assert err["status"] == "error"
+
+
+def test_import_batch_parses_directory_in_parallel(db, tmp_path, capsys):
+    from openpyxl import Workbook
+
+    headers = ["Customer", "POL", "POD", "Container", "Freight USD", "OTHC AUD",
+               "DOC AUD", "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"]
+    folder = tmp_path / "incoming"
+    folder.mkdir()
+    for n, dest in enumerate(("TOKYO", "NINGBO")):
+        wb = Workbook()
+        ws = wb.active
+        ws.append([f"Destination Port: {dest}"])
+        ws.append([])
+        ws.append(headers)
+        ws.append(["ALPHA CO", "SYDNEY", dest, "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+        ws.append(["BETA CO", "SYDNEY", dest, "40HC", 900, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+        wb.save(folder / f"quote_{n}.xlsx")
+    (folder / "broken.xlsx").write_text("not a workbook")
+
+    assert cli.main(["import-batch", str(folder), "--workers", "2"]) == cli.EXIT_ERROR
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    totals = lines[-1]
+    assert totals["files"] == 3
+    assert totals["failed"] == 1
+    assert totals["new"] == 4
+    assert sum(1 for line in lines[:-1] if "error" in line) == 1
+
+
+def test_rate_history_as_of(db, capsys):
+    _seed([("TEST CO", rate_values("NINGBO", "40HC"))])
+
+    args = ["rate-history", "--customer", "test co", "sydney", "ningbo", "40hc"]
+    assert cli.main(args) == cli.EXIT_OK
+    assert _last_json(capsys)["freight_usd"] == 500
+    assert cli.main(args + ["--as-of", "2000-01-01"]) == cli.EXIT_ERROR
+    assert cli.main(args + ["--as-of", "not a date"]) == cli.EXIT_USAGE
+
+
+def test_import_quote_reports_unchanged_file(db, tmp_path, capsys):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["POL", "POD", "Container", "Freight USD", "OTHC AUD", "DOC AUD",
+               "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"])
+    ws.append(["SYDNEY", "TOKYO", "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    path = str(tmp_path / "quote.xlsx")
+    wb.save(path)
+
+    args = ["import-quote", path, "--customer", "test co"]
+    assert cli.main(args) == cli.EXIT_OK
+    assert _last_json(capsys)["unchanged"] is False
+    assert cli.main(args) == cli.EXIT_OK
+    assert _last_json(capsys)["unchanged"] is True
+    assert cli.main(args + ["--force"]) == cli.EXIT_OK
+    assert _last_json(capsys)["skipped"] == 1
+
+
+def test_import_quote_rejects_customer_for_a_multi_customer_file(db, tmp_path, capsys):
+    path = tmp_path / "rates.csv"
+    path.write_text(
+        "Customer,POL,POD,Container,Freight USD,OTHC AUD,DOC AUD,CMR AUD,AMS USD,LSS USD,DTHC,Free Time\n"
+        "NEW CO,SYDNEY,TOKYO,20GP,500,300,100,200,40,20,COLLECT,14 Days\n"
+    )
+
+    assert cli.main(["import-quote", str(path), "--customer", "test co"]) == cli.EXIT_USAGE
+    assert "Customer column" in capsys.readouterr().err
+    assert cli.main(["import-quote", str(path)]) == cli.EXIT_OK
+    assert _last_json(capsys)["new"] == 1
+
+
+def test_edit_and_delete_touch_only_the_selected_customer(db, monkeypatch, capsys):
+    from types import SimpleNamespace
+    from sqlalchemy import select
+    from lib.db.models import Rate
+
+    _seed([(name, rate_values(pod, "40HC"))
+           for name, pod in (("TEST CO", "NINGBO"), ("TEST CO", "TOKYO"), ("OTHER CO", "NINGBO"))])
+
+    answers = iter(["2: SYDNEY to TOKYO (40HC)", "1: SYDNEY to NINGBO (40HC)"])
+    monkeypatch.setattr(cli, "ask_customer", lambda _s: "TEST CO")
+    monkeypatch.setattr(cli.questionary, "select",
+                        lambda *a, **k: SimpleNamespace(ask=lambda: next(answers)))
+    monkeypatch.setattr(cli.questionary, "confirm", lambda *a, **k: SimpleNamespace(ask=lambda: True))
+    monkeypatch.setattr(cli, "get_valid_ports", lambda: ([], [], [], []))
+    monkeypatch.setattr(cli, "rate_values_prompt",
+                        lambda *a, defaults: dict(defaults, freight_usd=650.0))
+
+    cli.edit_rates()
+    cli.delete_rate()
+    assert "Rate updated" in capsys.readouterr().out
+
+    s = cli.Session()
+    rates = s.execute(select(Rate.destination_port, Rate.freight_usd).order_by(Rate.id)).all()
+    s.close()
+    assert rates == [("TOKYO", 650.0), ("NINGBO", 500.0)]
+
+
+@pytest.mark.parametrize("argv", [
+    ["--profile", "list-rates", "--format", "csv"],
+    ["list-rates", "--format", "json", "--profile"],
+    ["list-rates", "--profile-mode", "timing"],
+])
+def test_profile_flag_before_or_after_the_command(db, tmp_path, monkeypatch, capsys, argv):
+    from lib import instrumentation
+
+    _seed([("TEST CO", rate_values(dest)) for dest in ("TOKYO", "NINGBO")])
+
+    log = tmp_path / "profile.jsonl"
+    monkeypatch.setenv("RATE_MANAGER_PROFILE_LOG", str(log))
+    try:
+        assert cli.main(argv) == cli.EXIT_OK
+    finally:
+        instrumentation.configure(None)
+
+    (record,) = [json.loads(line) for line in log.read_text().splitlines()]
+    assert (record["action"], record["status"], record["rows"]) == ("list-rates", "ok", 2)
+    assert record["sql_statements"] >= 1
+    assert "TOKYO" in capsys.readouterr().out
+
+
+def test_interactive_import_streams_without_loading_the_book(db, tmp_path, monkeypatch, capsys):
+    from types import SimpleNamespace
+    from sqlalchemy import event, select
+    from lib.db.models import Rate
+
+    _seed([(name, rate_values("TOKYO")) for name in ("TEST CO", "OTHER CO")])
+    path = tmp_path / "quote.csv"
+    path.write_text(
+        "POL,POD,Container,Freight USD,OTHC AUD,DOC AUD,CMR AUD,AMS USD,LSS USD,DTHC,Free Time\n"
+        "SYDNEY,TOKYO,20GP,650,300,100,200,40,20,COLLECT,14 Days\n"
+    )
+    monkeypatch.setattr(cli.questionary, "text", lambda *a, **k: SimpleNamespace(ask=lambda: str(path)))
+    monkeypatch.setattr(cli, "ask_customer", lambda _s, *a: "TEST CO")
+    monkeypatch.setattr(cli.questionary, "select", lambda *a, **k: SimpleNamespace(ask=lambda: "TEST CO"))
+    monkeypatch.setattr("lib.helpers.Session", cli.Session)
+    statements = []
+    event.listen(db, "before_cursor_execute", lambda _c, _cur, stmt, *_: statements.append(stmt))
+
+    cli.import_quote()
+    assert "0 new, 1 updated" in capsys.readouterr().out
+    assert not any("JOIN rates" in stmt for stmt in statements)
+
+    s = cli.Session()
+    assert s.scalars(select(Rate.freight_usd).order_by(Rate.id)).all() == [650, 500]
+    s.close()
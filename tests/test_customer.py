@@ -1,9 +1,5 @@
-import sys
-import os
 import glob
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
 from helpers import replace_or_add_rate, export_rates_to_excel
 from cli import import_quote
 from customer import Customer, Rate
@@ -160,3 +156,54 @@ def test_import_quote_adds_rate(tmp_path, monkeypatch):
 
     assert len(customer.rates) == 1
     assert customer.rates[0].load_port == "SYD"
+
+
+def _lane_rate(dest, freight=700, container="40HC"):
+    return Rate("SYD", dest, container, freight, 400, 200, 300, 35, 30, "COLLECT", "14 Days")
+
+
+def test_lane_index_stays_in_step_with_every_change():
+    customer = Customer("Test Co")
+    tokyo, busan = _lane_rate("TOKYO"), _lane_rate("BUSAN")
+    customer.add_rate(tokyo)
+    customer.add_rate(busan)
+    assert customer.find_rate("SYD", "BUSAN", "40HC") is busan
+
+    # Remove then add: same length, different lanes.
+    customer.remove_rate(tokyo)
+    ningbo = _lane_rate("NINGBO")
+    customer.add_rate(ningbo)
+    assert customer.find_rate("SYD", "TOKYO", "40HC") is None
+    assert customer.find_rate("SYD", "NINGBO", "40HC") is ningbo
+
+    # A lane edited on a rate already held by the customer.
+    busan.destination_port = "SHANGHAI"
+    assert customer.find_rate("SYD", "BUSAN", "40HC") is None
+    replace_or_add_rate(customer, _lane_rate("SHANGHAI", 750), replace_existing=True)
+    assert len(customer.rates) == 2 and busan.freight_usd == 750
+
+    # Replacing the whole list.
+    customer.rates = [tokyo]
+    assert customer.find_rate("SYD", "SHANGHAI", "40HC") is None
+    assert customer.find_rate("SYD", "TOKYO", "40HC") is tokyo
+    assert customer.to_dict()["rates"][0]["destination_port"] == "TOKYO"
+    assert not hasattr(tokyo, "__dict__")
+
+    # Legacy callers still treat rates as a list.
+    keelung = _lane_rate("KEELUNG")
+    customer.rates.append(keelung)
+    assert customer.find_rate("SYD", "KEELUNG", "40HC") is keelung
+    customer.rates[:1] = [ningbo]
+    assert customer.find_rate("SYD", "TOKYO", "40HC") is None
+    assert customer.find_rate("SYD", "NINGBO", "40HC") is ningbo
+    customer.rates.insert(0, tokyo)
+    assert customer.find_rate("SYD", "KEELUNG", "40HC") is keelung
+    assert isinstance(customer.rates, list) and len(customer.rates) == 3
+
+    # Each customer keeps its own index.
+    other = Customer("Other Co")
+    other.add_rate(_lane_rate("TOKYO"))
+    assert other.find_rate("SYD", "TOKYO", "40HC") is not None
+    ningbo.destination_port = "KAOHSIUNG"
+    assert other._lanes is not None
+    assert customer.find_rate("SYD", "KAOHSIUNG", "40HC") is ningbo
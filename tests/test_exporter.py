@@ -0,0 +1,25 @@
+from openpyxl import load_workbook
+
+from lib.exporter import ColumnWidths, write_excel
+
+
+def test_write_excel_keeps_quote_layout_and_widths(tmp_path):
+    headers = ["POL", "POD", "Freight USD"]
+    rows = [["SYDNEY", "TOKYO", 500.0], ["MELBOURNE", "NINGBO", 1250.5]]
+    widths = ColumnWidths(headers, title="Customer: TEST CO")
+    for row in rows:
+        widths.observe(row)
+
+    path = tmp_path / "quote.xlsx"
+    count = write_excel(path, headers, iter(rows), "Quote", title="Customer: TEST CO", widths=widths)
+
+    assert count == 2
+    ws = load_workbook(path).active
+    assert ws.title == "Quote"
+    assert ws["A1"].value == "Customer: TEST CO"
+    assert ws["A1"].font.b
+    assert [c.value for c in ws[3]] == headers
+    assert all(c.font.b for c in ws[3])
+    assert ws["B5"].value == "NINGBO"
+    assert ws.column_dimensions["A"].width == len("Customer: TEST CO") + 2
+    assert ws.column_dimensions["B"].width == len("NINGBO") + 2
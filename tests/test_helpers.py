@@ -0,0 +1,69 @@
+import pytest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from lib.db.models import Base
+from lib.helpers import TariffManager
+
+
+def _tariff(pod, freight=700):
+    return {
+        "load_port": "SYDNEY", "destination_port": pod, "container_type": "40HC",
+        "freight_usd": freight, "othc_aud": 300, "doc_aud": 100, "cmr_aud": 200,
+        "ams_usd": 40, "lss_usd": 20, "dthc": "collect", "free_time": "14 Days",
+    }
+
+
+def test_tariff_manager_updates_items_without_rereading(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tariffs.db'}", future=True)
+    Base.metadata.create_all(engine)
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(_conn, _cursor, statement, *_):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tariffs" in statement:
+            selects.append(statement)
+
+    manager = TariffManager(sessionmaker(bind=engine, future=True))
+    manager.ensure_loaded()
+    manager.add_many([_tariff(f"PORT{i}") for i in range(50)])
+    manager.add_tariffs("SYDNEY", "TOKYO", "20GP", _tariff("TOKYO", 650))
+    assert manager.delete_many([0, 1, 2]) == 3
+    assert manager.delete_tariff(0)
+    assert len(selects) == 1
+
+    assert [t.destination_port for t in manager.items[:2]] == ["PORT4", "PORT5"]
+    assert manager.items[-1].container_type == "20GP" and manager.items[-1].dthc == "COLLECT"
+    items = [(t.id, t.destination_port) for t in manager.items]
+    manager.load_tariffs()
+    assert [(t.id, t.destination_port) for t in manager.items] == items
+    engine.dispose()
+
+
+def test_customer_completer_matches_by_prefix(session):
+    from prompt_toolkit.document import Document
+    from lib.db.models import Customer
+    from lib.helpers import CustomerCompleter
+
+    s = session
+    s.add_all(Customer(name=n) for n in ("ACME", "ACME FREIGHT", "ZETA CO"))
+    s.flush()
+
+    completer = CustomerCompleter(s, limit=5)
+    assert [c.text for c in completer.get_completions(Document("ac"), None)] == ["ACME", "ACME FREIGHT"]
+    assert [c.text for c in CustomerCompleter(s, limit=1).get_completions(Document(""), None)] == ["ACME"]
+
+
+def test_adding_an_existing_tariff_lane_is_refused(session_factory):
+    manager = TariffManager(session_factory)
+    manager.add_many([_tariff("TOKYO")])
+    manager.ensure_loaded()
+
+    with pytest.raises(ValueError, match=r"already exists: SYDNEY → TOKYO \(40HC\)"):
+        manager.add_many([_tariff("NINGBO"), _tariff("TOKYO", 900)])
+    with pytest.raises(ValueError, match=r"already exists: SYDNEY → BUSAN"):
+        manager.add_many([_tariff("BUSAN"), _tariff("BUSAN")])
+
+    manager.load_tariffs()
+    assert [(t.destination_port, t.freight_usd) for t in manager.items] == [("TOKYO", 700)]
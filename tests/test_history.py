@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from conftest import rate_values
+from lib.db.models import Rate, RateHistory
+from lib.history import close_rate_versions, lane_history, rate_as_of
+from lib.importer import upsert_rates
+from lib.repricing import reprice_rates
+
+LANE = ("TEST CO", "SYDNEY", "NINGBO", "40HC")
+
+
+def _row(freight):
+    return "TEST CO", rate_values("NINGBO", "40HC", freight)
+
+
+def test_each_change_appends_a_version_and_closes_the_last(session):
+    upsert_rates(session, [_row(500)])
+    upsert_rates(session, [_row(500)])
+    upsert_rates(session, [_row(650)])
+    session.commit()
+
+    versions = lane_history(session, *LANE)
+    assert [v.freight_usd for v in versions] == [500, 650]
+    assert versions[0].valid_to == versions[1].valid_from
+    assert versions[1].valid_to is None
+
+
+def test_point_in_time_lookup(session):
+    upsert_rates(session, [_row(500)])
+    session.execute(
+        RateHistory.__table__.update().values(valid_from=datetime(2026, 1, 1))
+    )
+    upsert_rates(session, [_row(650)])
+    session.commit()
+
+    assert rate_as_of(session, *LANE, datetime(2025, 12, 31)) is None
+    assert rate_as_of(session, *LANE, datetime(2026, 3, 1)).freight_usd == 500
+    assert rate_as_of(session, "test co", *LANE[1:], datetime.now()).freight_usd == 650
+
+
+def test_repricing_and_delete_are_versioned(session):
+    upsert_rates(session, [_row(500)])
+    reprice_rates(session, amount=100)
+    rate = session.scalars(select(Rate)).one()
+    close_rate_versions(session, Rate.id == rate.id, datetime.now())
+    session.delete(rate)
+    session.commit()
+
+    versions = lane_history(session, *LANE)
+    assert [v.freight_usd for v in versions] == [500, 600]
+    assert all(v.valid_to is not None for v in versions)
+
@@ -0,0 +1,266 @@
+import pytest
+from openpyxl import Workbook
+
+from conftest import rate_values
+from lib.db.models import Customer, Rate, RATE_FIELDS, row_hash
+from lib.importer import (
+    RateSheet, import_rate_sheet, import_tariff_sheet,
+    upsert_rates, upsert_tariffs,
+)
+from lib.repricing import reprice_rates
+
+
+def test_upsert_rates_counts_new_updated_and_skipped(session):
+    new, updated, skipped = upsert_rates(session, [
+        ("TEST CO", rate_values()),
+        ("TEST CO", rate_values(container="40HC")),
+        ("OTHER CO", rate_values()),
+    ])
+    session.commit()
+    assert (new, updated, skipped) == (3, 0, 0)
+    assert session.query(Customer).count() == 2
+
+    new, updated, skipped = upsert_rates(session, [
+        ("TEST CO", rate_values()),
+        ("TEST CO", rate_values(freight=650, container="40HC")),
+        ("OTHER CO", rate_values(pod="NINGBO")),
+    ])
+    session.commit()
+    assert (new, updated, skipped) == (1, 1, 1)
+
+    rate = session.query(Rate).filter_by(container_type="40HC").one()
+    assert rate.freight_usd == 650
+    assert rate.dthc == "COLLECT"
+
+
+def test_upsert_rates_repeated_lane_in_one_batch_keeps_last_row(session):
+    new, updated, skipped = upsert_rates(session, [
+        ("TEST CO", rate_values()),
+        ("TEST CO", rate_values()),
+        ("TEST CO", rate_values(freight=900)),
+    ])
+    session.commit()
+    assert (new, updated, skipped) == (1, 1, 1)
+    assert session.query(Rate).one().freight_usd == 900
+
+
+def test_rate_sheet_streams_multi_customer_rows_in_chunks(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Destination Port: TOKYO"])
+    ws.append([])
+    ws.append(["Customer", "POL", "POD", "Container", "Freight USD", "OTHC AUD",
+               "DOC AUD", "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"])
+    for i in range(5):
+        ws.append([f"co {i}", "SYDNEY", "TOKYO", "20GP", 500 + i, 300, 100, 200,
+                   40, 20, "collect", "14 Days"])
+    ws.append([None, "SYDNEY", "TOKYO", "40HC", 1, 1, 1, 1, 1, 1, "COLLECT", "7 Days"])
+    path = tmp_path / "multi.xlsx"
+    wb.save(path)
+
+    with RateSheet(str(path), chunk_size=2) as sheet:
+        assert sheet.is_multi_customer
+        chunks = list(sheet.chunks())
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[0][0][0] == "CO 0"
+    assert chunks[-1][0][1]["freight_usd"] == 504.0
+    assert sheet.skipped == 1
+
+
+def test_upsert_tariffs_updates_existing_lane(session):
+    assert upsert_tariffs(session, [rate_values(), rate_values(container="40HC")]) == (2, 0, 0)
+    assert upsert_tariffs(session, [rate_values(freight=700), rate_values(container="40HC")]) == (0, 1, 1)
+
+
+def test_import_tariff_sheet_returns_counts(session, tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["POL", "POD", "Container", "Freight USD", "OTHC AUD", "DOC AUD",
+               "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"])
+    ws.append(["SYDNEY", "TOKYO", "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    path = tmp_path / "tariff.xlsx"
+    wb.save(path)
+
+    with RateSheet(str(path), allow_customer=False) as sheet:
+        assert import_tariff_sheet(session, sheet) == (1, 0, 0)
+
+
+def _quote_file(path, freights):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["POL", "POD", "Container", "Freight USD", "OTHC AUD", "DOC AUD",
+               "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"])
+    for dest, freight in zip(("TOKYO", "SHANGHAI", "NINGBO"), freights):
+        ws.append(["SYDNEY", dest, "20GP", freight, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    wb.save(path)
+    return str(path)
+
+
+def test_unchanged_file_short_circuits_until_forced(session, tmp_path):
+    path = _quote_file(tmp_path / "quote.xlsx", [500, 600])
+
+    with RateSheet(path) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (2, 0, 0)
+    with RateSheet(path) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (0, 0, 2)
+        assert sheet.unchanged
+    with RateSheet(path) as sheet:
+        assert import_rate_sheet(session, sheet, "OTHER CO") == (2, 0, 0)
+    with RateSheet(path) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO", force=True) == (0, 0, 2)
+        assert not sheet.unchanged
+
+
+def _csv_quote(path, rows):
+    path.write_text(
+        "POL,POD,Container,Freight USD,OTHC AUD,DOC AUD,CMR AUD,AMS USD,LSS USD,DTHC,Free Time\n"
+        + "".join(f"SYDNEY,{dest},20GP,{freight},300,100,200,40,20,COLLECT,14 Days\n" for dest, freight in rows)
+    )
+    return str(path)
+
+
+def test_a_file_with_rejected_rows_still_forgets_other_files(session, tmp_path):
+    b = _csv_quote(tmp_path / "b.csv", [("TOKYO", 500)])
+    a = _csv_quote(tmp_path / "a.csv", [("TOKYO", 900), ("NOWHERE", 900)])
+
+    with RateSheet(b) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (1, 0, 0)
+    with RateSheet(a) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (0, 1, 0)
+        assert len(sheet.rejected) == 1
+    with RateSheet(b) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (0, 1, 0)
+        assert not sheet.unchanged
+    assert session.query(Rate).one().freight_usd == 500
+
+
+def test_other_writers_keep_row_hash_current(session, tmp_path):
+    path = _quote_file(tmp_path / "quote.xlsx", [500])
+    with RateSheet(path) as sheet:
+        import_rate_sheet(session, sheet, "TEST CO")
+
+    reprice_rates(session, amount=100)
+    rate = session.query(Rate).one()
+    assert rate.row_hash == row_hash(_row_for(rate))
+
+    # Repricing forgets the file, so the re-import restores the old freight.
+    with RateSheet(path) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (0, 1, 0)
+
+    rate.dthc = "PREPAID"
+    session.flush()
+    assert upsert_rates(session, [("TEST CO", _row_for(rate, dthc="PREPAID"))]) == (0, 0, 1)
+
+
+def _row_for(rate, **changes):
+    return dict({k: getattr(rate, k) for k in RATE_FIELDS}, **changes)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_flat_file_exports_round_trip_through_rate_sheet(session, tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    from lib.exporter import export_destination_rates
+
+    upsert_rates(session, [("TEST CO", rate_values()), ("OTHER CO", rate_values(freight=612.5))])
+    session.commit()
+    path, count = export_destination_rates(session, "TOKYO", tmp_path, fmt)
+    assert path.suffix == f".{fmt}" and count == 2
+
+    with RateSheet(str(path)) as sheet:
+        assert sheet.is_multi_customer
+        # Same values, same row hashes: nothing to write.
+        assert import_rate_sheet(session, sheet, force=True) == (0, 0, 2)
+
+
+def test_csv_tariff_file_is_single_customer_and_rejects_bad_rows(session, tmp_path):
+    path = tmp_path / "tariff.csv"
+    path.write_text(
+        "\ufeffPOL,POD,Container,Freight USD,OTHC AUD,DOC AUD,CMR AUD,AMS USD,LSS USD,DTHC,Free Time\n"
+        "sydney,tokyo,20gp,\"$1,200\",300,100,200,40,20,collect,14 Days\n"
+        ",,,,,,,,,,\n"
+        "SYDNEY,NINGBO,20GP,abc,300,100,200,40,20,COLLECT,14 Days\n",
+        encoding="utf-8",
+    )
+    with RateSheet(str(path), allow_customer=False) as sheet:
+        assert not sheet.is_multi_customer
+        assert import_tariff_sheet(session, sheet) == (1, 0, 0)
+    assert [r.row for r in sheet.rejected] == [4]
+
+
+def test_rate_sheet_rejects_unknown_extensions(tmp_path):
+    path = tmp_path / "rates.txt"
+    path.write_text("POL\n")
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        RateSheet(str(path))
+
+
+def test_batch_import_applies_files_in_input_order(session_factory, tmp_path):
+    from lib.importer import import_rate_files
+
+    header = "Customer,POL,POD,Container,Freight USD,OTHC AUD,DOC AUD,CMR AUD,AMS USD,LSS USD,DTHC,Free Time\n"
+    line = "{},SYDNEY,TOKYO,20GP,{},300,100,200,40,20,COLLECT,14 Days\n"
+    # The first file is much bigger, so it finishes parsing last.
+    first = tmp_path / "a.csv"
+    first.write_text(header + "".join(line.format(f"CO {i}", 500) for i in range(20000)))
+    second = tmp_path / "b.csv"
+    second.write_text(header + line.format("CO 0", 900))
+
+    summaries, totals = import_rate_files([str(first), str(second)], workers=2,
+                                          session_factory=session_factory)
+    assert [s["file"] for s in summaries] == [str(first), str(second)]
+    assert totals["failed"] == 0
+
+    s = session_factory()
+    rate = s.query(Rate).join(Customer).filter(Customer.name == "CO 0").one()
+    assert rate.freight_usd == 900
+    s.close()
+
+
+def test_an_earlier_batch_file_can_be_reimported(session_factory, tmp_path):
+    from lib.importer import import_rate_files
+
+    a = _csv_quote(tmp_path / "a.csv", [("TOKYO", 500)])
+    b = _csv_quote(tmp_path / "b.csv", [("TOKYO", 900)])
+    _, totals = import_rate_files([a, b], "TEST CO", workers=1, session_factory=session_factory)
+    assert (totals["new"], totals["updated"]) == (1, 1)
+
+    # b overwrote a's lane, so a's fingerprint no longer describes the table.
+    _, totals = import_rate_files([a], "TEST CO", workers=1, session_factory=session_factory)
+    assert (totals["unchanged"], totals["updated"]) == (0, 1)
+    s = session_factory()
+    assert s.query(Rate).one().freight_usd == 500
+    s.close()
+
+
+def test_sheet_import_reads_existing_rates_once(session, engine, tmp_path):
+    from sqlalchemy import event
+
+    upsert_rates(session, [("TEST CO", rate_values(pod=dest)) for dest in ("TOKYO", "NINGBO")])
+    session.commit()
+    path = _csv_quote(tmp_path / "quote.csv", [
+        ("TOKYO", 500), ("SHANGHAI", 500), ("SHEKOU", 500), ("NINGBO", 650), ("SHANGHAI", 700)])
+
+    reads = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(_conn, _cursor, statement, *_):
+        if statement.lstrip().startswith("SELECT rates.id"):
+            reads.append(statement)
+
+    with RateSheet(path, chunk_size=2) as sheet:
+        # SHANGHAI is inserted in the first chunk and changed in the third.
+        assert import_rate_sheet(session, sheet, "TEST CO") == (2, 2, 1)
+    assert len(reads) == 1
+    shanghai = session.query(Rate).filter_by(destination_port="SHANGHAI").one()
+    assert shanghai.freight_usd == 700
+
+    # A lane inserted in one chunk and repeated in the next keeps the hash
+    # of the repeat that was written, not the first one.
+    path = _csv_quote(tmp_path / "repeats.csv", [
+        ("SHANGHAI", 100), ("NINGBO", 1), ("SHANGHAI", 200), ("SHANGHAI", 300), ("SHANGHAI", 200)])
+    with RateSheet(path, chunk_size=2) as sheet:
+        assert import_rate_sheet(session, sheet, "NEW CO") == (2, 3, 0)
+    new_co = session.query(Rate).join(Customer).filter(Customer.name == "NEW CO")
+    assert new_co.filter(Rate.destination_port == "SHANGHAI").one().freight_usd == 200
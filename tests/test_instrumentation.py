@@ -0,0 +1,37 @@
+import json
+
+from sqlalchemy import create_engine, text
+
+from lib import instrumentation
+
+
+def test_action_logs_sql_rows_and_phases(tmp_path):
+    log = tmp_path / "profile.jsonl"
+    engine = create_engine("sqlite://", future=True)
+    instrumentation.configure("timing", log)
+    try:
+        for _ in range(2):
+            with instrumentation.action("View Rates"):
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                    conn.execute(text("SELECT 2"))
+                instrumentation.record_rows(10)
+                with instrumentation.phase("render"):
+                    pass
+    finally:
+        instrumentation.configure(None)
+        engine.dispose()
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]["action"] == "View Rates" and records[0]["status"] == "ok"
+    assert records[0]["sql_statements"] == 2 and records[0]["rows"] == 10
+    assert "render" in records[0]["phases"]
+
+    (summary,) = instrumentation.summarise(log)
+    assert (summary["action"], summary["count"], summary["rows"]) == ("View Rates", 2, 20)
+
+    # Off again: hooks are no-ops and nothing more is written.
+    with instrumentation.action("View Rates"):
+        instrumentation.record_rows(5)
+    assert len(log.read_text().splitlines()) == 2
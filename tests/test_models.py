@@ -0,0 +1,23 @@
+from lib.db.models import make_engine
+
+
+def test_make_engine_applies_sqlite_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("RATE_MANAGER_SQLITE_BUSY_TIMEOUT", "1234")
+    engine = make_engine(f"sqlite:///{tmp_path / 'rates.db'}")
+    try:
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+        assert engine.pool.size() == 5
+    finally:
+        engine.dispose()
+
+
+def test_make_engine_reads_url_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("RATE_MANAGER_DB_URL", f"sqlite:///{tmp_path / 'env.db'}")
+    engine = make_engine()
+    try:
+        assert engine.url.database.endswith("env.db")
+    finally:
+        engine.dispose()
@@ -0,0 +1,34 @@
+import pytest
+
+from lib.importer import normalise_rate_values, upsert_rates, upsert_tariffs
+from lib.pricing import LaneIndex
+
+
+@pytest.fixture
+def index(session):
+    upsert_rates(session, [("TEST CO", normalise_rate_values(
+        ["SYDNEY", "TOKYO", "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"]))])
+    upsert_tariffs(session, [
+        normalise_rate_values(["SYDNEY", "TOKYO", "20GP", 900, 350, 120, 220, 45, 25, "COLLECT", "7 Days"]),
+        normalise_rate_values(["SYDNEY", "NINGBO", "40HC", 1200, 400, 100, 20, 30, 70, "PREPAID", "7 Days"]),
+    ])
+    session.commit()
+    return LaneIndex.load(session)
+
+
+def test_contract_rate_wins_over_tariff(index):
+    quote = index.price("test co", "SYDNEY", "TOKYO", "20GP")
+    assert quote.source == "contract"
+    assert quote.total_usd == 500 + 40 + 20
+    assert quote.total_aud == 300 + 100 + 200
+
+
+def test_falls_back_to_tariff_and_prices_in_batch(index):
+    quotes = index.price_many([
+        ("TEST CO", "SYDNEY", "NINGBO", "40HC"),
+        ("OTHER CO", "SYDNEY", "TOKYO", "20GP"),
+        ("TEST CO", "BRISBANE", "TOKYO", "20GP"),
+    ])
+    assert [q.source if q else None for q in quotes] == ["tariff", "tariff", None]
+    assert quotes[0].total_usd == 1200 + 30 + 70
+    assert quotes[1].free_time == "7 Days"
@@ -0,0 +1,42 @@
+import pytest
+
+from conftest import rate_values
+from lib.importer import upsert_rates
+from lib.queries import customer_names, destination_ports, destination_rates_stmt, rate_page
+
+
+@pytest.fixture
+def session(session):
+    rows = [
+        (name, rate_values(dest))
+        for name in ("ZETA CO", "ALPHA CO")
+        for dest in ("TOKYO", "NINGBO")
+    ]
+    upsert_rates(session, rows)
+    session.commit()
+    return session
+
+
+def test_distinct_names_and_ports_come_back_sorted(session):
+    assert customer_names(session) == ["ALPHA CO", "ZETA CO"]
+    assert destination_ports(session) == ["NINGBO", "TOKYO"]
+
+
+def test_destination_rates_stream_in_customer_order(session):
+    rows = session.execute(destination_rates_stmt("TOKYO")).all()
+    assert [r[0] for r in rows] == ["ALPHA CO", "ZETA CO"]
+    assert {r[2] for r in rows} == {"TOKYO"}
+
+
+def test_rate_page_walks_keyset_pages_with_filters(session):
+    first, cursor = rate_page(session, limit=3)
+    assert [r[0] for r in first] == ["ALPHA CO", "ALPHA CO", "ZETA CO"]
+    assert cursor is not None
+
+    second, cursor = rate_page(session, after=cursor, limit=3)
+    assert [r[0] for r in second] == ["ZETA CO"]
+    assert cursor is None
+
+    rows, cursor = rate_page(session, {"customer": "ZE", "destination_port": "NINGBO"})
+    assert [(r[0], r[2]) for r in rows] == [("ZETA CO", "NINGBO")]
+    assert cursor is None
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from lib.db.models import Base
+from lib.registry import add_value, get_registry, remove_value
+
+
+@pytest.fixture
+def constants(tmp_path):
+    path = tmp_path / "data_constants.json"
+    path.write_text(json.dumps({
+        "VALID_LOAD_PORTS": ["SYDNEY"], "VALID_DEST_PORTS": ["TOKYO"],
+        "VALID_CONTAINERS": ["20GP"], "VALID_DTHC": ["COLLECT"],
+    }))
+    return path
+
+
+def test_registry_is_cached_until_the_table_changes(session, constants):
+    first = get_registry(session, constants)
+    assert get_registry(session, constants) is first
+    assert first.is_valid("load_port", "SYDNEY")
+    assert first.unknown({"load_port": "SYDNEY", "destination_port": "NINGBO",
+                          "container_type": "20GP", "dthc": "COLLECT"}) == ["destination_port"]
+
+    add_value(session, "destination_port", " ningbo ")
+    added = get_registry(session, constants)
+    assert added is not first
+    assert added.choices["destination_port"] == ("TOKYO", "NINGBO")
+
+    assert remove_value(session, "destination_port", "NINGBO")
+    assert not remove_value(session, "destination_port", "TOKYO")
+    assert not get_registry(session, constants).is_valid("destination_port", "NINGBO")
+
+
+def test_registry_reloads_when_the_file_changes(session, constants):
+    assert not get_registry(session, constants).is_valid("container_type", "40HC")
+
+    data = json.loads(constants.read_text())
+    data["VALID_CONTAINERS"].append("40HC")
+    constants.write_text(json.dumps(data))
+    os.utime(constants, ns=(os.stat(constants).st_atime_ns, os.stat(constants).st_mtime_ns + 10**9))
+
+    assert get_registry(session, constants).is_valid("container_type", "40HC")
+
+
+def test_registry_reloads_after_a_write_from_another_connection(tmp_path, constants):
+    url = f"sqlite:///{tmp_path / 'registry.db'}"
+    engine = create_engine(url)
+    other = create_engine(url)
+    Base.metadata.create_all(engine)
+
+    with Session(other) as s:
+        add_value(s, "destination_port", "NINGBO")
+        s.commit()
+    with Session(engine) as s:
+        assert get_registry(s, constants).is_valid("destination_port", "NINGBO")
+
+    # Delete and re-add from outside: SQLite hands the freed rowid to the
+    # new value, so the table's row count and max(id) stay the same.
+    with other.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM registry_values")
+        conn.exec_driver_sql(
+            "INSERT INTO registry_values (kind, value) VALUES ('destination_port', 'SHEKOU')")
+    with Session(engine) as s:
+        registry = get_registry(s, constants)
+    assert registry.choices["destination_port"] == ("TOKYO", "SHEKOU")
+    engine.dispose()
+    other.dispose()
@@ -0,0 +1,55 @@
+import csv
+
+import pytest
+from openpyxl import load_workbook
+
+from lib.importer import normalise_rate_values, upsert_rates, upsert_tariffs
+from lib.reports import MARGIN_HEADERS, export_margin_report
+
+
+@pytest.fixture
+def session(session):
+    upsert_tariffs(session, [
+        normalise_rate_values(["SYDNEY", dest, "20GP", 1000, 400, 100, 100, 50, 50, "COLLECT", "7 Days"])
+        for dest in ("TOKYO", "NINGBO")
+    ])
+    upsert_rates(session, [
+        ("ALPHA CO", normalise_rate_values(["SYDNEY", "TOKYO", "20GP", 800, 400, 100, 100, 50, 50, "COLLECT", "14 Days"])),
+        ("ALPHA CO", normalise_rate_values(["SYDNEY", "NINGBO", "20GP", 900, 300, 100, 100, 50, 50, "COLLECT", "14 Days"])),
+        ("BETA CO", normalise_rate_values(["SYDNEY", "TOKYO", "20GP", 1000, 400, 100, 100, 50, 50, "COLLECT", "14 Days"])),
+        ("BETA CO", normalise_rate_values(["SYDNEY", "SHANGHAI", "20GP", 1000, 400, 100, 100, 50, 50, "COLLECT", "14 Days"])),
+    ])
+    session.commit()
+    return session
+
+
+def test_margin_report_xlsx_has_lanes_and_summaries(session, tmp_path):
+    paths, report = export_margin_report(session, tmp_path)
+
+    assert report.lanes == 3  # SHANGHAI has no tariff to compare against
+    wb = load_workbook(paths[0], read_only=True)
+    assert wb.sheetnames == ["Lanes", "By Customer", "By Destination"]
+
+    lanes = list(wb["Lanes"].iter_rows(values_only=True))
+    assert list(lanes[0]) == MARGIN_HEADERS
+    alpha_tokyo = next(
+        dict(zip(MARGIN_HEADERS, r)) for r in lanes[1:] if r[0] == "ALPHA CO" and r[2] == "TOKYO"
+    )
+    assert alpha_tokyo["Freight USD Discount"] == 200
+    assert alpha_tokyo["USD Discount"] == 200
+    assert alpha_tokyo["USD Discount %"] == round(200 / 1100 * 100, 2)
+
+    customers = {r[0]: r for r in wb["By Customer"].iter_rows(min_row=2, values_only=True)}
+    assert customers["ALPHA CO"][1] == 2
+    assert customers["ALPHA CO"][4] == 300   # USD discount across both lanes
+    assert customers["ALPHA CO"][8] == 100   # AUD discount on NINGBO OTHC
+    assert customers["BETA CO"][4] == 0
+
+
+def test_margin_report_csv_writes_three_files(session, tmp_path):
+    paths, report = export_margin_report(session, tmp_path, fmt="csv", filters={"destination_port": "TOKYO"})
+
+    assert len(paths) == 3
+    with open(paths[2], encoding="utf-8", newline="") as fh:
+        rows = list(csv.reader(fh))
+    assert rows[1][:2] == ["TOKYO", "2"]
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import func, select
+
+from conftest import rate_values
+from lib.db.models import Customer, Rate, RateHistory
+from lib.repository import (
+    customer_ids, delete_rates, find_customer, find_rate, get_or_create_customer,
+    rates_by_lane, save_rate, unit_of_work,
+)
+
+
+def test_unit_of_work_commits_or_rolls_back(session_factory):
+    with unit_of_work(session_factory) as s:
+        get_or_create_customer(s, " test co ")
+    with pytest.raises(RuntimeError):
+        with unit_of_work(session_factory) as s:
+            get_or_create_customer(s, "OTHER CO")
+            raise RuntimeError("boom")
+
+    with unit_of_work(session_factory) as s:
+        assert s.scalars(select(Customer.name)).all() == ["TEST CO"]
+        customer = find_customer(s, "test co")
+        assert find_customer(s, "TEST CO") is customer
+        assert customer_ids(s, ["TEST CO", "NEW CO"]) == {"TEST CO": customer.id, "NEW CO": customer.id + 1}
+
+
+def test_save_and_delete_keep_history(session_factory):
+    with unit_of_work(session_factory) as s:
+        customer = get_or_create_customer(s, "TEST CO")
+        rate = save_rate(s, customer.id, rate_values("NINGBO", "40HC"))
+        lane = (customer.id, "SYDNEY", "NINGBO", "40HC")
+        assert find_rate(s, *lane) is rate
+        # Editing can move the rate to another lane; the old lane's version closes.
+        save_rate(s, customer.id, rate_values("TOKYO", "40HC", 650), rate)
+        assert rates_by_lane(s, [lane, (customer.id, "SYDNEY", "TOKYO", "40HC")]) == {
+            (customer.id, "SYDNEY", "TOKYO", "40HC"): rate
+        }
+        rate_id = rate.id
+
+    with unit_of_work(session_factory) as s:
+        assert delete_rates(s, [rate_id]) == 1
+        assert delete_rates(s, [rate_id]) == 0
+        assert s.scalar(select(func.count()).select_from(Rate)) == 0
+        versions = s.execute(
+            select(RateHistory.destination_port, RateHistory.freight_usd, RateHistory.valid_to)
+            .order_by(RateHistory.id)
+        ).all()
+        assert [(pod, freight) for pod, freight, _ in versions] == [("NINGBO", 500), ("TOKYO", 650)]
+        assert all(valid_to is not None for _, _, valid_to in versions)
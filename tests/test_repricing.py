@@ -0,0 +1,70 @@
+import pytest
+
+from conftest import rate_values
+from lib.db.models import Rate, RATE_FIELDS, row_hash
+from lib.importer import upsert_rates
+from lib.repricing import reprice_rates
+
+
+@pytest.fixture
+def session(session):
+    upsert_rates(session, [
+        (name, rate_values(dest, ct))
+        for name in ("ALPHA CO", "BETA CO")
+        for dest in ("SHANGHAI", "TOKYO")
+        for ct in ("20GP", "40HC")
+    ])
+    session.commit()
+    return session
+
+
+def test_gri_only_touches_matching_lanes(session):
+    result = reprice_rates(
+        session, {"destination_port": "SHANGHAI", "container_type": "40HC"}, amount=100
+    )
+    session.commit()
+
+    assert (result.matched, result.changed) == (2, 2)
+    assert result.after["freight_usd"] - result.before["freight_usd"] == 200
+    freights = {
+        (r.destination_port, r.container_type, r.freight_usd) for r in session.query(Rate)
+    }
+    assert freights == {
+        ("SHANGHAI", "40HC", 600), ("SHANGHAI", "20GP", 500),
+        ("TOKYO", "40HC", 500), ("TOKYO", "20GP", 500),
+    }
+
+
+def test_percentage_and_converted_amount_are_rounded(session):
+    result = reprice_rates(
+        session, {"customer": "ALPHA"}, fields=["othc_aud", "lss_usd"],
+        percent=3.333, amount=10, amount_currency="USD", fx={"AUD": 0.65},
+    )
+    session.commit()
+
+    assert result.matched == 4
+    rate = session.query(Rate).filter_by(destination_port="TOKYO", container_type="20GP").first()
+    assert rate.othc_aud == round(300 * 1.03333 + 10 / 0.65, 2)
+    assert rate.lss_usd == round(20 * 1.03333 + 10, 2)
+
+
+def test_dry_run_writes_nothing(session):
+    result = reprice_rates(session, percent=10, dry_run=True)
+    assert result.changed == 8
+    assert {r.freight_usd for r in session.query(Rate)} == {500}
+
+
+def test_converting_an_amount_needs_an_explicit_rate(session):
+    with pytest.raises(ValueError, match="AUD exchange rate"):
+        reprice_rates(session, amount=100, amount_currency="AUD")
+    # Same currency as the field, or no amount at all, needs no rate.
+    assert reprice_rates(session, fields=["othc_aud"], amount=5, amount_currency="AUD").changed == 8
+    assert reprice_rates(session, percent=10, amount_currency="AUD").changed == 8
+
+
+def test_repriced_rows_get_a_matching_row_hash(session):
+    reprice_rates(session, {"container_type": "40HC"}, fields=["freight_usd", "doc_aud"], percent=5)
+    session.commit()
+    for rate in session.query(Rate):
+        assert rate.row_hash == row_hash({k: getattr(rate, k) for k in RATE_FIELDS})
+    assert {r.doc_aud for r in session.query(Rate).filter_by(container_type="40HC")} == {105}
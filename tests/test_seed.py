@@ -0,0 +1,63 @@
+import json
+
+from sqlalchemy import event
+
+from lib.db import seed
+from lib.db.models import Customer, Rate, RateHistory, Tariff
+
+
+def _rate(dest="TOKYO", freight=500):
+    return {"load_port": "SYD", "destination_port": dest, "container_type": "20GP",
+            "freight_usd": freight, "othc_aud": "300", "doc_aud": 100, "cmr_aud": 200,
+            "ams_usd": 40, "lss_usd": 20, "dthc": "collect", "free_time": "14 Days"}
+
+
+def test_iter_json_records_streams_an_array_across_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(seed, "READ_BLOCK", 7)
+    path = tmp_path / "rates.json"
+    records = [{"name": f"co {i}", "rates": [_rate()]} for i in range(5)]
+    path.write_text(json.dumps(records, indent=2))
+    assert list(seed.iter_json_records(path)) == records
+
+
+def test_seed_is_idempotent_and_versions_changes(session, tmp_path):
+    path = tmp_path / "rates.json"
+    path.write_text(json.dumps([
+        {"name": "test co", "rates": [_rate(), _rate("NINGBO"), _rate("SHANGHAI", "n/a")]},
+    ]))
+
+    assert seed.seed_customers_and_rates(session, path) == {"rates": 2, "written": 2, "rejected": 1}
+    assert seed.seed_customers_and_rates(session, path) == {"rates": 2, "written": 0, "rejected": 1}
+
+    lines = tmp_path / "rates.jsonl"
+    lines.write_text(json.dumps(dict(_rate(freight=650), customer="TEST CO")) + "\n")
+    assert seed.seed_customers_and_rates(session, lines)["written"] == 1
+    session.commit()
+
+    assert session.query(Customer).count() == 1
+    assert session.query(Rate).filter_by(destination_port="TOKYO").one().freight_usd == 650
+    assert session.query(RateHistory).count() == 3
+
+
+def test_seed_tariffs_upserts_by_lane(session, tmp_path):
+    path = tmp_path / "tariff.json"
+    path.write_text(json.dumps([_rate(), _rate(freight=700), _rate("NINGBO")]))
+    assert seed.seed_tariffs(session, path) == {"tariffs": 3, "written": 2, "rejected": 0}
+    assert session.query(Tariff).filter_by(destination_port="TOKYO").one().freight_usd == 700
+
+
+def test_seed_keeps_each_statement_within_the_parameter_limit(engine, session, tmp_path, monkeypatch):
+    # SQLite builds before 3.32 allow 999 bound parameters per statement.
+    monkeypatch.setattr(engine.dialect, "insertmanyvalues_max_parameters", 999)
+    sizes = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(_conn, _cursor, statement, parameters, *_):
+        if statement.startswith("INSERT INTO rates"):
+            sizes.append(len(parameters))
+
+    path = tmp_path / "rates.jsonl"
+    path.write_text("".join(
+        json.dumps(dict(_rate(f"PORT{i}"), customer="TEST CO")) + "\n" for i in range(200)))
+    assert seed.seed_customers_and_rates(session, path)["written"] == 200
+    assert len(sizes) > 1 and max(sizes) <= 999 and sum(sizes) == 200 * 13
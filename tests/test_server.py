@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from lib.db.models import Base
+from conftest import rate_values
+from lib.importer import upsert_rates, upsert_tariffs
+from lib.server import MAX_BODY, QuoteCache, QuoteServer
+
+
+async def _request(port, method, target, body=None, length=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: x\r\nContent-Length: {length or len(data)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + data
+    )
+    await writer.drain()
+    head, _, payload = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    return int(head.split()[1]), json.loads(payload)
+
+
+def test_quote_api_serves_from_cache_and_reloads_after_writes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, future=True)
+    s = factory()
+    upsert_rates(s, [("TEST CO", rate_values("NINGBO", "40HC", 500))])
+    upsert_tariffs(s, [rate_values("TOKYO", "40HC", 700)])
+    s.commit()
+
+    async def scenario():
+        cache = QuoteCache(factory)
+        await cache.refresh()
+        server = await asyncio.start_server(QuoteServer(cache).handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, quote = await _request(
+                port, "GET", "/price?customer=test+co&pol=sydney&pod=ningbo&container=40hc")
+            assert (status, quote["source"], quote["total_usd"]) == (200, "contract", 560)
+
+            status, batch = await _request(port, "POST", "/price", {"lanes": [
+                {"customer": "TEST CO", "pol": "SYDNEY", "pod": "TOKYO", "container": "40HC"},
+                {"customer": "TEST CO", "pol": "SYDNEY", "pod": "BUSAN", "container": "40HC"},
+            ]})
+            assert [q and q["source"] for q in batch["quotes"]] == ["tariff", None]
+
+            status, rates = await _request(port, "GET", "/rates?pod=ningbo")
+            assert [r["freight_usd"] for r in rates["rates"]] == [500] and rates["next"] is None
+            assert (await _request(port, "GET", "/rate?customer=TEST+CO&pol=SYDNEY&pod=TOKYO&container=40HC"))[0] == 404
+            assert (await _request(port, "GET", "/price?customer=TEST+CO"))[0] == 400
+            assert (await _request(port, "DELETE", "/price"))[0] == 405
+
+            # A write from another connection is picked up on the next check.
+            assert not await cache.check()
+            assert engine.pool.checkedout() == 0
+            upsert_rates(s, [("TEST CO", rate_values("NINGBO", "40HC", 650))])
+            s.commit()
+            assert await cache.check()
+            status, quote = await _request(
+                port, "GET", "/price?customer=TEST+CO&pol=SYDNEY&pod=NINGBO&container=40HC")
+            assert quote["total_usd"] == 710
+        finally:
+            server.close()
+            await server.wait_closed()
+            cache.close()
+
+    asyncio.run(scenario())
+    s.close()
+    engine.dispose()
+
+
+def test_quote_api_rejects_bad_requests(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}", future=True)
+    Base.metadata.create_all(engine)
+
+    async def scenario():
+        cache = QuoteCache(sessionmaker(bind=engine, future=True))
+        await cache.refresh()
+        server = await asyncio.start_server(QuoteServer(cache).handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            assert (await _request(port, "GET", "/quotes"))[0] == 404
+            assert (await _request(port, "POST", "/health"))[0] == 405
+            assert (await _request(port, "POST", "/price", {"lanes": "all"}))[0] == 400
+            assert (await _request(port, "POST", "/price", length="ten"))[0] == 400
+            assert (await _request(port, "POST", "/price", length="-5"))[0] == 400
+            assert (await _request(port, "POST", "/price", length=str(MAX_BODY + 1)))[0] == 413
+            assert (await _request(port, "GET", "/health"))[0] == 200
+        finally:
+            server.close()
+            await server.wait_closed()
+            cache.close()
+
+    asyncio.run(scenario())
+    engine.dispose()
@@ -0,0 +1,73 @@
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from lib.db.models import Rate
+from lib.importer import RateSheet, import_rate_sheet, normalise_rate_values
+from lib.registry import Registry
+from lib.validation import Validator, parse_money
+
+REGISTRY = Registry({
+    "load_port": ["SYDNEY"], "destination_port": ["TOKYO", "NINGBO"],
+    "container_type": ["20GP"], "dthc": ["COLLECT"],
+})
+
+
+def test_parse_money():
+    assert parse_money(None) == 0.0
+    assert parse_money(" $1,250.50 ") == 1250.5
+    for bad in ("12O", "nan", "1e999"):
+        with pytest.raises(ValueError):
+            parse_money(bad)
+
+
+def test_validator_captures_every_problem_instead_of_coercing():
+    validate = Validator(REGISTRY).validate
+    values, errors = validate(["sydney", "tokyo", "20gp", "500", 1, None, "", 1, 1, "collect", "14 Days"])
+    assert errors == ()
+    assert (values["load_port"], values["freight_usd"], values["doc_aud"]) == ("SYDNEY", 500.0, 0.0)
+
+    values, errors = validate(["SYD", "TOKYO", "", "5OO", 1, 1, 1, 1, 1, "COLLECT", "14 Days"])
+    assert values is None
+    assert errors == (
+        "freight_usd: not a number ('5OO')", "container_type: required", "load_port: unknown SYD",
+    )
+    assert validate(["SYDNEY", "TOKYO", "20GP", -1, 1, 1, 1, 1, 1, "COLLECT", ""])[1] == (
+        "freight_usd: negative",
+    )
+    # Excel TRUE/FALSE cells are bools, which float() would take as 1.0/0.0.
+    row = ["SYDNEY", "TOKYO", "20GP", 500, 1, 1, True, 1, 1, "COLLECT", ""]
+    assert validate(row) == Validator(REGISTRY).check(row)
+    assert validate(row)[0] is None
+
+    with pytest.raises(ValueError):
+        normalise_rate_values(["SYDNEY", "TOKYO", "20GP", "n/a", 1, 1, 1, 1, 1, "COLLECT", ""])
+
+
+def test_import_rejects_bad_rows_and_writes_them_out(session, tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["POL", "POD", "Container", "Freight USD", "OTHC AUD", "DOC AUD",
+               "CMR AUD", "AMS USD", "LSS USD", "DTHC", "Free Time"])
+    ws.append(["SYDNEY", "TOKYO", "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    ws.append(["SYDNEY", "TOKIO", "20GP", 500, 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    ws.append(["SYDNEY", "NINGBO", "20GP", "five hundred", 300, 100, 200, 40, 20, "COLLECT", "14 Days"])
+    path = tmp_path / "quote.xlsx"
+    wb.save(path)
+
+    with RateSheet(str(path)) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (1, 0, 0)
+        rejects = sheet.write_rejected(tmp_path)
+
+    assert [r.row for r in sheet.rejected] == [3, 4]
+    assert session.query(Rate).one().destination_port == "TOKYO"
+
+    rows = list(load_workbook(rejects, read_only=True).active.iter_rows(min_row=4, values_only=True))
+    assert [(r[0], r[2], r[-1]) for r in rows] == [
+        (3, "TOKIO", "destination_port: unknown TOKIO"),
+        (4, "NINGBO", "freight_usd: not a number ('five hundred')"),
+    ]
+
+    # Not fingerprinted, so the file is read again on the next import.
+    with RateSheet(str(path)) as sheet:
+        assert import_rate_sheet(session, sheet, "TEST CO") == (0, 0, 1)
+        assert not sheet.unchanged